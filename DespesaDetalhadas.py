@@ -1,168 +1,160 @@
 import pandas as pd
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
+from sqlalchemy import text
+from conexao_bd import obter_engine, registrar_metricas_pool
+from leitura_em_blocos import carregar_em_blocos, TAMANHO_BLOCO_PADRAO
+from intermediarios import ler_intermediario, ler_em_blocos, caminho_intermediario
+from esquemas import tipos_pandas
+from cache_dimensoes import validar_chaves
+from mesclagem import mesclar_via_staging
+from particionamento import criar_tabela_particionada, SubstituicaoMensal
+from orcado_realizado import (criar_tabela_orcado_realizado, bloquear_agregado, chaves_afetadas, atualizar_chaves,
+                              atualizar_meses)
+from instrumentacao import instrumentar
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Função para conectar ao banco de dados SQL Server usando SQLAlchemy
-def conectar_sqlalchemy(server, database):
-    try:
-        connection_string = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
-        connection_url = URL.create("mssql+pyodbc", query={"odbc_connect": connection_string})
-        engine = create_engine(connection_url)
-        logger.info(f"Conexão com o SQL Server estabelecida com sucesso para o banco de dados {database}.")
-        return engine
-    except Exception as e:
-        logger.error(f"Erro ao conectar ao SQL Server: {e}")
-        raise
+# Tipos das colunas, do registro de esquemas (inteiros estreitos, decimais e datas ISO)
+TIPOS_DESPESAS = tipos_pandas('DESPESAS')
 
-# Função para criar a tabela DespesasDetalhadas
-def criar_tabela_despesas(engine):
-    try:
-        with engine.connect() as conn:
-            create_table_query = """
-            IF OBJECT_ID('DespesasDetalhadas', 'U') IS NULL
-            BEGIN
-                CREATE TABLE DespesasDetalhadas (
-                    DTBASE DATE,
-                    CODIGOCENTROCUSTO INT,
-                    CENTROCUSTOMASTER INT,
-                    VLDESPESA DECIMAL(18, 2),
-                    CODFILIALPRINCIPAL INT,
-                    CODCONTA INT,
-                    MES_A DATE,
-                    PRIMARY KEY (DTBASE, CODIGOCENTROCUSTO, CODCONTA)
-                );
-            END
-            """
-            conn.execute(text(create_table_query))
-            logger.info("Tabela DespesasDetalhadas criada com sucesso.")
-    except Exception as e:
-        logger.error(f"Erro ao criar a tabela DespesasDetalhadas: {e}")
-        raise
+# Chaves estrangeiras das despesas e as dimensões onde devem existir
+DIMENSOES_DESPESAS = {'CODCONTA': 'CONTAS', 'CODIGOCENTROCUSTO': 'CENTRO_DE_CUSTO'}
+
+# Chave primária da tabela DespesasDetalhadas, usada no MERGE; inclui o mês (MES_A), coluna de partição
+# (ver particionamento.criar_tabela_particionada), para o SQL Server e o SQLite garantirem a mesma unicidade
+CHAVES_DESPESAS = ['DTBASE', 'CODIGOCENTROCUSTO', 'CODCONTA', 'MES_A']
 
-# Função para ler o arquivo CSV
-def ler_csv(caminho_arquivo):
+# Função para criar a tabela DespesasDetalhadas, particionada por mês em MES_A
+def criar_tabela_despesas(engine):
+    # No SQL Server: columnstore particionado por mês, para a carga poder trocar um mês inteiro
+    colunas = """
+        DTBASE DATE,
+        CODIGOCENTROCUSTO INT,
+        CENTROCUSTOMASTER INT,
+        VLDESPESA DECIMAL(18, 2),
+        CODFILIALPRINCIPAL INT,
+        CODCONTA INT,
+        MES_A DATE
+    """
+    criar_tabela_particionada(engine, 'DespesasDetalhadas', colunas, CHAVES_DESPESAS, 'MES_A')
+
+# Função para ler o arquivo intermediário, Parquet ou CSV (inteiro ou em blocos, se tamanho_bloco for informado)
+@instrumentar('despesas_detalhadas.ler_csv')
+def ler_csv(caminho_arquivo, tamanho_bloco=None):
+    if tamanho_bloco:
+        return ler_em_blocos(caminho_arquivo, 'DESPESAS', tamanho_bloco)
     try:
-        df = pd.read_csv(caminho_arquivo)
-        logger.info("Arquivo CSV lido com sucesso.")
+        df = ler_intermediario(caminho_arquivo, 'DESPESAS')
+        logger.info(f"Arquivo {caminho_arquivo} lido com sucesso.")
         return df
     except Exception as e:
-        logger.error(f"Erro ao ler o arquivo CSV: {e}")
+        logger.error(f"Erro ao ler o arquivo {caminho_arquivo}: {e}")
         raise
 
-# Função para enviar dados para o SQL Server
+# Função para enviar dados para o SQL Server (upsert via staging + MERGE)
+@instrumentar('despesas_detalhadas.enviar_para_sql_server')
 def enviar_para_sql_server(engine, df, nome_tabela):
-    try:
-        df.to_sql(nome_tabela, con=engine, if_exists='append', index=False)
-        logger.info(f"Dados inseridos na tabela {nome_tabela} com sucesso.")
-    except Exception as e:
-        logger.error(f"Erro ao inserir dados na tabela {nome_tabela}: {e}")
-        raise
+    # Descartar as linhas cuja conta ou centro de custo não existe nas dimensões (cache em memória)
+    with engine.connect() as conn:
+        df = df[validar_chaves(conn, df, DIMENSOES_DESPESAS)]
+
+    with engine.begin() as conn:
+        # Serializar com a outra carga do agregado antes de gravar (ver orcado_realizado.bloquear_agregado)
+        bloquear_agregado(conn)
+        resultado = mesclar_via_staging(conn, df, nome_tabela, CHAVES_DESPESAS)
+
+        # Recalcular no agregado orçado x realizado só os grupos do bloco, na mesma transação
+        if resultado['inseridos'] or resultado['atualizados']:
+            atualizar_chaves(conn, chaves_afetadas(df, 'DespesasDetalhadas'))
+    logger.info(f"Dados mesclados na tabela {nome_tabela} com sucesso.")
+    return resultado
+
+# Função para substituir na tabela os meses inteiros presentes no arquivo (troca de partição)
+@instrumentar('despesas_detalhadas.substituir_meses')
+def substituir_meses(engine, caminho_arquivo, meses=None,
+                     tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Recarrega meses inteiros da tabela DespesasDetalhadas: as linhas de cada
+    mês do arquivo (ou só dos meses informados) substituem todas as linhas do
+    mês na tabela, sem tocar nos demais meses (ver particionamento.SubstituicaoMensal).
+
+    O arquivo é lido em blocos de tamanho_bloco linhas (None para ler o
+    arquivo inteiro).
+
+    Retorna:
+        dict: Meses substituídos e linhas excluídas, inseridas e ignoradas.
+    """
+    carga = SubstituicaoMensal(engine, 'DespesasDetalhadas', 'MES_A', meses, CHAVES_DESPESAS)
+    carga.abrir()
+
+    def enviar_bloco(bloco):
+        # Descartar as linhas cuja conta ou centro de custo não existe nas dimensões (cache em memória)
+        carga.enviar(bloco[validar_chaves(carga.conexao, bloco, DIMENSOES_DESPESAS)])
 
-# Função para criar a stored procedure para inserir ou atualizar dados
-def criar_procedimento(engine):
     try:
-        with engine.connect() as conn:
-            procedure_query = """
-            CREATE PROCEDURE sp_InserirAtualizarDespesasDetalhadas
-            AS
-            BEGIN
-                SET NOCOUNT ON;
-
-                BEGIN TRY
-                    BEGIN TRANSACTION;
-
-                    -- Inserir ou atualizar registros na tabela DespesasDetalhadas
-                    MERGE DespesasDetalhadas AS target
-                    USING (
-                        SELECT 
-                            CONVERT(DATE, DTBASE, 111) AS DTBASE,
-                            CONVERT(INT, CODIGOCENTROCUSTO) AS CODIGOCENTROCUSTO,
-                            CONVERT(INT, CENTROCUSTOMASTER) AS CENTROCUSTOMASTER,
-                            CONVERT(DECIMAL(18,2), VLDESPESA) AS VLDESPESA,
-                            CONVERT(INT, CODFILIALPRINCIPAL) AS CODFILIALPRINCIPAL,
-                            CONVERT(INT, CODCONTA) AS CODCONTA,
-                            CONVERT(DATE, MES_A, 111) AS MES_A
-                        FROM DespesasDetalhadas
-                    ) AS source
-                    ON (target.DTBASE = source.DTBASE AND target.CODIGOCENTROCUSTO = source.CODIGOCENTROCUSTO AND target.CODCONTA = source.CODCONTA)
-                    WHEN MATCHED THEN
-                        UPDATE SET 
-                            CENTROCUSTOMASTER = source.CENTROCUSTOMASTER,
-                            VLDESPESA = source.VLDESPESA,
-                            CODFILIALPRINCIPAL = source.CODFILIALPRINCIPAL,
-                            MES_A = source.MES_A
-                    WHEN NOT MATCHED THEN
-                        INSERT (DTBASE, CODIGOCENTROCUSTO, CENTROCUSTOMASTER, VLDESPESA, CODFILIALPRINCIPAL, CODCONTA, MES_A)
-                        VALUES (source.DTBASE, source.CODIGOCENTROCUSTO, source.CENTROCUSTOMASTER, source.VLDESPESA, source.CODFILIALPRINCIPAL, source.CODCONTA, source.MES_A);
-
-                    COMMIT TRANSACTION;
-                END TRY
-                BEGIN CATCH
-                    -- Tratamento de erros
-                    IF @@TRANCOUNT > 0
-                    BEGIN
-                        ROLLBACK TRANSACTION;
-                    END
-
-                    -- Registra o erro
-                    DECLARE @ErrorMessage NVARCHAR(4000);
-                    DECLARE @ErrorSeverity INT;
-                    DECLARE @ErrorState INT;
-
-                    SELECT @ErrorMessage = ERROR_MESSAGE(),
-                           @ErrorSeverity = ERROR_SEVERITY(),
-                           @ErrorState = ERROR_STATE();
-
-                    RAISERROR (@ErrorMessage, @ErrorSeverity, @ErrorState);
-                END CATCH
-            END;
-            """
-            conn.execute(text(procedure_query))
-            logger.info("Stored procedure sp_InserirAtualizarDespesasDetalhadas criada com sucesso.")
-    except Exception as e:
-        logger.error(f"Erro ao criar a stored procedure: {e}")
+        blocos = ler_csv(caminho_arquivo, tamanho_bloco) if tamanho_bloco else [ler_csv(caminho_arquivo)]
+        carregar_em_blocos(blocos, enviar_bloco, TIPOS_DESPESAS, colunas_chave=CHAVES_DESPESAS)
+        resultado = carga.concluir()
+    except Exception:
+        carga.descartar()
         raise
 
-# Função para visualizar os dados na tabela
-def visualizar_dados(engine, nome_tabela):
+    # Recalcular no agregado orçado x realizado os meses substituídos
+    with engine.begin() as conn:
+        atualizar_meses(conn, resultado['meses'])
+    return resultado
+
+# Função para visualizar as primeiras linhas da tabela
+def visualizar_dados(engine, nome_tabela, limite=10):
     try:
         with engine.connect() as conn:
             result = conn.execute(text(f"SELECT * FROM {nome_tabela}"))
-            df = pd.DataFrame(result.fetchall(), columns=result.keys())
+            df = pd.DataFrame(result.fetchmany(limite), columns=result.keys())
             logger.info(f"Dados da tabela {nome_tabela} visualizados com sucesso.")
             print(df)
     except Exception as e:
         logger.error(f"Erro ao visualizar dados na tabela {nome_tabela}: {e}")
         raise
 
-# Definir parâmetros de conexão
-server = 'DESKTOP-A0LJ7MK\\SQLEXPRESS'  # Usar barra dupla para evitar problemas com strings
-database = 'CASE_NEOBPO'
+# Definir parâmetros da carga
 caminho_csv = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\DESPESAS_.csv'
-
-# Conectar ao SQL Server usando SQLAlchemy
-engine = conectar_sqlalchemy(server, database)
-
-# Criar a tabela DespesasDetalhadas
-criar_tabela_despesas(engine)
-
-# Ler arquivo CSV
-df_despesas = ler_csv(caminho_csv)
-
-# Enviar dados para o SQL Server
-enviar_para_sql_server(engine, df_despesas, 'DespesasDetalhadas')
-
-# Criar a stored procedure para inserir ou atualizar dados
-criar_procedimento(engine)
-
-# Executar a stored procedure para inserir/atualizar dados na tabela DespesasDetalhadas
-with engine.connect() as conn:
-    conn.execute(text("EXEC sp_InserirAtualizarDespesasDetalhadas"))
-
-# Visualizar os dados na tabela DespesasDetalhadas
-visualizar_dados(engine, 'DespesasDetalhadas')
+tamanho_bloco = TAMANHO_BLOCO_PADRAO  # Linhas por bloco na leitura do arquivo (None para ler o arquivo inteiro)
+modo_carga = 'mesclar'  # 'mesclar' (MERGE linha a linha) ou 'substituir_mes' (troca os meses do arquivo inteiros)
+meses_carga = None  # Com 'substituir_mes': meses a recarregar, ex. ['2024-03']; None para todos os meses do arquivo
+
+# Função principal: cria a tabela e carrega o CSV de despesas na tabela DespesasDetalhadas
+def executar():
+    # Obter a engine compartilhada (NEOBPO_DB_URL ou o SQL Server padrão)
+    engine = obter_engine()
+
+    # Ler o Parquet intermediário, se já foi gerado, ou o CSV
+    caminho_entrada = caminho_intermediario(caminho_csv)
+
+    # Criar a tabela DespesasDetalhadas e o agregado orçado x realizado, mantido a cada bloco
+    criar_tabela_despesas(engine)
+    criar_tabela_orcado_realizado(engine)
+
+    # Ler o arquivo CSV e carregar os dados na tabela DespesasDetalhadas
+    if modo_carga == 'substituir_mes':
+        # Só os meses do arquivo são reescritos; o custo é o dos meses recarregados, não o da tabela
+        substituir_meses(engine, caminho_entrada, meses_carga, tamanho_bloco)
+    elif tamanho_bloco:
+        # Cada bloco é validado e enviado assim que lido, mantendo a memória limitada
+        carregar_em_blocos(
+            ler_csv(caminho_entrada, tamanho_bloco),
+            lambda bloco: enviar_para_sql_server(engine, bloco, 'DespesasDetalhadas'),
+            TIPOS_DESPESAS,
+            colunas_chave=CHAVES_DESPESAS,
+        )
+    else:
+        df_despesas = ler_csv(caminho_entrada)
+        enviar_para_sql_server(engine, df_despesas, 'DespesasDetalhadas')
+
+    # Visualizar os dados na tabela DespesasDetalhadas
+    visualizar_dados(engine, 'DespesasDetalhadas')
+
+if __name__ == '__main__':
+    executar()
+    registrar_metricas_pool()
@@ -1,41 +1,31 @@
 import os
-import pandas as pd
-import pyodbc
 import logging
+from carga_em_lote import inserir_em_lote, TAMANHO_LOTE_PADRAO
+from conexao_bd import obter_engine, conexao_dbapi, registrar_metricas_pool, tabela_existe
+from intermediarios import ler_intermediario, caminho_intermediario
+from sincronizacao_dimensoes import sincronizar_dimensao, descartar_controle, impressao_arquivo, dimensao_inalterada
+from cache_dimensoes import invalidar
+from instrumentacao import instrumentar, medir
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Função para ler o arquivo CSV
+# Arquivo CSV extraído do PDF (o Parquet de mesmo nome, se existir, é lido no lugar dele)
+caminho_csv = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 4 Extracao de Dados de PDF para CSV\CENTRO_DE_CUSTO.csv'
+
+# Modo de carga: 'sincronizar' (aplica só as diferenças) ou 'recarga' (DELETE + carga completa)
+modo_carga = 'sincronizar'
+excluir_ausentes = True  # Na sincronização, exclui os centros de custo que saíram do arquivo (os ainda referenciados ficam)
+
+# Função para ler o arquivo de centros de custo (Parquet intermediário ou CSV) com os tipos do registro
+@instrumentar('centro_custo.ler_csv')
 def ler_csv():
-    df_centro_de_custo = pd.read_csv(r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 4 Extracao de Dados de PDF para CSV\CENTRO_DE_CUSTO.csv')
-    logger.info("Arquivo CSV de centro de custo lido com sucesso.")
+    caminho_arquivo = caminho_intermediario(caminho_csv)
+    df_centro_de_custo = ler_intermediario(caminho_arquivo, 'CENTRO_DE_CUSTO')
+    logger.info(f"Arquivo de centro de custo lido com sucesso ({caminho_arquivo}).")
     return df_centro_de_custo
 
-# Função para conectar ao banco de dados SQL Server
-def conectar_sql_server(driver, servidor, database=None):
-    try:
-        if database:
-            conexao = pyodbc.connect(
-                f'DRIVER={driver};'
-                f'SERVER={servidor};'
-                f'DATABASE={database};'
-                'Trusted_Connection=yes;'
-            )
-        else:
-            conexao = pyodbc.connect(
-                f'DRIVER={driver};'
-                f'SERVER={servidor};'
-                'Trusted_Connection=yes;'
-            )
-        logger.info(f"Conexão com o SQL Server estabelecida com sucesso {'para o banco de dados ' + database if database else ''}.")
-        return conexao
-    except pyodbc.Error as ex:
-        sqlstate = ex.args[1]
-        logger.error(f"Erro ao conectar ao SQL Server: {sqlstate}")
-        raise
-
 # Função para criar a tabela CENTRO_DE_CUSTO
 def criar_tabela_centro_de_custo(conexao):
     cursor = conexao.cursor()
@@ -51,7 +41,7 @@ def criar_tabela_centro_de_custo(conexao):
         cursor.execute(criar_tabela_query)
         conexao.commit()
         logger.info("Tabela CENTRO_DE_CUSTO criada com sucesso.")
-    except pyodbc.Error as e:
+    except Exception as e:
         logger.error(f"Erro ao criar a tabela CENTRO_DE_CUSTO: {e}")
         raise
     cursor.close()
@@ -63,7 +53,8 @@ def formatar_codigocentrocusto(valor):
     return valor
 
 # Função para enviar dados para o SQL Server
-def enviar_para_sql_server(conexao, df, nome_tabela):
+@instrumentar('centro_custo.enviar_para_sql_server')
+def enviar_para_sql_server(conexao, df, nome_tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
     cursor = conexao.cursor()
 
     # Deletar dados existentes na tabela
@@ -77,37 +68,51 @@ def enviar_para_sql_server(conexao, df, nome_tabela):
     # Formatar a coluna CODIGOCENTROCUSTO
     df['CODIGOCENTROCUSTO'] = df['CODIGOCENTROCUSTO'].apply(formatar_codigocentrocusto)
 
-    for index, row in df.iterrows():
-        colunas = ', '.join(df.columns)
-        valores = ', '.join([f"'{str(val).replace("'", "''")}'" if not pd.isnull(val) else 'NULL' for val in row])
-        
-        inserir_query = f"INSERT INTO {nome_tabela} ({colunas}) VALUES ({valores})"
-        logger.debug(f"Executando query: {inserir_query}")
-        try:
-            cursor.execute(inserir_query)
-        except pyodbc.Error as e:
-            logger.error(f"Erro ao executar query: {inserir_query}")
-            logger.error(f"Erro: {e}")
-            raise
-    conexao.commit()
+    # Inserir novos dados em lotes parametrizados
+    inserir_em_lote(conexao, df, nome_tabela, tamanho_lote=tamanho_lote)
     logger.info(f"Dados inseridos na tabela {nome_tabela} com sucesso.")
     cursor.close()
 
-# Definir parâmetros de conexão
-driver = '{ODBC Driver 17 for SQL Server}'  # Altere conforme a versão do seu driver ODBC
-servidor = r'DESKTOP-A0LJ7MK\SQLEXPRESS'  # Use raw string para evitar problemas com a barra invertida
-
-# Ler arquivo CSV
-df_centro_de_custo = ler_csv()
-
-# Conectar ao SQL Server usando o banco de dados existente
-conexao = conectar_sql_server(driver, servidor, 'CASE_NEOBPO')
+# Função principal: cria a tabela CENTRO_DE_CUSTO, se necessário, e carrega o CSV extraído do PDF
+def executar():
+    # Engine compartilhada (NEOBPO_DB_URL ou o SQL Server padrão)
+    engine = obter_engine()
 
-# Criar a tabela CENTRO_DE_CUSTO
-criar_tabela_centro_de_custo(conexao)
+    # Arquivo igual ao da última sincronização: nada a ler nem a gravar
+    impressao = None
+    if modo_carga == 'sincronizar':
+        impressao = impressao_arquivo(caminho_intermediario(caminho_csv))
+        if dimensao_inalterada(engine, 'CENTRO_DE_CUSTO', impressao):
+            logger.info("Arquivo de centros de custo igual ao da última sincronização; tabela CENTRO_DE_CUSTO mantida.")
+            return
 
-# Enviar dados para o SQL Server
-enviar_para_sql_server(conexao, df_centro_de_custo, 'CENTRO_DE_CUSTO')
+    # Ler arquivo CSV
+    df_centro_de_custo = ler_csv()
 
-# Fechar a conexão
-conexao.close()
+    # Conexão emprestada do pool
+    conexao = conexao_dbapi(engine)
+    try:
+        # Criar a tabela CENTRO_DE_CUSTO
+        if not tabela_existe(engine, 'CENTRO_DE_CUSTO'):
+            criar_tabela_centro_de_custo(conexao)
+
+        if modo_carga == 'sincronizar':
+            # Como na recarga, prevalece a primeira linha de cada código
+            df_centro_de_custo = df_centro_de_custo.drop_duplicates(subset=['CODIGOCENTROCUSTO'])
+            with medir('centro_custo.sincronizar_dimensao') as medicao:
+                resultado = sincronizar_dimensao(engine, df_centro_de_custo, 'CENTRO_DE_CUSTO',
+                                                 excluir_ausentes=excluir_ausentes, impressao=impressao)
+                medicao.registrar(linhas_entrada=len(df_centro_de_custo),
+                                  linhas_saida=resultado['inseridos'] + resultado['atualizados'] + resultado['excluidos'])
+        else:
+            enviar_para_sql_server(conexao, df_centro_de_custo, 'CENTRO_DE_CUSTO')
+            descartar_controle(engine, 'CENTRO_DE_CUSTO')
+            # A recarga apaga e regrava a tabela: o cache de chaves das cargas fato é relido
+            invalidar('CENTRO_DE_CUSTO')
+    finally:
+        # Devolver a conexão ao pool
+        conexao.close()
+
+if __name__ == '__main__':
+    executar()
+    registrar_metricas_pool()
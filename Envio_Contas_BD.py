@@ -1,80 +1,52 @@
 import os
-import pandas as pd
-import pyodbc
 import logging
+from carga_em_lote import inserir_em_lote, TAMANHO_LOTE_PADRAO
+from conexao_bd import obter_engine, url_sql_server, conexao_dbapi, registrar_metricas_pool, tabela_existe
+from intermediarios import ler_intermediario, caminho_intermediario
+from sincronizacao_dimensoes import sincronizar_dimensao, descartar_controle, impressao_arquivo, dimensao_inalterada
+from cache_dimensoes import invalidar
+from instrumentacao import instrumentar, medir
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Arquivo CSV de contas (o Parquet de mesmo nome, se existir, é lido no lugar dele)
+caminho_csv = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\CONTAS_.csv'
+
 # Função para ler os arquivos CSV
+@instrumentar('contas.ler_csv')
 def ler_csv():
     """
-    Lê o arquivo CSV contendo as contas, remove pontos da coluna 'CODCONTA' e a converte para inteiro.
+    Lê o arquivo de contas (Parquet intermediário ou CSV) com os tipos do
+    registro de esquemas: no CSV, os pontos de 'CODCONTA' são removidos pelo
+    próprio parser e o código já chega como inteiro.
 
     Retorna:
-        df_contas (DataFrame): DataFrame contendo os dados do arquivo CSV.
+        df_contas (DataFrame): DataFrame contendo os dados do arquivo.
     """
-    df_contas = pd.read_csv(r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\CONTAS_.csv')
-    logger.info("Arquivo CSV de contas lido com sucesso.")
-    
-    # Remover pontos da coluna CODCONTA e convertê-la para inteiro
-    df_contas['CODCONTA'] = df_contas['CODCONTA'].astype(str).str.replace('.', '').astype(int)
-    
+    caminho_arquivo = caminho_intermediario(caminho_csv)
+    df_contas = ler_intermediario(caminho_arquivo, 'CONTAS')
+    logger.info(f"Arquivo de contas lido com sucesso ({caminho_arquivo}).")
     return df_contas
 
-# Função para conectar ao banco de dados SQL Server
-def conectar_sql_server(driver, servidor, database=None):
-    """
-    Conecta ao banco de dados SQL Server.
-
-    Parâmetros:
-        driver (str): Driver ODBC a ser utilizado.
-        servidor (str): Nome do servidor SQL.
-        database (str, opcional): Nome do banco de dados. Default é None.
-
-    Retorna:
-        conexao (pyodbc.Connection): Objeto de conexão ao SQL Server.
-    """
-    try:
-        if database:
-            conexao = pyodbc.connect(
-                f'DRIVER={driver};'
-                f'SERVER={servidor};'
-                f'DATABASE={database};'
-                'Trusted_Connection=yes;'
-            )
-        else:
-            conexao = pyodbc.connect(
-                f'DRIVER={driver};'
-                f'SERVER={servidor};'
-                'Trusted_Connection=yes;'
-            )
-        logger.info(f"Conexão com o SQL Server estabelecida com sucesso {'para o banco de dados ' + database if database else ''}.")
-        return conexao
-    except pyodbc.Error as ex:
-        sqlstate = ex.args[1]
-        logger.error(f"Erro ao conectar ao SQL Server: {sqlstate}")
-        raise
-
 # Função para criar o banco de dados
-def criar_banco_dados(conexao, nome_banco):
+def criar_banco_dados(engine, nome_banco):
     """
     Cria o banco de dados se ele não existir.
 
     Parâmetros:
-        conexao (pyodbc.Connection): Objeto de conexão ao SQL Server.
+        engine (Engine): Engine conectada ao servidor, sem banco de dados específico.
         nome_banco (str): Nome do banco de dados a ser criado.
     """
-    cursor = conexao.cursor()
     try:
-        cursor.execute(f"IF DB_ID(N'{nome_banco}') IS NULL CREATE DATABASE {nome_banco}")
-        conexao.commit()
+        # CREATE DATABASE não pode rodar dentro de uma transação
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql(f"IF DB_ID(N'{nome_banco}') IS NULL CREATE DATABASE {nome_banco}")
         logger.info(f"Banco de dados {nome_banco} criado com sucesso (se não existia).")
-    except pyodbc.Error as e:
+    except Exception as e:
         logger.error(f"Erro ao criar o banco de dados {nome_banco}: {e}")
         raise
-    cursor.close()
 
 # Função para criar a tabela CONTAS
 def criar_tabela_contas(conexao):
@@ -82,7 +54,7 @@ def criar_tabela_contas(conexao):
     Cria a tabela CONTAS no banco de dados conectado.
 
     Parâmetros:
-        conexao (pyodbc.Connection): Objeto de conexão ao SQL Server.
+        conexao: Conexão DB-API emprestada do pool (ver conexao_bd.conexao_dbapi).
     """
     cursor = conexao.cursor()
     criar_tabela_query = """
@@ -96,20 +68,22 @@ def criar_tabela_contas(conexao):
         cursor.execute(criar_tabela_query)
         conexao.commit()
         logger.info("Tabela CONTAS criada com sucesso.")
-    except pyodbc.Error as e:
+    except Exception as e:
         logger.error(f"Erro ao criar a tabela CONTAS: {e}")
         raise
     cursor.close()
 
 # Função para enviar dados para o SQL Server
-def enviar_para_sql_server(conexao, df, nome_tabela):
+@instrumentar('contas.enviar_para_sql_server')
+def enviar_para_sql_server(conexao, df, nome_tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
     """
-    Envia os dados do DataFrame para o banco de dados SQL Server.
+    Envia os dados do DataFrame para o banco de dados SQL Server em lotes parametrizados.
 
     Parâmetros:
-        conexao (pyodbc.Connection): Objeto de conexão ao SQL Server.
+        conexao: Conexão DB-API emprestada do pool (ver conexao_bd.conexao_dbapi).
         df (DataFrame): DataFrame contendo os dados a serem inseridos.
         nome_tabela (str): Nome da tabela onde os dados serão inseridos.
+        tamanho_lote (int): Quantidade de linhas enviadas por lote.
     """
     cursor = conexao.cursor()
     
@@ -118,52 +92,67 @@ def enviar_para_sql_server(conexao, df, nome_tabela):
         cursor.execute(f"DELETE FROM {nome_tabela}")
         conexao.commit()
         logger.info(f"Dados existentes na tabela {nome_tabela} foram deletados com sucesso.")
-    except pyodbc.Error as e:
+    except Exception as e:
         logger.error(f"Erro ao deletar dados existentes na tabela {nome_tabela}: {e}")
         raise
     
-    # Inserir novos dados
-    for index, row in df.iterrows():
-        colunas = ', '.join(df.columns)
-        valores = ', '.join([f"'{str(val).replace('\'', '\'\'')}'" if not pd.isnull(val) else "NULL" for val in row])
-        inserir_query = f"INSERT INTO {nome_tabela} ({colunas}) VALUES ({valores})"
-        
-        try:
-            cursor.execute(inserir_query)
-        except pyodbc.Error as e:
-            logger.error(f"Erro ao executar query: {inserir_query}")
-            logger.error(f"Erro: {e}")
-            raise
-    
-    conexao.commit()
+    # Inserir novos dados em lotes parametrizados
+    inserir_em_lote(conexao, df, nome_tabela, tamanho_lote=tamanho_lote)
     logger.info(f"Dados inseridos na tabela {nome_tabela} com sucesso.")
     cursor.close()
 
 # Definir parâmetros de conexão
-driver = '{ODBC Driver 17 for SQL Server}'  # Altere conforme a versão do seu driver ODBC
-servidor = r'DESKTOP-A0LJ7MK\SQLEXPRESS'  # Use raw string para evitar problemas com a barra invertida
 nome_banco = 'CASE_NEOBPO'
 
-# Conectar ao SQL Server sem especificar o banco de dados
-conexao = conectar_sql_server(driver, servidor)
-
-# Criar o banco de dados se não existir
-criar_banco_dados(conexao, nome_banco)
-
-# Fechar a conexão inicial
-conexao.close()
-
-# Conectar ao SQL Server usando o banco de dados criado
-conexao = conectar_sql_server(driver, servidor, nome_banco)
-
-# Ler e corrigir arquivo CSV de contas
-df_contas = ler_csv()
-
-# Criar a tabela CONTAS
-criar_tabela_contas(conexao)
-
-# Enviar dados para o SQL Server
-enviar_para_sql_server(conexao, df_contas, 'CONTAS')
-
-# Fechar a conexão
-conexao.close()
+# Modo de carga: 'sincronizar' (aplica só as diferenças) ou 'recarga' (DELETE + carga completa)
+modo_carga = 'sincronizar'
+excluir_ausentes = True  # Na sincronização, exclui as contas que saíram do arquivo (as ainda referenciadas ficam)
+
+# Função para criar o banco de dados, conectando ao servidor sem especificar o banco
+def preparar_banco():
+    # Com NEOBPO_DB_URL apontando para outro banco (ex.: SQLite), não há o que criar
+    if obter_engine().dialect.name == 'mssql':
+        criar_banco_dados(obter_engine(url_sql_server(banco=None)), nome_banco)
+
+# Função principal: cria a tabela CONTAS, se necessário, e carrega o CSV de contas
+def executar():
+    # Engine compartilhada (NEOBPO_DB_URL ou o SQL Server padrão)
+    engine = obter_engine()
+
+    # Arquivo igual ao da última sincronização: nada a ler nem a gravar
+    impressao = None
+    if modo_carga == 'sincronizar':
+        impressao = impressao_arquivo(caminho_intermediario(caminho_csv))
+        if dimensao_inalterada(engine, 'CONTAS', impressao):
+            logger.info("Arquivo de contas igual ao da última sincronização; tabela CONTAS mantida.")
+            return
+
+    # Ler e corrigir arquivo CSV de contas
+    df_contas = ler_csv()
+
+    # Emprestar uma conexão do pool para criar a tabela CONTAS e, na recarga, enviar os dados
+    conexao = conexao_dbapi(engine)
+    try:
+        if not tabela_existe(engine, 'CONTAS'):
+            criar_tabela_contas(conexao)
+
+        if modo_carga == 'sincronizar':
+            # Só as contas novas ou alteradas são enviadas; sem mudanças, nada é gravado
+            with medir('contas.sincronizar_dimensao') as medicao:
+                resultado = sincronizar_dimensao(engine, df_contas, 'CONTAS', excluir_ausentes=excluir_ausentes,
+                                                 impressao=impressao)
+                medicao.registrar(linhas_entrada=len(df_contas),
+                                  linhas_saida=resultado['inseridos'] + resultado['atualizados'] + resultado['excluidos'])
+        else:
+            enviar_para_sql_server(conexao, df_contas, 'CONTAS')
+            descartar_controle(engine, 'CONTAS')
+            # A recarga apaga e regrava a tabela: o cache de chaves das cargas fato é relido
+            invalidar('CONTAS')
+    finally:
+        # Devolver a conexão ao pool
+        conexao.close()
+
+if __name__ == '__main__':
+    preparar_banco()
+    executar()
+    registrar_metricas_pool()
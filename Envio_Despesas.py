@@ -1,43 +1,40 @@
 import pandas as pd
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
+from sqlalchemy import text
+from conexao_bd import obter_engine, registrar_metricas_pool, tabela_existe
+from leitura_em_blocos import carregar_em_blocos
+from intermediarios import ler_intermediario, ler_em_blocos, caminho_intermediario
+from esquemas import tipos_pandas
+from cache_dimensoes import validar_chaves
+from instrumentacao import instrumentar
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Função para conectar ao banco de dados SQL Server usando SQLAlchemy
-def conectar_sqlalchemy(server, database):
-    try:
-        connection_string = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
-        connection_url = URL.create("mssql+pyodbc", query={"odbc_connect": connection_string})
-        engine = create_engine(connection_url)
-        logger.info(f"Conexão com o SQL Server estabelecida com sucesso para o banco de dados {database}.")
-        return engine
-    except Exception as e:
-        logger.error(f"Erro ao conectar ao SQL Server: {e}")
-        raise
+# Tipos das colunas, do registro de esquemas (inteiros estreitos, decimais e datas ISO)
+TIPOS_DESPESAS = tipos_pandas('DESPESAS')
+
+# Chaves estrangeiras das despesas e as dimensões onde devem existir
+DIMENSOES_DESPESAS = {'CODCONTA': 'CONTAS', 'CODIGOCENTROCUSTO': 'CENTRO_DE_CUSTO'}
 
 # Função para criar a tabela DESPESA_DETALHADA
 def criar_tabela_despesa_detalhada(engine):
+    # A verificação fica fora do SQL para que o mesmo DDL rode no SQL Server e no SQLite
+    if tabela_existe(engine, 'DESPESA_DETALHADA'):
+        return
     try:
-        with engine.connect() as conn:
+        with engine.begin() as conn:
             create_table_query = """
-            IF OBJECT_ID('DESPESA_DETALHADA', 'U') IS NULL
-            BEGIN
-                CREATE TABLE DESPESA_DETALHADA (
-                    DTBASE DATE,
-                    CODIGOCENTROCUSTO INT PRIMARY KEY,
-                    CENTROCUSTOMASTER INT,
-                    VLDESPESA DECIMAL(18, 2),
-                    CODFILIALPRINCIPAL INT,
-                    CODCONTA INT,
-                    MES_A DATE,
-                
-                );
-            END
-
+            CREATE TABLE DESPESA_DETALHADA (
+                DTBASE DATE,
+                CODIGOCENTROCUSTO INT PRIMARY KEY,
+                CENTROCUSTOMASTER INT,
+                VLDESPESA DECIMAL(18, 2),
+                CODFILIALPRINCIPAL INT,
+                CODCONTA INT,
+                MES_A DATE
+            );
             """
             conn.execute(text(create_table_query))
             logger.info("Tabela DESPESA_DETALHADA criada com sucesso.")
@@ -45,18 +42,26 @@ def criar_tabela_despesa_detalhada(engine):
         logger.error(f"Erro ao criar a tabela DESPESA_DETALHADA: {e}")
         raise
 
-# Função para ler o arquivo CSV
-def ler_csv(caminho_arquivo):
+# Função para ler o arquivo intermediário, Parquet ou CSV (inteiro ou em blocos, se tamanho_bloco for informado)
+@instrumentar('despesas.ler_csv')
+def ler_csv(caminho_arquivo, tamanho_bloco=None):
+    if tamanho_bloco:
+        return ler_em_blocos(caminho_arquivo, 'DESPESAS', tamanho_bloco)
     try:
-        df = pd.read_csv(caminho_arquivo)
-        logger.info("Arquivo CSV lido com sucesso.")
+        df = ler_intermediario(caminho_arquivo, 'DESPESAS')
+        logger.info(f"Arquivo {caminho_arquivo} lido com sucesso.")
         return df
     except Exception as e:
-        logger.error(f"Erro ao ler o arquivo CSV: {e}")
+        logger.error(f"Erro ao ler o arquivo {caminho_arquivo}: {e}")
         raise
 
 # Função para enviar dados para o SQL Server
+@instrumentar('despesas.enviar_para_sql_server')
 def enviar_para_sql_server(engine, df, nome_tabela):
+    # Descartar as linhas cuja conta ou centro de custo não existe nas dimensões (cache em memória)
+    with engine.connect() as conn:
+        df = df[validar_chaves(conn, df, DIMENSOES_DESPESAS)]
+
     try:
         df.to_sql(nome_tabela, con=engine, if_exists='append', index=False)
         logger.info(f"Dados inseridos na tabela {nome_tabela} com sucesso.")
@@ -64,34 +69,49 @@ def enviar_para_sql_server(engine, df, nome_tabela):
         logger.error(f"Erro ao inserir dados na tabela {nome_tabela}: {e}")
         raise
 
-# Função para visualizar os dados na tabela
-def visualizar_dados(engine, nome_tabela):
+# Função para visualizar as primeiras linhas da tabela
+def visualizar_dados(engine, nome_tabela, limite=10):
     try:
         with engine.connect() as conn:
             result = conn.execute(text(f"SELECT * FROM {nome_tabela}"))
-            df = pd.DataFrame(result.fetchall(), columns=result.keys())
+            df = pd.DataFrame(result.fetchmany(limite), columns=result.keys())
             logger.info(f"Dados da tabela {nome_tabela} visualizados com sucesso.")
             print(df)
     except Exception as e:
         logger.error(f"Erro ao visualizar dados na tabela {nome_tabela}: {e}")
         raise
 
-# Definir parâmetros de conexão
-server = 'DESKTOP-A0LJ7MK\\SQLEXPRESS'  # Usar barra dupla para evitar problemas com strings
-database = 'CASE_NEOBPO'
+# Definir parâmetros da carga
 caminho_csv = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\DESPESAS_.csv'
+tamanho_bloco = 100_000  # Linhas por bloco na leitura do arquivo (None para ler o arquivo inteiro)
+
+# Função principal: cria a tabela e carrega o CSV de despesas na tabela DESPESA_DETALHADA
+def executar():
+    # Obter a engine compartilhada (NEOBPO_DB_URL ou o SQL Server padrão)
+    engine = obter_engine()
 
-# Conectar ao SQL Server usando SQLAlchemy
-engine = conectar_sqlalchemy(server, database)
+    # Ler o Parquet intermediário, se já foi gerado, ou o CSV
+    caminho_entrada = caminho_intermediario(caminho_csv)
 
-# Criar a tabela DESPESA_DETALHADA
-criar_tabela_despesa_detalhada(engine)
+    # Criar a tabela DESPESA_DETALHADA
+    criar_tabela_despesa_detalhada(engine)
 
-# Ler arquivo CSV
-df_despesas = ler_csv(caminho_csv)
+    # Ler o arquivo e enviar os dados para o SQL Server
+    if tamanho_bloco:
+        # Cada bloco é validado e enviado assim que lido, mantendo a memória limitada
+        carregar_em_blocos(
+            ler_csv(caminho_entrada, tamanho_bloco),
+            lambda bloco: enviar_para_sql_server(engine, bloco, 'DESPESA_DETALHADA'),
+            TIPOS_DESPESAS,
+            colunas_chave=['CODIGOCENTROCUSTO'],
+        )
+    else:
+        df_despesas = ler_csv(caminho_entrada)
+        enviar_para_sql_server(engine, df_despesas, 'DESPESA_DETALHADA')
 
-# Enviar dados para o SQL Server
-enviar_para_sql_server(engine, df_despesas, 'DESPESA_DETALHADA')
+    # Visualizar os dados na tabela DESPESA_DETALHADA
+    visualizar_dados(engine, 'DESPESA_DETALHADA')
 
-# Visualizar os dados na tabela DESPESA_DETALHADA
-visualizar_dados(engine, 'DESPESA_DETALHADA')
+if __name__ == '__main__':
+    executar()
+    registrar_metricas_pool()
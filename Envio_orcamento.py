@@ -1,133 +1,230 @@
-import pandas as pd
+import time
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
+from sqlalchemy import text
+from conexao_bd import obter_engine, registrar_metricas_pool
+from leitura_em_blocos import carregar_em_blocos, TAMANHO_BLOCO_PADRAO
+from intermediarios import ler_intermediario, ler_em_blocos, caminho_intermediario
+from esquemas import tipos_pandas
+from cache_dimensoes import obter_chaves, registrar_chaves, invalidar
+from particionamento import criar_tabela_particionada, SubstituicaoMensal
+from orcado_realizado import (criar_tabela_orcado_realizado, bloquear_agregado, chaves_afetadas, atualizar_chaves,
+                              atualizar_meses)
+from instrumentacao import instrumentar
+from Questao_3_Avancado_Processamento_XML import lotes_xml, preparar_lote_orcamento, TAMANHO_LOTE_PADRAO
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Função para conectar ao banco de dados SQL Server usando SQLAlchemy
-def conectar_sqlalchemy(server, database):
-    try:
-        connection_string = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;"
-        connection_url = URL.create("mssql+pyodbc", query={"odbc_connect": connection_string})
-        engine = create_engine(connection_url)
-        logger.info(f"Conexão com o SQL Server estabelecida com sucesso para o banco de dados {database}.")
-        return engine
-    except Exception as e:
-        logger.error(f"Erro ao conectar ao SQL Server: {e}")
-        raise
+# Tipos das colunas, do registro de esquemas (inteiros estreitos, decimais e datas ISO)
+TIPOS_ORCAMENTO = tipos_pandas('ORCAMENTO')
+
+# Chave primária da tabela ORCAMENTO
+CHAVES_ORCAMENTO = ['ORCAMENTO_ULTDATA', 'ORCAMENTO_CONTACOD', 'ORCAMENTO_CENTROCUSTOCOD']
 
-# Função para criar a tabela ORCAMENTO
+# Função para criar a tabela ORCAMENTO, particionada por mês em ORCAMENTO_ULTDATA
 def criar_tabela_orcamento(engine):
-    try:
-        with engine.connect() as conn:
-            create_table_query = """
-            CREATE TABLE ORCAMENTO (
-                ORCAMENTO_ULTDATA DATE,
-                ORCAMENTO_FILIALCOD INT,
-                ORCAMENTO_CONTACOD INT,
-                ORCAMENTO_CENTROCUSTOCOD INT,
-                ORCAMENTO_ORCADO DECIMAL(18, 2),
-                ORCAMENTO_PERRATEIO DECIMAL(18, 2),
-                PRIMARY KEY (ORCAMENTO_ULTDATA, ORCAMENTO_CONTACOD, ORCAMENTO_CENTROCUSTOCOD),
-                FOREIGN KEY (ORCAMENTO_CONTACOD) REFERENCES CONTAS(CODCONTA),
-                FOREIGN KEY (ORCAMENTO_CENTROCUSTOCOD) REFERENCES CENTRO_DE_CUSTO(CODIGOCENTROCUSTO)
-            );
-            """
-            conn.execute(text(create_table_query))
-            logger.info("Tabela ORCAMENTO criada com sucesso.")
-    except Exception as e:
-        logger.error(f"Erro ao criar a tabela ORCAMENTO: {e}")
-        raise
+    # No SQL Server: columnstore particionado por mês, para a carga poder trocar um mês inteiro
+    definicoes = """
+        ORCAMENTO_ULTDATA DATE,
+        ORCAMENTO_FILIALCOD INT,
+        ORCAMENTO_CONTACOD INT,
+        ORCAMENTO_CENTROCUSTOCOD INT,
+        ORCAMENTO_ORCADO DECIMAL(18, 2),
+        ORCAMENTO_PERRATEIO DECIMAL(18, 2),
+        FOREIGN KEY (ORCAMENTO_CONTACOD) REFERENCES CONTAS(CODCONTA),
+        FOREIGN KEY (ORCAMENTO_CENTROCUSTOCOD) REFERENCES CENTRO_DE_CUSTO(CODIGOCENTROCUSTO)
+    """
+    criar_tabela_particionada(engine, 'ORCAMENTO', definicoes, CHAVES_ORCAMENTO, 'ORCAMENTO_ULTDATA')
 
-# Função para ler o arquivo CSV
-def ler_csv(caminho_arquivo):
+# Função para ler o arquivo intermediário, Parquet ou CSV (inteiro ou em blocos, se tamanho_bloco for informado)
+@instrumentar('orcamento.ler_csv')
+def ler_csv(caminho_arquivo, tamanho_bloco=None):
+    if tamanho_bloco:
+        return ler_em_blocos(caminho_arquivo, 'ORCAMENTO', tamanho_bloco)
     try:
-        df = pd.read_csv(caminho_arquivo)
-        logger.info("Arquivo CSV lido com sucesso.")
+        df = ler_intermediario(caminho_arquivo, 'ORCAMENTO')
+        logger.info(f"Arquivo {caminho_arquivo} lido com sucesso.")
         return df
     except Exception as e:
-        logger.error(f"Erro ao ler o arquivo CSV: {e}")
+        logger.error(f"Erro ao ler o arquivo {caminho_arquivo}: {e}")
         raise
 
+# Função para inserir as chaves ausentes de uma dimensão, sem reler a tabela
+def corrigir_chaves_faltantes(conn, df, coluna_df, tabela, coluna_tabela):
+    """
+    Garante que todos os códigos de df[coluna_df] existam na tabela de dimensão.
+    As chaves vêm do cache de dimensões, as ausentes são encontradas por
+    diferença de conjuntos e inseridas em um único INSERT em lote, na
+    transação de conn; em seguida são registradas no cache.
+    """
+    chaves_validas = obter_chaves(conn, tabela)
+
+    inicio = time.perf_counter()
+    faltantes = set(df[coluna_df].dropna().unique().tolist()) - chaves_validas
+    if faltantes:
+        insert_query = text(f"INSERT INTO {tabela} ({coluna_tabela}) VALUES (:codigo)")
+        conn.execute(insert_query, [{'codigo': int(codigo)} for codigo in sorted(faltantes)])
+        registrar_chaves(tabela, faltantes)
+        logger.info(f"{len(faltantes)} registros inválidos adicionados à tabela {tabela} "
+                    f"em {time.perf_counter() - inicio:.2f}s.")
+
 # Função para verificar e corrigir os valores de ORCAMENTO_CONTACOD
-def verificar_e_corrigir_contas(engine, df, tabela_contas):
+def verificar_e_corrigir_contas(conn, df, tabela_contas):
     try:
-        query = text(f"SELECT CODCONTA FROM {tabela_contas}")
-        valid_codcontas = pd.read_sql(query, engine)['CODCONTA'].tolist()
-        
-        # Adicionar registros faltantes na tabela CONTAS
-        invalid_codcontas = df[~df['ORCAMENTO_CONTACOD'].isin(valid_codcontas)]['ORCAMENTO_CONTACOD'].unique()
-        if len(invalid_codcontas) > 0:
-            for codconta in invalid_codcontas:
-                insert_query = text(f"INSERT INTO {tabela_contas} (CODCONTA) VALUES (:codconta)")
-                with engine.connect() as conn:
-                    conn.execute(insert_query, {'codconta': codconta})
-            logger.info(f"{len(invalid_codcontas)} registros inválidos adicionados à tabela {tabela_contas}.")
-        
-        # Re-verificar e retornar dataframe corrigido
-        valid_codcontas = pd.read_sql(query, engine)['CODCONTA'].tolist()
-        df_valid = df[df['ORCAMENTO_CONTACOD'].isin(valid_codcontas)]
-        return df_valid
+        corrigir_chaves_faltantes(conn, df, 'ORCAMENTO_CONTACOD', tabela_contas, 'CODCONTA')
     except Exception as e:
         logger.error(f"Erro ao verificar e corrigir contas: {e}")
         raise
 
 # Função para verificar e corrigir os valores de ORCAMENTO_CENTROCUSTOCOD
-def verificar_e_corrigir_centrocusto(engine, df, tabela_centro_custo):
+def verificar_e_corrigir_centrocusto(conn, df, tabela_centro_custo):
     try:
-        query = text(f"SELECT CODIGOCENTROCUSTO FROM {tabela_centro_custo}")
-        valid_centro_custos = pd.read_sql(query, engine)['CODIGOCENTROCUSTO'].tolist()
-        
-        # Adicionar registros faltantes na tabela CENTRO_DE_CUSTO
-        invalid_centro_custos = df[~df['ORCAMENTO_CENTROCUSTOCOD'].isin(valid_centro_custos)]['ORCAMENTO_CENTROCUSTOCOD'].unique()
-        if len(invalid_centro_custos) > 0:
-            for codigocentro in invalid_centro_custos:
-                insert_query = text(f"INSERT INTO {tabela_centro_custo} (CODIGOCENTROCUSTO) VALUES (:codigocentro)")
-                with engine.connect() as conn:
-                    conn.execute(insert_query, {'codigocentro': codigocentro})
-            logger.info(f"{len(invalid_centro_custos)} registros inválidos adicionados à tabela {tabela_centro_custo}.")
-        
-        # Re-verificar e retornar dataframe corrigido
-        valid_centro_custos = pd.read_sql(query, engine)['CODIGOCENTROCUSTO'].tolist()
-        df_valid = df[df['ORCAMENTO_CENTROCUSTOCOD'].isin(valid_centro_custos)]
-        return df_valid
+        corrigir_chaves_faltantes(conn, df, 'ORCAMENTO_CENTROCUSTOCOD', tabela_centro_custo, 'CODIGOCENTROCUSTO')
     except Exception as e:
         logger.error(f"Erro ao verificar e corrigir centro de custo: {e}")
         raise
 
 # Função para enviar dados para o SQL Server
-def enviar_para_sql_server(engine, df, nome_tabela):
+@instrumentar('orcamento.enviar_para_sql_server')
+def enviar_para_sql_server(conn, df, nome_tabela):
     try:
-        df.to_sql(nome_tabela, con=engine, if_exists='append', index=False)
+        df.to_sql(nome_tabela, con=conn, if_exists='append', index=False)
         logger.info(f"Dados inseridos na tabela {nome_tabela} com sucesso.")
     except Exception as e:
         logger.error(f"Erro ao inserir dados na tabela {nome_tabela}: {e}")
         raise
 
-# Definir parâmetros de conexão
-server = 'DESKTOP-A0LJ7MK\\SQLEXPRESS'  # Usar barra dupla para evitar problemas com strings
-database = 'CASE_NEOBPO'
+# Função para corrigir as chaves estrangeiras e enviar um bloco para a tabela ORCAMENTO
+def carregar_orcamento(engine, df, tabela_contas, tabela_centro_custo):
+    """
+    Corrige as chaves de contas e centros de custo e carrega o bloco na tabela
+    ORCAMENTO, tudo na mesma transação. As chaves das dimensões ficam no cache
+    de dimensões, que só relê uma tabela quando a versão dela muda.
+    """
+    # Linhas sem chave não podem ser corrigidas nem carregadas
+    df = df.dropna(subset=['ORCAMENTO_CONTACOD', 'ORCAMENTO_CENTROCUSTOCOD'])
+
+    try:
+        with engine.begin() as conn:
+            # Serializar com a outra carga do agregado antes de gravar (ver orcado_realizado.bloquear_agregado)
+            bloquear_agregado(conn)
+
+            # Verificar e corrigir os valores de ORCAMENTO_CONTACOD
+            verificar_e_corrigir_contas(conn, df, tabela_contas)
+
+            # Verificar e corrigir os valores de ORCAMENTO_CENTROCUSTOCOD
+            verificar_e_corrigir_centrocusto(conn, df, tabela_centro_custo)
+
+            # Enviar dados para o SQL Server
+            inicio = time.perf_counter()
+            enviar_para_sql_server(conn, df, 'ORCAMENTO')
+            logger.info(f"{len(df)} linhas enviadas para a tabela ORCAMENTO em {time.perf_counter() - inicio:.2f}s.")
+
+            # Recalcular no agregado orçado x realizado só os grupos do bloco, na mesma transação
+            atualizar_chaves(conn, chaves_afetadas(df, 'ORCAMENTO'))
+    except Exception:
+        # As chaves registradas nesta transação foram desfeitas no banco
+        invalidar(tabela_contas)
+        invalidar(tabela_centro_custo)
+        raise
+
+# Função para carregar o XML de orçamento diretamente na tabela ORCAMENTO, lote a lote
+def carregar_orcamento_xml(engine, arquivo_xml, tabela_contas, tabela_centro_custo,
+                           tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Lê o XML de orçamento em streaming (iterparse) e envia cada lote para
+    carregar_orcamento sem gerar o CSV intermediário.
+
+    Retorna:
+        int: Total de linhas carregadas.
+    """
+    lotes = (preparar_lote_orcamento(lote)[list(TIPOS_ORCAMENTO)].astype(TIPOS_ORCAMENTO)
+             for lote in lotes_xml(arquivo_xml, tamanho_lote))
+    return carregar_em_blocos(
+        lotes,
+        lambda bloco: carregar_orcamento(engine, bloco, tabela_contas, tabela_centro_custo),
+        TIPOS_ORCAMENTO,
+        colunas_chave=CHAVES_ORCAMENTO,
+    )
+
+# Função para substituir na tabela ORCAMENTO os meses inteiros presentes no arquivo (troca de partição)
+@instrumentar('orcamento.substituir_meses')
+def substituir_meses(engine, caminho_arquivo, tabela_contas, tabela_centro_custo, meses=None,
+                     tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Recarrega meses inteiros da tabela ORCAMENTO: as linhas de cada mês do
+    arquivo (ou só dos meses informados) substituem todas as linhas do mês
+    na tabela, sem tocar nos demais meses (ver particionamento.SubstituicaoMensal).
+    As chaves de contas e centros de custo são corrigidas na conexão da carga,
+    antes de cada bloco.
+
+    O arquivo é lido em blocos de tamanho_bloco linhas (None para ler o
+    arquivo inteiro).
+
+    Retorna:
+        dict: Meses substituídos e linhas excluídas, inseridas e ignoradas.
+    """
+    carga = SubstituicaoMensal(engine, 'ORCAMENTO', 'ORCAMENTO_ULTDATA', meses, CHAVES_ORCAMENTO)
+    carga.abrir()
+
+    def enviar_bloco(bloco):
+        verificar_e_corrigir_contas(carga.conexao, bloco, tabela_contas)
+        verificar_e_corrigir_centrocusto(carga.conexao, bloco, tabela_centro_custo)
+        carga.enviar(bloco)
+
+    try:
+        blocos = ler_csv(caminho_arquivo, tamanho_bloco) if tamanho_bloco else [ler_csv(caminho_arquivo)]
+        carregar_em_blocos(blocos, enviar_bloco, TIPOS_ORCAMENTO, colunas_chave=CHAVES_ORCAMENTO)
+        resultado = carga.concluir()
+    except Exception:
+        carga.descartar()
+        # As chaves registradas na transação descartada podem não estar no banco
+        invalidar(tabela_contas)
+        invalidar(tabela_centro_custo)
+        raise
+
+    # Recalcular no agregado orçado x realizado os meses substituídos
+    with engine.begin() as conn:
+        atualizar_meses(conn, resultado['meses'])
+    return resultado
+
+# Definir parâmetros da carga
 tabela_contas = 'CONTAS'
 tabela_centro_custo = 'CENTRO_DE_CUSTO'
 caminho_csv = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\ORCAMENTO_.csv'
+tamanho_bloco = TAMANHO_BLOCO_PADRAO  # Linhas por bloco na leitura do arquivo (None para ler o arquivo inteiro)
+modo_carga = 'inserir'  # 'inserir' (acrescenta as linhas) ou 'substituir_mes' (troca os meses do arquivo inteiros)
+meses_carga = None  # Com 'substituir_mes': meses a recarregar, ex. ['2024-03']; None para todos os meses do arquivo
 
-# Conectar ao SQL Server usando SQLAlchemy
-engine = conectar_sqlalchemy(server, database)
-
-# Criar a tabela ORCAMENTO
-criar_tabela_orcamento(engine)
+# Função principal: cria a tabela ORCAMENTO e carrega o CSV de orçamento
+def executar():
+    # Obter a engine compartilhada (NEOBPO_DB_URL ou o SQL Server padrão)
+    engine = obter_engine()
 
-# Ler arquivo CSV
-df_orcamento = ler_csv(caminho_csv)
+    # Ler o Parquet intermediário, se já foi gerado, ou o CSV
+    caminho_entrada = caminho_intermediario(caminho_csv)
 
-# Verificar e corrigir os valores de ORCAMENTO_CONTACOD
-df_orcamento_corrigido = verificar_e_corrigir_contas(engine, df_orcamento, tabela_contas)
+    # Criar a tabela ORCAMENTO e o agregado orçado x realizado, mantido a cada bloco
+    criar_tabela_orcamento(engine)
+    criar_tabela_orcado_realizado(engine)
 
-# Verificar e corrigir os valores de ORCAMENTO_CENTROCUSTOCOD
-df_orcamento_corrigido = verificar_e_corrigir_centrocusto(engine, df_orcamento_corrigido, tabela_centro_custo)
+    # Ler o arquivo e enviar os dados para o SQL Server
+    if modo_carga == 'substituir_mes':
+        # Só os meses do arquivo são reescritos; o custo é o dos meses recarregados, não o da tabela
+        substituir_meses(engine, caminho_entrada, tabela_contas, tabela_centro_custo, meses_carga, tamanho_bloco)
+    elif tamanho_bloco:
+        # Cada bloco é validado, corrigido e enviado assim que lido, mantendo a memória limitada
+        carregar_em_blocos(
+            ler_csv(caminho_entrada, tamanho_bloco),
+            lambda bloco: carregar_orcamento(engine, bloco, tabela_contas, tabela_centro_custo),
+            TIPOS_ORCAMENTO,
+            colunas_chave=CHAVES_ORCAMENTO,
+        )
+    else:
+        df_orcamento = ler_csv(caminho_entrada)
+        carregar_orcamento(engine, df_orcamento, tabela_contas, tabela_centro_custo)
 
-# Enviar dados para o SQL Server
-enviar_para_sql_server(engine, df_orcamento_corrigido, 'ORCAMENTO')
+if __name__ == '__main__':
+    executar()
+    registrar_metricas_pool()
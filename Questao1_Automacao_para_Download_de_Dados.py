@@ -1,10 +1,6 @@
 import os
 import logging
-import time
-from pathlib import Path
-from kaggle.api.kaggle_api_extended import KaggleApi
-from requests.exceptions import ConnectionError, Timeout
-import zipfile
+from gerenciador_downloads import baixar_arquivos, criar_sessao, MAX_DOWNLOADS_PADRAO
 
 # Configurar o logging para registrar eventos críticos, erros e informações de diagnóstico
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,41 +10,31 @@ logger = logging.getLogger(__name__)
 os.environ['KAGGLE_USERNAME'] = 'marcellfelipeolivesf'
 os.environ['KAGGLE_KEY'] = '34cd37fb731e4a81cf5fdb50f7e488e0'
 
+# Endereço de download de um arquivo de dataset na API do Kaggle
+URL_DOWNLOAD_KAGGLE = 'https://www.kaggle.com/api/v1/datasets/download/{dataset}/{nome_arquivo}'
+
 # Função para definir o caminho da pasta onde os arquivos serão salvos
 def definir_caminho_download(caminho):
     # Se o caminho não existir, criar o diretório
-    if not os.path.exists(caminho):
-        os.makedirs(caminho)
-    # Mudar o diretório de trabalho para o caminho especificado
-    os.chdir(caminho)
-
-# Função para realizar download com tentativas de reconexão
-def baixar_arquivo_com_tentativas(api, dataset, nome_arquivo, tentativas=5, fator_espera=1.0):
-    # Tentar baixar o arquivo várias vezes
-    for tentativa in range(tentativas):
-        try:
-            logger.info(f"Tentativa {tentativa + 1} de download do arquivo {nome_arquivo}...")
-            # Realizar o download do arquivo usando a API do Kaggle
-            api.dataset_download_file(dataset, nome_arquivo)
-            logger.info(f"Download do arquivo {nome_arquivo} concluído com sucesso!")
-            return
-        except (ConnectionError, Timeout) as e:
-            # Registrar erros de conexão ou timeout e esperar antes de tentar novamente
-            logger.error(f"Erro ao baixar o arquivo {nome_arquivo}: {e}")
-            time.sleep(fator_espera * (2 ** tentativa))
-        except Exception as e:
-            # Registrar qualquer erro inesperado e parar as tentativas
-            logger.error(f"Erro inesperado ao baixar o arquivo {nome_arquivo}: {e}")
-            break
-    logger.error(f"Falha ao baixar o arquivo {nome_arquivo} após {tentativas} tentativas.")
-
-# Autenticar na API do Kaggle
-api = KaggleApi()
-api.authenticate()
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+# Função para montar as URLs de download dos arquivos do dataset
+def urls_kaggle(dataset, nomes_arquivos):
+    return {nome_arquivo: URL_DOWNLOAD_KAGGLE.format(dataset=dataset, nome_arquivo=nome_arquivo)
+            for nome_arquivo in nomes_arquivos}
+
+# Função para validar os arquivos baixados (opcional)
+def validar_arquivos_baixados(pasta_destino, nomes_arquivos):
+    for nome_arquivo in nomes_arquivos:
+        # Verificar se o arquivo foi baixado corretamente
+        if not os.path.exists(os.path.join(pasta_destino, nome_arquivo)):
+            logger.error(f"Arquivo {nome_arquivo} não foi baixado corretamente.")
+        else:
+            logger.info(f"Arquivo {nome_arquivo} está presente.")
 
 # Definir caminho da pasta onde os arquivos serão salvos
 caminho_download = r'C:\Users\MarcellFelipedePaula\OneDrive - Saúde Petrobras\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Questao 1 Automacao para Download de Dados'
-definir_caminho_download(caminho_download)
 
 # Dataset no Kaggle
 dataset = 'thomassimeo/contas-senior-neobpo'
@@ -56,31 +42,24 @@ dataset = 'thomassimeo/contas-senior-neobpo'
 # Arquivos a serem baixados
 arquivos_a_baixar = ['orcamento.xml', 'despesas.xlsx', 'centro_de_custo.pdf']
 
-# Baixar arquivos com tratamento de erros avançado
-for nome_arquivo in arquivos_a_baixar:
-    baixar_arquivo_com_tentativas(api, dataset, nome_arquivo)
+# Quantidade máxima de downloads simultâneos
+max_downloads = MAX_DOWNLOADS_PADRAO
 
-# Função para validar os arquivos baixados (opcional)
-def validar_arquivos_baixados(nomes_arquivos):
-    for nome_arquivo in nomes_arquivos:
-        # Verificar se o arquivo foi baixado corretamente
-        if not os.path.exists(nome_arquivo):
-            logger.error(f"Arquivo {nome_arquivo} não foi baixado corretamente.")
-        else:
-            logger.info(f"Arquivo {nome_arquivo} está presente.")
+# Função principal: baixa, valida e extrai os arquivos do dataset
+def executar():
+    # Autenticar na API do Kaggle (autenticação básica com usuário e chave)
+    sessao = criar_sessao((os.environ['KAGGLE_USERNAME'], os.environ['KAGGLE_KEY']), max_downloads)
+
+    definir_caminho_download(caminho_download)
+
+    # Baixar os arquivos em paralelo, pulando os que não mudaram e extraindo os zips ao longo do caminho
+    resultados = baixar_arquivos(urls_kaggle(dataset, arquivos_a_baixar), caminho_download, sessao, max_downloads)
+
+    validar_arquivos_baixados(caminho_download, arquivos_a_baixar)
+
+    falhas = [nome for nome, resultado in resultados.items() if resultado['status'] == 'falhou']
+    if falhas:
+        raise RuntimeError(f"Falha ao baixar os arquivos: {falhas}")
 
-validar_arquivos_baixados(arquivos_a_baixar)
-
-# Função para extrair arquivos zipados, se necessário
-def extrair_arquivos_zip(pasta_destino):
-    for arquivo in os.listdir(pasta_destino):
-        if arquivo.endswith('.zip'):
-            caminho_arquivo_zip = os.path.join(pasta_destino, arquivo)
-            # Extrair o conteúdo do arquivo zip
-            with zipfile.ZipFile(caminho_arquivo_zip, 'r') as zip_ref:
-                zip_ref.extractall(pasta_destino)
-            # Remover o arquivo zip após a extração
-            os.remove(caminho_arquivo_zip)
-            logger.info(f"Arquivo {arquivo} extraído e deletado.")
-
-extrair_arquivos_zip(caminho_download)
+if __name__ == '__main__':
+    executar()
@@ -1,57 +1,92 @@
 import os
 import logging
 import pandas as pd
-import pdfplumber
 import re
+from extracao_pdf import iterar_textos_pdf, PROCESSOS_PADRAO
+from intermediarios import gravar_parquet, caminho_parquet, ESQUEMA_CENTRO_CUSTO
+from instrumentacao import instrumentar, registrar_bytes_lidos
+from cache_extracao import extrair_com_cache
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# Caminho para o arquivo PDF
+# Caminho para o arquivo PDF e para o CSV gerado
 pdf_path = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 4 Extracao de Dados de PDF para CSV\CENTRO_DE_CUSTO.pdf'
+output_csv_path = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 4 Extracao de Dados de PDF para CSV\CENTRO_DE_CUSTO.csv'
+
+# Parquet intermediário com os tipos declarados, lido pela carga (Envio_Centro_Custo_BD)
+output_parquet_path = caminho_parquet(output_csv_path)
+
+# Colunas da tabela de centros de custo extraída do PDF
+COLUNAS_CENTRO_CUSTO = ['CODIGOCENTROCUSTO', 'DESCRICAO', 'CENTROCUSTO', 'CENTROCUSTO_COD']
+
+# Expressões regulares compiladas uma única vez: 4 grupos de dados por linha e caracteres não numéricos
+PADRAO_LINHA = re.compile(r'(\S+)\s+(.*\S)\s+(\S+)\s+(\d+)')
+PADRAO_NAO_NUMERICO = re.compile(r'\D')
+
+# Processos usados na extração das páginas (1 extrai em série)
+processos_extracao = PROCESSOS_PADRAO
+
+# Versão do extrator no cache de extração: incrementar sempre que a tabela extraída do mesmo PDF mudar
+VERSAO_EXTRATOR = 1
 
 # Função para extrair texto das páginas do PDF
-def extrair_texto_pdf(pdf_path):
+def extrair_texto_pdf(pdf_path, processos=None):
+    """
+    Retorna um iterador com o texto de cada página, na ordem do PDF. Com
+    processos > 1 as páginas são extraídas em paralelo (ver extracao_pdf).
+    """
     if not os.path.exists(pdf_path):
         logger.error(f'O arquivo PDF não foi encontrado: {pdf_path}')
-        return []
+        return iter([])
 
     logger.info('Extraindo texto do PDF...')
-    textos = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, pagina in enumerate(pdf.pages):
-            texto = pagina.extract_text()
-            if texto:
-                textos.append(texto)
-            else:
-                logger.warning(f'Nenhum texto encontrado na página {i + 1}.')
-    return textos
+    registrar_bytes_lidos(os.path.getsize(pdf_path))
+    return iterar_textos_pdf(pdf_path, processos=processos)
 
 # Função para processar o texto extraído e reconstruir as tabelas
+@instrumentar('pdf.processar_texto')
 def processar_texto(textos):
+    """
+    Reconstrói a tabela de centros de custo a partir do texto das páginas.
+    As linhas fora do formato esperado são contadas e registradas em um único
+    aviso (com alguns exemplos), em vez de um aviso por linha.
+
+    Retorna:
+        DataFrame: Colunas de COLUNAS_CENTRO_CUSTO, montado uma única vez.
+    """
     logger.info('Processando texto extraído...')
-    dados = []
+    casar = PADRAO_LINHA.match
+    registros = []
+    ignoradas = 0
+    exemplos = []
     for texto in textos:
-        linhas = texto.split('\n')
-        for linha in linhas:
-            # Use expressão regular para capturar exatamente 4 grupos de dados
-            match = re.match(r'(\S+)\s+(.*\S)\s+(\S+)\s+(\d+)', linha.strip())
+        for linha in texto.split('\n'):
+            match = casar(linha.strip())
             if match:
-                codigocentrocusto = re.sub(r'\D', '', match.group(1))  # Remover caracteres não numéricos
-                dados.append([codigocentrocusto, match.group(2), match.group(3), match.group(4)])
+                registros.append(match.groups())
             else:
-                logger.warning(f'Linha ignorada devido ao formato inesperado: {linha}')
-    return dados
+                ignoradas += 1
+                if len(exemplos) < 5:
+                    exemplos.append(linha)
+
+    if ignoradas:
+        logger.warning(f'{ignoradas} linhas ignoradas devido ao formato inesperado (ex.: {exemplos}).')
+
+    df = pd.DataFrame(registros, columns=COLUNAS_CENTRO_CUSTO)
+    # Remover caracteres não numéricos do código, na coluna inteira
+    df['CODIGOCENTROCUSTO'] = df['CODIGOCENTROCUSTO'].str.replace(PADRAO_NAO_NUMERICO, '', regex=True)
+    return df
 
 # Função para salvar dados em formato CSV
-def salvar_dados_csv(dados, output_csv_path):
-    if not dados:
+@instrumentar('pdf.salvar_dados_csv')
+def salvar_dados_csv(df, output_csv_path):
+    if df.empty:
         logger.error('Nenhum dado válido foi encontrado para salvar.')
         return
 
     logger.info('Salvando dados no formato CSV...')
-    df = pd.DataFrame(dados, columns=['CODIGOCENTROCUSTO', 'DESCRICAO', 'CENTROCUSTO', 'CENTROCUSTO_COD'])
 
     # Remover colunas vazias
     df = df.dropna(axis=1, how='all')
@@ -59,26 +94,32 @@ def salvar_dados_csv(dados, output_csv_path):
     df.to_csv(output_csv_path, index=False)
     logger.info(f'Dados salvos como {output_csv_path}')
 
+# Função para salvar os dados no Parquet intermediário, com o esquema declarado
+@instrumentar('pdf.salvar_dados_parquet')
+def salvar_dados_parquet(df, output_parquet_path):
+    if df.empty:
+        return
+    # O esquema é fixo: colunas vazias são mantidas (nulas) para a carga
+    gravar_parquet(df, output_parquet_path, ESQUEMA_CENTRO_CUSTO)
+    logger.info(f'Dados salvos como {output_parquet_path}')
+
 # Função principal
-def principal(pdf_path, output_csv_path):
-    textos = extrair_texto_pdf(pdf_path)
-    if not textos:
-        return pd.DataFrame()  # Retornar DataFrame vazio se não houver textos válidos
+@instrumentar('pdf.principal')
+def principal(pdf_path, output_csv_path, processos=None):
+    # Os textos chegam conforme as páginas são extraídas e são processados em seguida;
+    # com o cache de extração ligado, um PDF com o mesmo conteúdo não é lido de novo
+    df = extrair_com_cache(pdf_path, 'pdf.centro_custo', VERSAO_EXTRATOR,
+                           lambda: processar_texto(extrair_texto_pdf(pdf_path, processos)))
+    salvar_dados_csv(df, output_csv_path)
     
-    dados = processar_texto(textos)
-    salvar_dados_csv(dados, output_csv_path)
-    
-    if dados:
-        df = pd.DataFrame(dados, columns=['CODIGOCENTROCUSTO', 'DESCRICAO', 'CENTROCUSTO', 'CENTROCUSTO_COD'])
+    if not df.empty:
         print("Primeiras linhas dos dados:")
         print(df.head())
-        return df
-    else:
-        return pd.DataFrame()  # Retornar DataFrame vazio se não houver dados válidos
+    return df
 
-if __name__ == '__main__':
-    output_csv_path = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 4 Extracao de Dados de PDF para CSV\CENTRO_DE_CUSTO.csv'
-    dados_concatenados = principal(pdf_path, output_csv_path)
+# Função de execução: extrai o PDF e salva o CSV sem colunas vazias
+def executar():
+    dados_concatenados = principal(pdf_path, output_csv_path, processos_extracao)
 
     if not dados_concatenados.empty:
         # Mostrar colunas vazias
@@ -91,5 +132,12 @@ if __name__ == '__main__':
         # Salvar DataFrame sem colunas vazias no mesmo arquivo CSV
         dados_sem_colunas_vazias.to_csv(output_csv_path, index=False)
         logger.info(f'Dados sem colunas vazias salvos como {output_csv_path}')
+
+        # Gravar o intermediário tipado lido pela carga
+        if output_parquet_path:
+            salvar_dados_parquet(dados_concatenados, output_parquet_path)
     else:
         logger.error('Nenhum dado válido foi encontrado para processar.')
+
+if __name__ == '__main__':
+    executar()
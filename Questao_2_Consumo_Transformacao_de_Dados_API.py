@@ -1,9 +1,10 @@
 import os
-import requests
-import csv
 from datetime import datetime
-import pandas as pd
-import time
+from cliente_api import consumir_paginas, LIMITE_PAGINA_PADRAO, CONCORRENCIA_PADRAO
+from estado_incremental import (ler_estado, gravar_estado, estado_a_partir_do_csv, estado_inicial, filtrar_novos,
+                                avancar_estado, registrar_checkpoint)
+from gravacao_paginas import criar_gravador
+from instrumentacao import instrumentar, medicao_atual
 
 API_TOKEN = os.getenv("API_TOKEN")
 API_URL = 'https://sheetdb.io/api/v1/inj4ilqkt4j3o'  
@@ -12,78 +13,134 @@ headers = {
     'Authorization': f'Bearer {API_TOKEN}'
 }
 
+# Registros por página e páginas pedidas ao mesmo tempo
+limite_pagina = LIMITE_PAGINA_PADRAO
+concorrencia = CONCORRENCIA_PADRAO
+
 # Caminho completo para o arquivo CSV
 csv_path = r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 2 Consumo e Transformacao de Dados via API\resultados.csv'
 
-# Função para obter a última data de atualização do arquivo CSV
-def obter_ultima_data_atualizacao(csv_path):
-    try:
-        with open(csv_path, mode='r') as file:
-            reader = csv.DictReader(file)
-            if 'last_updated' not in reader.fieldnames:
-                return None
-            datas = [row['last_updated'] for row in reader if row['last_updated']]
-            if datas:
-                return max(datas)
-            else:
-                return None
-    except FileNotFoundError:
-        print(f"Arquivo não encontrado: {csv_path}")
-        return None
-    except PermissionError:
-        print(f"Permissão negada ao acessar o arquivo: {csv_path}")
-        return None
+# Arquivo de estado (marca d'água e ponto de retomada) gravado ao lado do CSV
+estado_path = os.path.splitext(csv_path)[0] + '_estado.json'
 
-# Obtém a última data de atualização do arquivo CSV
-ultima_data_atualizacao = obter_ultima_data_atualizacao(csv_path)
+# Formato da saída: 'csv' (acrescenta ao csv_path) ou 'parquet' (arquivos na pasta parquet_path)
+formato_saida = 'csv'
+parquet_path = os.path.splitext(csv_path)[0] + '_parquet'
 
-# Função para buscar dados da API
+# Função para obter o estado da carga incremental, migrando a partir do CSV na primeira execução
+def obter_estado(estado_path, csv_path):
+    estado = ler_estado(estado_path)
+    if estado is None:
+        # Sem arquivo de estado: lê o CSV uma única vez e passa a usar o estado
+        estado = estado_a_partir_do_csv(csv_path)
+        gravar_estado(estado_path, estado)
+    return estado
+
+# Função para buscar dados da API (interface anterior: devolve todos os registros em memória)
 def buscar_dados(api_url, headers, ultima_data_atualizacao):
-    params = {
-        'limit': 100  # Defina o limite de registros por página
-    }
+    """
+    Busca os registros atualizados depois de ultima_data_atualizacao pelo
+    mesmo cliente de buscar_e_gravar (páginas pedidas antecipadamente,
+    pausa em Retry-After; ver cliente_api), mas acumula tudo em uma lista,
+    sem estado nem gravação. Mantida para quem chamava a função anterior;
+    a execução principal usa buscar_e_gravar.
+
+    Retorna:
+        list: Registros recebidos; em caso de erro, os das páginas já recebidas.
+    """
+    params = {}
     if ultima_data_atualizacao:
         params['updated_after'] = ultima_data_atualizacao
-    
+
     todos_os_dados = []
-    proxima_url = api_url
-    while proxima_url:
-        try:
-            response = requests.get(proxima_url, headers=headers, params=params)
-            response.raise_for_status()
-            dados = response.json()
-            if not dados:
-                break
-            
-            todos_os_dados.extend(dados)
-
-            # Verifique se há uma próxima página
-            proxima_url = response.links.get('next', {}).get('url')
-
-        except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 429:
-                print("Limite de taxa excedido. Aguardando 120 segundos antes de tentar novamente.")
-                time.sleep(120)  # Aguardar 120 segundos antes de tentar novamente
-            else:
-                print(f"Erro HTTP na requisição: {http_err}")
-                break
-        except requests.exceptions.RequestException as err:
-            print(f"Erro na requisição: {err}")
-            break
+    try:
+        consumir_paginas(api_url, lambda offset, dados: todos_os_dados.extend(dados), headers, params,
+                         limite_pagina=limite_pagina, concorrencia=concorrencia)
+    except Exception as err:
+        # Mantém as páginas já recebidas, como na paginação anterior
+        print(f"Erro na requisição: {err}")
 
     return todos_os_dados
 
-# Buscar dados da API
-dados = buscar_dados(API_URL, headers, ultima_data_atualizacao)
+# Função para buscar os dados da API gravando cada página assim que ela chega
+@instrumentar('api.buscar_e_gravar')
+def buscar_e_gravar(api_url, headers, estado_path, estado, gravador):
+    """
+    Busca os registros atualizados depois da marca d'água e grava cada página
+    no gravador (CSV ou Parquet) assim que ela chega, de modo que a memória
+    usada se limita às páginas em trânsito. Após cada página confirmada no
+    disco, o estado registra a marca d'água e o offset da próxima página; se
+    a carga for interrompida, a próxima execução repete a mesma consulta a
+    partir desse offset, sem repetir nem perder páginas.
+
+    Retorna:
+        int: Quantidade de registros novos gravados nesta execução.
+    """
+    retomada = estado.get('em_andamento')
+    if retomada:
+        consulta, carga, offset_inicial = retomada['consulta'], retomada['carga'], retomada['proximo_offset']
+        print(f"Retomando a carga {carga} a partir do offset {offset_inicial}.")
+    else:
+        consulta = estado_inicial(estado['marca_dagua'], estado['chaves_fronteira'])
+        carga, offset_inicial = datetime.now().strftime('%Y%m%d%H%M%S'), 0
+
+    params = {}
+    if consulta['marca_dagua']:
+        params['updated_after'] = consulta['marca_dagua']
+
+    atual = estado_inicial(estado['marca_dagua'], estado['chaves_fronteira'])
+    progresso = {'proximo_offset': offset_inicial, 'gravados': 0}
+    medicao = medicao_atual()
+
+    # Grava o checkpoint se tudo o que foi recebido até aqui estiver confirmado no disco
+    def confirmar(forcar=False):
+        if gravador.confirmar(forcar):
+            gravar_estado(estado_path, registrar_checkpoint(atual, consulta, carga, progresso['proximo_offset'],
+                                                            gravador.posicao))
+
+    def ao_receber_pagina(offset, dados):
+        nonlocal atual
+        novos = filtrar_novos(dados, consulta)
+        medicao.registrar(linhas_entrada=len(dados), linhas_saida=len(novos))
+        if novos:
+            gravador.gravar(offset, novos)
+            atual = avancar_estado(atual, novos)
+            progresso['gravados'] += len(novos)
+        progresso['proximo_offset'] = offset + limite_pagina
+        confirmar()
+
+    gravador.abrir(carga, retomada)
+    try:
+        consumir_paginas(api_url, ao_receber_pagina, headers, params, limite_pagina=limite_pagina,
+                         concorrencia=concorrencia, offset_inicial=offset_inicial)
+    except Exception as err:
+        # Mantém as páginas já recebidas; a próxima execução retoma a partir delas
+        print(f"Erro na requisição: {err}")
+        confirmar(forcar=True)
+        gravador.fechar()
+        return progresso['gravados']
+
+    gravador.fechar()
+    # Carga concluída: o estado guarda só a nova marca d'água
+    gravar_estado(estado_path, atual)
+    return progresso['gravados']
+
+# Função principal: busca os registros novos da API e os grava página a página
+def executar():
+    # Obtém a última data de atualização (e um eventual ponto de retomada) do arquivo de estado
+    estado = obter_estado(estado_path, csv_path)
+    caminho_saida = csv_path if formato_saida == 'csv' else parquet_path
 
-# Processar e salvar os dados, se necessário
-if dados:
     try:
-        df = pd.DataFrame(dados)
-        df.to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False)
+        gravador = criar_gravador(caminho_saida, formato_saida)
+        gravados = buscar_e_gravar(API_URL, headers, estado_path, estado, gravador)
+        print(f"{gravados} registros novos gravados em {caminho_saida}.")
     except PermissionError:
-        print(f"Permissão negada ao salvar o arquivo: {csv_path}")
+        print(f"Permissão negada ao salvar o arquivo: {caminho_saida}")
     except Exception as e:
         print(f"Erro ao salvar os dados: {e}")
 
-print("Processamento concluído.")
+    print("Processamento concluído.")
+
+if __name__ == '__main__':
+    executar()
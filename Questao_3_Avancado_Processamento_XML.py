@@ -1,9 +1,24 @@
+import logging
 import pandas as pd
 from lxml import etree
 import re
 from pathlib import Path
 import unidecode
 from datetime import datetime
+from normalizacao_datas import converter_datas
+from intermediarios import gravar_parquet, ESQUEMA_ORCAMENTO
+from instrumentacao import instrumentar, medicao_atual, registrar_bytes_lidos
+from cache_extracao import extrair_com_cache, iterar_com_cache
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Quantidade padrão de registros por lote na leitura em streaming
+TAMANHO_LOTE_PADRAO = 50_000
+
+# Versão do achatamento no cache de extração: incrementar sempre que o DataFrame extraído do mesmo XML mudar
+VERSAO_EXTRATOR = 1
 
 # Dicionário para mapeamento dos meses em português
 meses_portugues = {
@@ -13,16 +28,60 @@ meses_portugues = {
 }
 
 def analisar_elemento(elemento, pai=None):
-    """Analisa recursivamente um elemento XML e retorna um dicionário."""
-    dados = pai.copy() if pai else {}
-    for filho in elemento:
-        if list(filho):
-            dados.update(analisar_elemento(filho, dados))
-        else:
-            chave = f"{elemento.tag}_{filho.tag}"
-            dados[chave] = filho.text
+    """Analisa um elemento XML (todos os níveis, em uma única passada) e retorna um dicionário."""
+    dados = dict(pai) if pai else {}
+    for filho in elemento.iterdescendants(etree.Element):
+        if len(filho) == 0:
+            dados[f"{filho.getparent().tag}_{filho.tag}"] = filho.text
     return dados
 
+class EsquemaXML:
+    """
+    Achata registros XML direto em colunas. O esquema compilado associa cada
+    par (tag do pai, tag da folha) ao índice da coluna, de modo que cada
+    registro é percorrido uma única vez e cada valor vai direto para a sua
+    coluna, sem dicionários intermediários. Tags novas estendem o esquema
+    (colunas anteriores ficam nulas nos registros já lidos). O esquema é
+    mantido entre os lotes; só os valores são esvaziados em extrair_df.
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.nomes = []
+        self.colunas = []
+        self.registros = 0
+
+    def _nova_coluna(self, chave):
+        indice = len(self.nomes)
+        self.indices[chave] = indice
+        self.nomes.append(f"{chave[0]}_{chave[1]}")
+        self.colunas.append([None] * self.registros)
+        return indice
+
+    def adicionar(self, elemento):
+        """Acrescenta um registro (elemento XML) às colunas."""
+        indices = self.indices
+        linha = [None] * len(self.nomes)
+        for folha in elemento.iterdescendants(etree.Element):
+            if len(folha):
+                continue
+            chave = (folha.getparent().tag, folha.tag)
+            indice = indices.get(chave)
+            if indice is None:
+                indice = self._nova_coluna(chave)
+                linha.append(None)
+            linha[indice] = folha.text
+        for coluna, valor in zip(self.colunas, linha):
+            coluna.append(valor)
+        self.registros += 1
+
+    def extrair_df(self):
+        """Monta o DataFrame com os registros acumulados e esvazia as colunas."""
+        df = pd.DataFrame(dict(zip(self.nomes, self.colunas)), columns=self.nomes)
+        self.colunas = [[] for _ in self.nomes]
+        self.registros = 0
+        return df
+
 def validar_e_corrigir_dados(dados):
     """Valida e corrige os dados conforme necessário."""
     for chave, valor in dados.items():
@@ -35,6 +94,17 @@ def validar_e_corrigir_dados(dados):
                     dados[chave] = 'Data Inválida'
     return dados
 
+def validar_e_corrigir_colunas(df):
+    """Versão vetorizada de validar_e_corrigir_dados, aplicada às colunas de data do DataFrame."""
+    for coluna in [coluna for coluna in df.columns if 'data' in coluna.lower()]:
+        valores = df[coluna].astype('string')
+        fora_iso = valores.notna() & (valores != '') & ~valores.str.match(r'\d{4}-\d{2}-\d{2}', na=False)
+        if fora_iso.any():
+            df.loc[fora_iso, coluna] = valores[fora_iso].str.replace(
+                r'(\d{2})/(\d{2})/(\d{4})', r'\3-\2-\1', regex=True
+            )
+    return df
+
 def converter_data(data_str):
     """Converte uma string de data em português para o formato dd/MM/yyyy."""
     for mes_pt, mes_en in meses_portugues.items():
@@ -43,20 +113,55 @@ def converter_data(data_str):
             break
     return datetime.strptime(data_str, '%d de %B de %Y').strftime('%d/%m/%Y')
 
+def iterar_elementos_xml(arquivo_xml):
+    """
+    Percorre o XML com iterparse, entregando cada registro (filho direto da
+    raiz) assim que ele termina de ser lido. Os elementos já processados são
+    descartados, então a árvore nunca fica inteira em memória.
+    """
+    registrar_bytes_lidos(Path(arquivo_xml).stat().st_size)
+    contexto = etree.iterparse(str(arquivo_xml), events=('end',), recover=True)
+    for _, elemento in contexto:
+        pai = elemento.getparent()
+        if pai is None or pai.getparent() is not None:
+            continue  # Raiz ou elemento interno de um registro
+        yield elemento
+        # Libera o registro e os irmãos anteriores, que a raiz ainda referencia
+        elemento.clear()
+        while elemento.getprevious() is not None:
+            del pai[0]
+    del contexto
+
+def iterar_registros_xml(arquivo_xml):
+    """Entrega o dicionário de cada registro do XML (ver iterar_elementos_xml)."""
+    for elemento in iterar_elementos_xml(arquivo_xml):
+        yield analisar_elemento(elemento)
+
+def iterar_lotes_xml(arquivo_xml, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Agrupa os registros do XML em DataFrames de até tamanho_lote linhas."""
+    esquema = EsquemaXML()
+    for elemento in iterar_elementos_xml(arquivo_xml):
+        esquema.adicionar(elemento)
+        if esquema.registros >= tamanho_lote:
+            yield validar_e_corrigir_colunas(esquema.extrair_df())
+    if esquema.registros:
+        yield validar_e_corrigir_colunas(esquema.extrair_df())
+
+def lotes_xml(arquivo_xml, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """iterar_lotes_xml passando pelo cache de extração: um XML já lido com o mesmo conteúdo não é reprocessado."""
+    return iterar_com_cache(arquivo_xml, 'xml.lotes', VERSAO_EXTRATOR,
+                            lambda: iterar_lotes_xml(arquivo_xml, tamanho_lote), tamanho_lote)
+
+def _montar_df_xml(arquivo_xml):
+    esquema = EsquemaXML()
+    for elemento in iterar_elementos_xml(arquivo_xml):
+        esquema.adicionar(elemento)
+    return validar_e_corrigir_colunas(esquema.extrair_df())
+
+@instrumentar('xml.xml_para_df')
 def xml_para_df(arquivo_xml):
-    """Converte um arquivo XML em um DataFrame do pandas."""
-    parser = etree.XMLParser(recover=True)
-    arvore = etree.parse(str(arquivo_xml), parser)
-    raiz = arvore.getroot()
-
-    linhas = []
-    for elemento in raiz:
-        dados_linha = analisar_elemento(elemento)
-        dados_linha = validar_e_corrigir_dados(dados_linha)
-        linhas.append(dados_linha)
-
-    df = pd.DataFrame(linhas)
-    return df
+    """Converte um arquivo XML em um DataFrame do pandas (via cache de extração, se ligado)."""
+    return extrair_com_cache(arquivo_xml, 'xml.df', VERSAO_EXTRATOR, lambda: _montar_df_xml(arquivo_xml))
 
 def ajustar_cabecalhos(df):
     """Ajusta os cabeçalhos das colunas para remover acentos, espaços e deixar em maiúsculas."""
@@ -77,28 +182,126 @@ def corrigir_estrutura(df):
     df['ORÇADO'] = 21.0
     df['PERRATEIO'] = 100
     
-    # Conversão personalizada de datas
-    df['ULTDATA'] = df['ULTDATA'].apply(lambda x: converter_data(x.split(', ')[-1]))
+    # Conversão de datas vetorizada (por extenso em português, dd/mm/yyyy ou ISO)
+    df['ULTDATA'] = converter_datas(df['ULTDATA'], '%d/%m/%Y')
 
     return df
 
+def transformar_lote(df):
+    """Aplica ajustar_cabecalhos e corrigir_estrutura a um lote do XML."""
+    return corrigir_estrutura(ajustar_cabecalhos(df))
+
+def preparar_lote_orcamento(df):
+    """
+    Prepara um lote do XML para a tabela ORCAMENTO: mantém os nomes
+    ORCAMENTO_* e converte ORCAMENTO_ULTDATA para o formato ISO (yyyy-mm-dd).
+    """
+    df = ajustar_cabecalhos(df)
+    df['ORCAMENTO_ULTDATA'] = converter_datas(df['ORCAMENTO_ULTDATA'], '%Y-%m-%d')
+    return df
+
+@instrumentar('xml.xml_para_arquivo')
+def xml_para_arquivo(arquivo_xml, caminho_saida, formato='csv', tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Converte o XML em CSV ou Parquet lote a lote, mantendo em memória apenas o
+    lote corrente. As colunas do arquivo são as do primeiro lote; colunas que
+    surgirem depois são descartadas com um aviso.
+
+    Parâmetros:
+        arquivo_xml (Path): Caminho do XML de orçamento.
+        caminho_saida (Path): Arquivo CSV ou Parquet a ser gerado.
+        formato (str): 'csv' ou 'parquet'.
+        tamanho_lote (int): Quantidade de registros por lote.
+
+    Retorna:
+        int: Total de linhas gravadas.
+    """
+    if formato not in ('csv', 'parquet'):
+        raise ValueError(f"Formato de saída não suportado: {formato}")
+
+    if formato == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    colunas = None
+    escritor = None
+    total = 0
+    try:
+        for df in lotes_xml(arquivo_xml, tamanho_lote):
+            df = transformar_lote(df)
+            if colunas is None:
+                colunas = list(df.columns)
+            else:
+                extras = [coluna for coluna in df.columns if coluna not in colunas]
+                if extras:
+                    logger.warning(f"Colunas ausentes no primeiro lote foram descartadas: {extras}")
+                df = df.reindex(columns=colunas)
+
+            if formato == 'csv':
+                df.to_csv(caminho_saida, mode='w' if total == 0 else 'a', header=total == 0,
+                          index=False, encoding='utf-8')
+            else:
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(str(caminho_saida), tabela.schema)
+                escritor.write_table(tabela.cast(escritor.schema))
+            total += len(df)
+            logger.info(f"{total} registros do XML gravados em {caminho_saida}.")
+    finally:
+        if escritor is not None:
+            escritor.close()
+    medicao_atual().registrar(linhas_saida=total)
+    return total
+
+@instrumentar('xml.xml_para_parquet_orcamento')
+def xml_para_parquet_orcamento(arquivo_xml, caminho_parquet, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Grava o Parquet intermediário lido pela carga da tabela ORCAMENTO: colunas
+    ORCAMENTO_* com os tipos de ESQUEMA_ORCAMENTO, um row group por lote.
+
+    Retorna:
+        int: Total de linhas gravadas.
+    """
+    lotes = (preparar_lote_orcamento(lote) for lote in lotes_xml(arquivo_xml, tamanho_lote))
+    total = gravar_parquet(lotes, caminho_parquet, ESQUEMA_ORCAMENTO)
+    medicao_atual().registrar(linhas_saida=total)
+    return total
+
 # Uso de Pathlib para lidar com o caminho do arquivo
 arquivo_xml = Path(r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\Questao 3 Avancado_Processamento_XML\ORCAMENTO.xml')
-df = xml_para_df(arquivo_xml)
+csv_output_path = Path(r'C:\Users\marce\OneDrive\Área de Trabalho\orcamento.csv')
+tamanho_lote = TAMANHO_LOTE_PADRAO  # Registros por lote (None para montar o DataFrame inteiro)
+# Parquet intermediário lido pela carga (Envio_orcamento), ao lado do CSV de ORCAMENTO; None para não gerar
+parquet_output_path = Path(r'C:\Users\marce\OneDrive\Área de Trabalho\Marcell_Felipe_Mis_senior_neobpo\Marcell_Felipe_Mis_senior_neobpo\ETL_BANCO\ORCAMENTO_.parquet')
 
-# Ajustar os cabeçalhos das colunas
-df = ajustar_cabecalhos(df)
+def executar():
+    """Converte o XML de orçamento, corrige a estrutura e salva o resultado em CSV."""
+    if parquet_output_path:
+        # Intermediário tipado para a carga da tabela ORCAMENTO
+        xml_para_parquet_orcamento(arquivo_xml, parquet_output_path, tamanho_lote or TAMANHO_LOTE_PADRAO)
 
-# Verificar as colunas presentes
-print("Colunas presentes no DataFrame:")
-print(df.columns)
+    if tamanho_lote:
+        # Cada lote é corrigido e gravado assim que lido, mantendo a memória limitada
+        xml_para_arquivo(arquivo_xml, csv_output_path, 'csv', tamanho_lote)
+        return
 
-# Corrigir a estrutura do DataFrame
-df = corrigir_estrutura(df)
+    df = xml_para_df(arquivo_xml)
 
-# Mostrar as primeiras linhas do DataFrame
-print(df.head())
+    # Ajustar os cabeçalhos das colunas
+    df = ajustar_cabecalhos(df)
 
-# Salvar o DataFrame em um arquivo CSV em um caminho alternativo
-csv_output_path = Path(r'C:\Users\marce\OneDrive\Área de Trabalho\orcamento.csv')
-df.to_csv(csv_output_path, index=False, encoding='utf-8')
+    # Verificar as colunas presentes
+    print("Colunas presentes no DataFrame:")
+    print(df.columns)
+
+    # Corrigir a estrutura do DataFrame
+    df = corrigir_estrutura(df)
+
+    # Mostrar as primeiras linhas do DataFrame
+    print(df.head())
+
+    # Salvar o DataFrame em um arquivo CSV em um caminho alternativo
+    df.to_csv(csv_output_path, index=False, encoding='utf-8')
+
+if __name__ == '__main__':
+    executar()
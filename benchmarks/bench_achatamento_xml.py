@@ -0,0 +1,64 @@
+"""
+Benchmark do achatamento de registros XML: recursão com cópia de dicionários x esquema compilado.
+
+Gera XMLs com registros aninhados e compara a vazão (registros/s) da
+implementação anterior de analisar_elemento, que copia o dicionário do pai a
+cada nível, com o EsquemaXML, que percorre cada registro uma vez e grava os
+valores direto nas colunas. Com registros mais profundos e largos a vazão do
+esquema compilado deve cair apenas na proporção do número de elementos.
+
+Uso: python benchmarks/bench_achatamento_xml.py [registros]
+"""
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_xml_aninhado
+from Questao_3_Avancado_Processamento_XML import EsquemaXML
+
+# Implementação anterior de analisar_elemento, mantida aqui para comparação
+def analisar_elemento_recursivo(elemento, pai=None):
+    dados = pai.copy() if pai else {}
+    for filho in elemento:
+        if list(filho):
+            dados.update(analisar_elemento_recursivo(filho, dados))
+        else:
+            dados[f"{elemento.tag}_{filho.tag}"] = filho.text
+    return dados
+
+def achatar_recursivo(raiz):
+    return pd.DataFrame([analisar_elemento_recursivo(elemento) for elemento in raiz])
+
+def achatar_esquema(raiz):
+    esquema = EsquemaXML()
+    for elemento in raiz:
+        esquema.adicionar(elemento)
+    return esquema.extrair_df()
+
+def principal(registros):
+    print(f"{'níveis':>7} {'campos':>7} {'colunas':>8} {'recursivo reg/s':>16} {'esquema reg/s':>14} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for niveis, campos in ((1, 6), (4, 10), (8, 10), (8, 25)):
+            caminho = gerar_xml_aninhado(os.path.join(pasta, 'aninhado.xml'), registros, niveis, campos)
+            raiz = etree.parse(caminho).getroot()
+
+            inicio = time.perf_counter()
+            antigo = achatar_recursivo(raiz)
+            recursivo = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            novo = achatar_esquema(raiz)
+            esquema = time.perf_counter() - inicio
+
+            assert antigo.equals(novo[antigo.columns]), 'Os resultados divergem'
+            print(f"{niveis:>7} {campos:>7} {novo.shape[1]:>8} {registros / recursivo:>16,.0f} "
+                  f"{registros / esquema:>14,.0f} {recursivo / esquema:>7.1f}x")
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
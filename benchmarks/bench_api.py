@@ -0,0 +1,75 @@
+"""
+Benchmark do consumo paginado da API contra um servidor local (servidor_api).
+
+Compara a paginação anterior (requests.get em série, nova conexão a cada
+página, seguindo o Link 'next') com o cliente assíncrono (sessão keep-alive e
+pré-busca de páginas por offset) em várias concorrências, e mede o cliente
+assíncrono com o servidor limitando os pedidos por segundo (429 +
+Retry-After). No cenário limitado a paginação anterior esperaria 120s a cada
+429 e por isso não é medida.
+
+Uso: python benchmarks/bench_api.py [registros] [latência em ms]
+"""
+import os
+import sys
+import time
+import logging
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_api import ServidorAPI, gerar_registros
+from cliente_api import consumir_paginas
+
+# Paginação anterior de buscar_dados (sem o tratamento de 429), mantida para comparação
+def buscar_serial(api_url):
+    params = {'limit': 100}
+    todos_os_dados = []
+    proxima_url = api_url
+    while proxima_url:
+        response = requests.get(proxima_url, params=params)
+        response.raise_for_status()
+        dados = response.json()
+        if not dados:
+            break
+        todos_os_dados.extend(dados)
+        proxima_url = response.links.get('next', {}).get('url')
+    return todos_os_dados
+
+def buscar_async(api_url, concorrencia):
+    dados = []
+    consumir_paginas(api_url, lambda offset, pagina: dados.extend(pagina), concorrencia=concorrencia)
+    return dados
+
+def medir(registros, funcao, **opcoes_servidor):
+    with ServidorAPI(registros, **opcoes_servidor) as servidor:
+        inicio = time.perf_counter()
+        dados = funcao(servidor.url)
+        segundos = time.perf_counter() - inicio
+    assert [registro['id'] for registro in dados] == [registro['id'] for registro in registros], 'Registros divergem'
+    return segundos, servidor
+
+def principal(quantidade, latencia_ms):
+    logging.basicConfig(level=logging.ERROR)
+    registros = gerar_registros(quantidade)
+    latencia = latencia_ms / 1000
+    print(f"{quantidade} registros ({quantidade // 100} páginas), latência {latencia_ms} ms por pedido")
+    print(f"{'cliente':<34} {'segundos':>9} {'registros/s':>12} {'pedidos':>8} {'conexões':>9} {'429':>5}")
+
+    cenarios = [('série (requests, Link next)', buscar_serial, {})]
+    for concorrencia in (1, 4, 8, 16):
+        cenarios.append((f'assíncrono, concorrência {concorrencia}',
+                         lambda url, c=concorrencia: buscar_async(url, c), {}))
+    cenarios.append(('assíncrono 16, limite 40 pedidos/s', lambda url: buscar_async(url, 16),
+                     {'pedidos_por_segundo': 40, 'retry_after': 1}))
+
+    for nome, funcao, opcoes in cenarios:
+        segundos, servidor = medir(registros, funcao, latencia=latencia, **opcoes)
+        print(f"{nome:<34} {segundos:>9.2f} {quantidade / segundos:>12,.0f} {servidor.pedidos:>8} "
+              f"{servidor.conexoes:>9} {servidor.respostas_429:>5}")
+
+if __name__ == '__main__':
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    latencia_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    principal(quantidade, latencia_ms)
@@ -0,0 +1,60 @@
+"""
+Benchmark do cache de extração (cache_extracao).
+
+Gera o PDF de centros de custo, o XML de orçamento e o CSV de despesas
+sintéticos e mede cada extração três vezes: sem cache, com o cache vazio
+(extrai e grava a entrada) e com o cache preenchido (lê o Parquet guardado).
+O terceiro caso é o de uma execução em que o download trouxe arquivos
+idênticos aos da anterior.
+
+Uso: python benchmarks/bench_cache_extracao.py [linhas do CSV] [registros do XML] [páginas do PDF]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_csv_despesas, gerar_xml_orcamento, gerar_pdf_centro_custo
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def principal(linhas_csv, registros_xml, paginas_pdf):
+    logging.disable(logging.WARNING)
+    import cache_extracao
+    from intermediarios import ler_intermediario
+    from pipeline import carregar_modulo
+    pdf = carregar_modulo('Questao4_Extracao_de_Dados_de PDF_para_CSV.py')
+    xml = carregar_modulo('Questao_3_Avancado_Processamento_XML.py')
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_pdf = gerar_pdf_centro_custo(os.path.join(pasta, 'CENTRO_DE_CUSTO.pdf'), paginas_pdf)
+        caminho_xml = gerar_xml_orcamento(os.path.join(pasta, 'ORCAMENTO.xml'), registros_xml)
+        caminho_csv = gerar_csv_despesas(os.path.join(pasta, 'DESPESAS_.csv'), linhas_csv)
+        saida_csv = os.path.join(pasta, 'CENTRO_DE_CUSTO.csv')
+
+        extracoes = [
+            (f'pdf.centro_custo ({paginas_pdf} páginas)', lambda: pdf.principal(caminho_pdf, saida_csv, 1)),
+            (f'xml.xml_para_df ({registros_xml} registros)', lambda: xml.xml_para_df(caminho_xml)),
+            (f'csv.DESPESAS ({linhas_csv} linhas)', lambda: ler_intermediario(caminho_csv, 'DESPESAS')),
+        ]
+        print(f"{'extração':<36} {'sem cache':>10} {'cache vazio':>12} {'acerto':>9}")
+        for nome, extrair in extracoes:
+            cache_extracao.desativar()
+            sem_cache, _ = cronometrar(extrair)
+            cache_extracao.ativar(os.path.join(pasta, 'cache'))
+            falha, _ = cronometrar(extrair)
+            acerto, _ = cronometrar(extrair)
+            print(f"{nome:<36} {sem_cache:>10.3f} {falha:>12.3f} {acerto:>9.3f}")
+        print(f"\ncontadores: {cache_extracao.estatisticas()}")
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 200_000,
+              int(sys.argv[3]) if len(sys.argv) > 3 else 50)
@@ -0,0 +1,72 @@
+"""
+Benchmark da conversão de ORCAMENTO_ULTDATA: conversão linha a linha x vetorizada.
+
+Gera uma coluna de datas por extenso em português (como no XML de orçamento)
+e compara converter_data aplicado linha a linha (implementação anterior de
+corrigir_estrutura) com converter_datas, que converte a coluna inteira e
+memoriza os valores distintos. A conversão vetorizada é medida com o cache
+vazio e novamente com o cache preenchido (caso dos lotes seguintes).
+
+Uso: python benchmarks/bench_datas.py [linhas]
+"""
+import os
+import sys
+import time
+import random
+from datetime import date, timedelta
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import normalizacao_datas
+from geradores import DIAS_SEMANA, MESES
+from normalizacao_datas import converter_datas
+from Questao_3_Avancado_Processamento_XML import converter_data
+
+# Função para gerar a coluna de datas por extenso, com valores repetidos como no arquivo real
+def gerar_coluna(linhas, formato='extenso', semente=42):
+    aleatorio = random.Random(semente)
+    inicio = date(2020, 1, 1)
+    distintos = []
+    for deslocamento in range(5 * 365):
+        dia = inicio + timedelta(days=deslocamento)
+        if formato == 'extenso':
+            distintos.append(f"{DIAS_SEMANA[dia.weekday()]}, {dia.day} de {MESES[dia.month - 1]} de {dia.year}")
+        elif formato == 'barras':
+            distintos.append(dia.strftime('%d/%m/%Y'))
+        else:
+            distintos.append(dia.isoformat())
+    return pd.Series(aleatorio.choices(distintos, k=linhas), name='ULTDATA')
+
+# Função para medir o tempo de uma conversão
+def medir(funcao, serie):
+    inicio = time.perf_counter()
+    resultado = funcao(serie)
+    return time.perf_counter() - inicio, resultado
+
+def principal(linhas):
+    serie = gerar_coluna(linhas)
+    print(f"{linhas} linhas, {serie.nunique()} datas distintas")
+    print(f"{'conversão':<32} {'segundos':>9} {'speedup':>8}")
+
+    base, antigo = medir(lambda s: s.apply(lambda x: converter_data(x.split(', ')[-1])), serie)
+    print(f"{'linha a linha (converter_data)':<32} {base:>9.2f} {1:>7.1f}x")
+
+    normalizacao_datas._cache.clear()
+    segundos, novo = medir(lambda s: converter_datas(s, '%d/%m/%Y'), serie)
+    print(f"{'vetorizada, cache vazio':<32} {segundos:>9.2f} {base / segundos:>7.1f}x")
+    segundos, _ = medir(lambda s: converter_datas(s, '%d/%m/%Y'), serie)
+    print(f"{'vetorizada, cache preenchido':<32} {segundos:>9.2f} {base / segundos:>7.1f}x")
+
+    assert (antigo.values == novo.values).all(), 'As conversões divergem'
+
+    # Formatos mistos só são aceitos pela conversão vetorizada
+    normalizacao_datas._cache.clear()
+    mista = pd.concat([gerar_coluna(linhas // 3, formato) for formato in ('extenso', 'barras', 'iso')],
+                      ignore_index=True)
+    segundos, _ = medir(converter_datas, mista)
+    print(f"{'vetorizada, formatos mistos':<32} {segundos:>9.2f}")
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
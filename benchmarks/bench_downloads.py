@@ -0,0 +1,76 @@
+"""
+Benchmark do gerenciador de downloads contra um servidor HTTP local.
+
+Serve três arquivos (dois compactados em zip, como o Kaggle faz, e um .xlsx)
+com latência e banda limitada por conexão e mede:
+- download em série (1 por vez) x em paralelo (pool limitado);
+- reexecução sem mudanças (nenhum byte transferido);
+- retomada após queda de conexão no meio da transferência (bytes reenviados).
+
+Uso: python benchmarks/bench_downloads.py [MB por arquivo] [MB/s por conexão]
+"""
+import io
+import os
+import sys
+import time
+import logging
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_arquivos import ServidorArquivos
+from gerenciador_downloads import baixar_arquivos
+
+# Função para compactar um conteúdo em zip, como o Kaggle faz com arquivos grandes
+def compactar(nome, conteudo):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zip_ref:
+        zip_ref.writestr(nome, conteudo)
+    return buffer.getvalue()
+
+def gerar_arquivos(megabytes):
+    tamanho = int(megabytes * 1024 * 1024)
+    return {
+        'orcamento.xml': (compactar('orcamento.xml', os.urandom(tamanho)), 'orcamento.xml.zip'),
+        'despesas.xlsx': (os.urandom(tamanho), 'despesas.xlsx'),
+        'centro_de_custo.pdf': (compactar('centro_de_custo.pdf', os.urandom(tamanho)), 'centro_de_custo.pdf.zip'),
+    }
+
+# Função para executar um cenário e medir tempo, bytes enviados e status de cada arquivo
+def medir(arquivos, pasta, max_downloads, **opcoes_servidor):
+    with ServidorArquivos(arquivos, **opcoes_servidor) as servidor:
+        urls = {nome: servidor.url(nome) for nome in arquivos}
+        inicio = time.perf_counter()
+        resultados = baixar_arquivos(urls, pasta, max_downloads=max_downloads, fator_espera=0.1)
+        segundos = time.perf_counter() - inicio
+    status = ','.join(sorted({resultado['status'] for resultado in resultados.values()}))
+    return segundos, servidor.bytes_enviados, status
+
+def principal(megabytes, mb_por_segundo):
+    logging.basicConfig(level=logging.WARNING)
+    arquivos = gerar_arquivos(megabytes)
+    total_mb = sum(len(conteudo) for conteudo, _ in arquivos.values()) / 1024 / 1024
+    opcoes = {'latencia': 0.2, 'bytes_por_segundo': mb_por_segundo * 1024 * 1024}
+    print(f"3 arquivos, {total_mb:.1f} MB no total, {mb_por_segundo} MB/s por conexão")
+    print(f"{'cenário':<34} {'segundos':>9} {'MB enviados':>12}  status")
+
+    with tempfile.TemporaryDirectory() as serie, tempfile.TemporaryDirectory() as paralelo:
+        for nome, pasta, max_downloads, extra in (
+            ('série (1 download por vez)', serie, 1, {}),
+            ('paralelo (3 downloads)', paralelo, 3, {}),
+            ('reexecução sem mudanças', paralelo, 3, {}),
+        ):
+            segundos, enviados, status = medir(arquivos, pasta, max_downloads, **opcoes, **extra)
+            print(f"{nome:<34} {segundos:>9.2f} {enviados / 1024 / 1024:>12.1f}  {status}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        segundos, enviados, status = medir(arquivos, pasta, 3, cair_apos_bytes=len(arquivos['despesas.xlsx'][0]) // 2,
+                                           **opcoes)
+        print(f"{'queda no meio + retomada':<34} {segundos:>9.2f} {enviados / 1024 / 1024:>12.1f}  {status}")
+
+if __name__ == '__main__':
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    mb_por_segundo = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+    principal(megabytes, mb_por_segundo)
@@ -0,0 +1,63 @@
+"""
+Relatório de memória por entidade: leitura com tipos inferidos x registro de esquemas.
+
+Para cada entidade do registro (esquemas.ESQUEMAS), gera um CSV sintético e
+compara a memória (memory_usage com deep=True) do DataFrame lido como as
+cargas liam antes (pd.read_csv sem tipos; em CONTAS, seguido da conversão de
+CODCONTA com astype(str)/replace/astype(int)) com a leitura tipada
+(esquemas.ler_csv_tipado: inteiros estreitos, categorias, decimais e datas).
+
+Uso: python benchmarks/bench_esquemas.py [linhas] [--colunas]
+"""
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_csv_contas, gerar_csv_centro_custo, gerar_csv_orcamento, gerar_csv_despesas
+from esquemas import ESQUEMAS, ler_csv_tipado, memoria_por_coluna
+
+GERADORES = {
+    'CONTAS': gerar_csv_contas,
+    'CENTRO_DE_CUSTO': gerar_csv_centro_custo,
+    'ORCAMENTO': gerar_csv_orcamento,
+    'DESPESAS': gerar_csv_despesas,
+}
+
+# Leitura anterior das cargas, sem tipos declarados
+def ler_inferido(caminho, entidade):
+    df = pd.read_csv(caminho)
+    if entidade == 'CONTAS':
+        df['CODCONTA'] = df['CODCONTA'].astype(str).str.replace('.', '').astype(int)
+    return df
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def principal(linhas, detalhar_colunas=False):
+    print(f"{linhas} linhas por entidade")
+    print(f"{'entidade':<16} {'inferido MB':>12} {'registro MB':>12} {'economia':>9} "
+          f"{'leitura inferida (s)':>21} {'leitura tipada (s)':>19}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for entidade in ESQUEMAS:
+            caminho = GERADORES[entidade](os.path.join(pasta, f'{entidade}.csv'), linhas)
+            segundos_inferido, inferido = cronometrar(ler_inferido, caminho, entidade)
+            segundos_tipado, tipado = cronometrar(ler_csv_tipado, caminho, entidade)
+            antes = memoria_por_coluna(inferido)
+            depois = memoria_por_coluna(tipado)
+            print(f"{entidade:<16} {antes.sum():>12.2f} {depois.sum():>12.2f} "
+                  f"{1 - depois.sum() / antes.sum():>8.0%} {segundos_inferido:>21.2f} {segundos_tipado:>19.2f}")
+            if detalhar_colunas:
+                for coluna in tipado.columns:
+                    print(f"    {coluna:<26} {str(inferido[coluna].dtype):>10} {antes[coluna]:>8.2f} MB"
+                          f" -> {str(tipado[coluna].dtype):>10} {depois[coluna]:>8.2f} MB")
+
+if __name__ == '__main__':
+    argumentos = [valor for valor in sys.argv[1:] if not valor.startswith('--')]
+    principal(int(argumentos[0]) if argumentos else 1_000_000, '--colunas' in sys.argv)
@@ -0,0 +1,49 @@
+"""
+Benchmark da extração de texto do PDF de centros de custo: série x pool de processos.
+
+Gera um PDF sintético com várias páginas e mede, para cada quantidade de
+processos, o tempo total e o tempo até a primeira página chegar ao consumidor
+(a extração paralela entrega as páginas em ordem assim que ficam prontas).
+
+Uso: python benchmarks/bench_extracao_pdf.py [páginas] [processos ...]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_pdf_centro_custo
+from extracao_pdf import iterar_textos_pdf, PROCESSOS_PADRAO
+
+# Função para consumir a extração e medir o tempo total e até a primeira página
+def medir_extracao(caminho_pdf, processos):
+    inicio = time.perf_counter()
+    primeira = None
+    linhas = 0
+    for texto in iterar_textos_pdf(caminho_pdf, processos=processos):
+        if primeira is None:
+            primeira = time.perf_counter() - inicio
+        linhas += texto.count('\n') + 1
+    return {'segundos': time.perf_counter() - inicio, 'primeira_pagina_s': primeira, 'linhas': linhas}
+
+def principal(paginas, lista_processos):
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_pdf = gerar_pdf_centro_custo(os.path.join(pasta, 'CENTRO_DE_CUSTO.pdf'), paginas)
+        print(f"{paginas} páginas, {os.path.getsize(caminho_pdf) / 1024:.0f} KB")
+        print(f"{'processos':>10} {'linhas':>8} {'segundos':>9} {'1ª página s':>12} {'speedup':>8}")
+        base = None
+        for processos in lista_processos:
+            resultado = medir_extracao(caminho_pdf, processos)
+            base = base or resultado['segundos']
+            print(f"{processos:>10} {resultado['linhas']:>8} {resultado['segundos']:>9.2f} "
+                  f"{resultado['primeira_pagina_s']:>12.2f} {base / resultado['segundos']:>7.1f}x")
+
+if __name__ == '__main__':
+    paginas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    lista_processos = [int(valor) for valor in sys.argv[2:]] or sorted({1, 2, 4, PROCESSOS_PADRAO})
+    principal(paginas, lista_processos)
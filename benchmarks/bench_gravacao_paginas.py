@@ -0,0 +1,73 @@
+"""
+Benchmark da memória usada para gravar o resultado da API.
+
+Compara a gravação anterior (todas as páginas acumuladas em todos_os_dados e
+um único DataFrame acrescentado ao CSV no fim) com a gravação página a página
+(gravacao_paginas, CSV e Parquet) contra o servidor local (servidor_api). O
+pico de memória (tracemalloc) da gravação anterior cresce com a quantidade de
+registros; o da gravação por página fica limitado às páginas em trânsito.
+
+Uso: python benchmarks/bench_gravacao_paginas.py [registros] [limite da página]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_api import ServidorAPI, gerar_registros
+from cliente_api import consumir_paginas
+from gravacao_paginas import criar_gravador
+
+# Gravação anterior: acumula todas as páginas e grava um único DataFrame no fim
+def gravar_acumulando(api_url, pasta, limite_pagina):
+    caminho = os.path.join(pasta, 'acumulado.csv')
+    todos_os_dados = []
+    consumir_paginas(api_url, lambda offset, dados: todos_os_dados.extend(dados), limite_pagina=limite_pagina)
+    pd.DataFrame(todos_os_dados).to_csv(caminho, mode='a', header=True, index=False)
+    return caminho
+
+def gravar_por_pagina(api_url, pasta, limite_pagina, formato):
+    caminho = os.path.join(pasta, f'por_pagina.{formato}')
+    gravador = criar_gravador(caminho, formato)
+    gravador.abrir('carga')
+
+    def ao_receber_pagina(offset, dados):
+        gravador.gravar(offset, dados)
+        gravador.confirmar()
+
+    consumir_paginas(api_url, ao_receber_pagina, limite_pagina=limite_pagina)
+    gravador.fechar()
+    return caminho
+
+def principal(quantidade, limite_pagina):
+    logging.basicConfig(level=logging.ERROR)
+    registros = gerar_registros(quantidade)
+    pasta = tempfile.mkdtemp()
+    print(f"{quantidade} registros, páginas de {limite_pagina}")
+    print(f"{'gravação':<28} {'segundos':>9} {'pico de memória (MB)':>21}")
+
+    cenarios = [
+        ('acumulada (todos_os_dados)', lambda url: gravar_acumulando(url, pasta, limite_pagina)),
+        ('por página, CSV', lambda url: gravar_por_pagina(url, pasta, limite_pagina, 'csv')),
+        ('por página, Parquet', lambda url: gravar_por_pagina(url, pasta, limite_pagina, 'parquet')),
+    ]
+    for nome, funcao in cenarios:
+        with ServidorAPI(registros) as servidor:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            funcao(servidor.url)
+            segundos = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        print(f"{nome:<28} {segundos:>9.2f} {pico / 1024 / 1024:>21.1f}")
+
+if __name__ == '__main__':
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    limite_pagina = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    principal(quantidade, limite_pagina)
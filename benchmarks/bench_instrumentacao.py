@@ -0,0 +1,46 @@
+"""
+Custo da instrumentação por chamada (instrumentacao.instrumentar).
+
+Mede uma função trivial sem decorador, decorada com a instrumentação
+desligada (o padrão, sem NEOBPO_METRICAS) e decorada com a instrumentação
+ligada, gravando as métricas em um JSONL temporário.
+
+Uso: python benchmarks/bench_instrumentacao.py [chamadas]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentacao
+from instrumentacao import instrumentar, ativar, desativar
+
+def somar(valores):
+    return sum(valores)
+
+somar_instrumentada = instrumentar('bench.somar')(somar)
+
+def microssegundos_por_chamada(funcao, chamadas):
+    valores = list(range(10))
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        funcao(valores)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+def principal(chamadas):
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"{chamadas} chamadas")
+        print(f"{'cenário':<28} {'µs por chamada':>15}")
+        desativar()
+        print(f"{'sem decorador':<28} {microssegundos_por_chamada(somar, chamadas):>15.2f}")
+        print(f"{'decorada, desligada':<28} {microssegundos_por_chamada(somar_instrumentada, chamadas):>15.2f}")
+        ativar(os.path.join(pasta, 'metricas.jsonl'))
+        print(f"{'decorada, ligada':<28} {microssegundos_por_chamada(somar_instrumentada, chamadas // 100):>15.2f}")
+        desativar()
+        # O resumo do atexit não se aplica ao benchmark
+        instrumentacao._registros.clear()
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
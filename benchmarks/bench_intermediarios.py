@@ -0,0 +1,68 @@
+"""
+Benchmark do arquivo intermediário entre a extração e a carga: CSV x Parquet.
+
+Para o DESPESAS_ sintético, compara o CSV (gravado com to_csv e lido com
+os tipos do registro de esquemas, como na carga) com o Parquet de esquema declarado
+(intermediarios): tempo de gravação, de leitura completa e em blocos, e
+tamanho do arquivo. Os DataFrames lidos dos dois formatos são conferidos
+(mesmos tipos e valores).
+
+Uso: python benchmarks/bench_intermediarios.py [linhas ...]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_csv_despesas
+from intermediarios import (ESQUEMA_DESPESAS, converter_csv_para_parquet, gravar_parquet, ler_parquet,
+                            ler_parquet_em_blocos)
+from esquemas import ler_csv_tipado
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def ler_todos_os_blocos(blocos):
+    return sum(len(bloco) for bloco in blocos)
+
+def principal(tamanhos, tamanho_bloco=100_000):
+    logging.basicConfig(level=logging.ERROR)
+    print(f"{'linhas':>10} {'formato':>8} {'MB':>7} {'gravação (s)':>13} {'leitura (s)':>12} {'em blocos (s)':>14}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in tamanhos:
+            origem = gerar_csv_despesas(os.path.join(pasta, f'origem_{linhas}.csv'), linhas)
+            # Uma vez por arquivo: datas no formato ISO, como a carga envia ao banco
+            df = ler_parquet(converter_csv_para_parquet(origem, ESQUEMA_DESPESAS))
+
+            caminho_csv = os.path.join(pasta, f'despesas_{linhas}.csv')
+            caminho_parquet = os.path.join(pasta, f'despesas_{linhas}.parquet')
+            formatos = {
+                'csv': (caminho_csv,
+                        lambda: df.to_csv(caminho_csv, index=False),
+                        lambda: ler_csv_tipado(caminho_csv, 'DESPESAS'),
+                        lambda: ler_csv_tipado(caminho_csv, 'DESPESAS', tamanho_bloco)),
+                'parquet': (caminho_parquet,
+                            lambda: gravar_parquet(df, caminho_parquet, ESQUEMA_DESPESAS),
+                            lambda: ler_parquet(caminho_parquet),
+                            lambda: ler_parquet_em_blocos(caminho_parquet, tamanho_bloco)),
+            }
+            lidos = {}
+            for formato, (caminho, gravar, ler, ler_blocos) in formatos.items():
+                gravacao, _ = cronometrar(gravar)
+                leitura, lidos[formato] = cronometrar(ler)
+                em_blocos, total = cronometrar(lambda: ler_todos_os_blocos(ler_blocos()))
+                assert total == linhas
+                megabytes = os.path.getsize(caminho) / 1024 / 1024
+                print(f"{linhas:>10} {formato:>8} {megabytes:>7.1f} {gravacao:>13.2f} {leitura:>12.2f} "
+                      f"{em_blocos:>14.2f}")
+            assert lidos['csv'].equals(lidos['parquet']), 'CSV e Parquet divergem'
+
+if __name__ == '__main__':
+    tamanhos = [int(valor) for valor in sys.argv[1:]] or [100_000, 1_000_000]
+    principal(tamanhos)
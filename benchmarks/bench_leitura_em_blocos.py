@@ -0,0 +1,77 @@
+"""
+Benchmark de memória da carga de despesas: leitura completa x leitura em blocos.
+
+Para cada tamanho de arquivo, a carga roda em um subprocesso separado (para
+isolar o pico de memória) contra um banco SQLite temporário, e o pico de RSS é
+reportado. Na leitura em blocos o pico deve ficar estável conforme o arquivo cresce.
+
+Uso: python benchmarks/bench_leitura_em_blocos.py [linhas ...]
+"""
+import os
+import sys
+import json
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_csv_despesas
+from leitura_em_blocos import ler_csv_em_blocos, carregar_em_blocos
+
+TIPOS_DESPESAS = {
+    'DTBASE': 'string',
+    'CODIGOCENTROCUSTO': 'Int64',
+    'CENTROCUSTOMASTER': 'Int64',
+    'VLDESPESA': 'float64',
+    'CODFILIALPRINCIPAL': 'Int64',
+    'CODCONTA': 'Int64',
+    'MES_A': 'string',
+}
+
+# Função executada no subprocesso: carrega o CSV no SQLite e devolve tempo e pico de RSS
+def medir_carga(caminho_csv, modo, tamanho_bloco):
+    with tempfile.TemporaryDirectory() as pasta:
+        conexao = sqlite3.connect(os.path.join(pasta, 'bench.db'))
+        inicio = time.perf_counter()
+        if modo == 'blocos':
+            carregar_em_blocos(
+                ler_csv_em_blocos(caminho_csv, TIPOS_DESPESAS, tamanho_bloco),
+                lambda bloco: bloco.to_sql('DESPESAS', conexao, if_exists='append', index=False),
+                TIPOS_DESPESAS,
+            )
+        else:
+            df = pd.read_csv(caminho_csv, dtype=TIPOS_DESPESAS)
+            df.to_sql('DESPESAS', conexao, if_exists='append', index=False)
+        segundos = time.perf_counter() - inicio
+        conexao.close()
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico_mb = pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+    return {'segundos': segundos, 'pico_rss_mb': pico_mb}
+
+def principal(tamanhos, tamanho_bloco=100_000):
+    print(f"{'linhas':>10} {'modo':>8} {'tamanho MB':>11} {'segundos':>9} {'pico RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in tamanhos:
+            caminho_csv = gerar_csv_despesas(os.path.join(pasta, f'despesas_{linhas}.csv'), linhas)
+            tamanho_mb = os.path.getsize(caminho_csv) / 1024 / 1024
+            for modo in ('completo', 'blocos'):
+                saida = subprocess.run(
+                    [sys.executable, __file__, '--medir', caminho_csv, modo, str(tamanho_bloco)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                resultado = json.loads(saida.strip().splitlines()[-1])
+                print(f"{linhas:>10} {modo:>8} {tamanho_mb:>11.1f} {resultado['segundos']:>9.2f} "
+                      f"{resultado['pico_rss_mb']:>12.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--medir':
+        print(json.dumps(medir_carga(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+    else:
+        tamanhos = [int(valor) for valor in sys.argv[1:]] or [100_000, 500_000, 2_000_000]
+        principal(tamanhos)
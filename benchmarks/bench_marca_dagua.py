@@ -0,0 +1,63 @@
+"""
+Benchmark da obtenção da última data de atualização antes da chamada à API.
+
+Compara a varredura completa do resultados.csv (obter_ultima_data_atualizacao
+anterior, que lia todas as linhas a cada execução) com a leitura do arquivo de
+estado (estado_incremental) para históricos de tamanhos crescentes. A
+varredura cresce com o histórico; a leitura do estado é constante.
+
+Uso: python benchmarks/bench_marca_dagua.py [maior quantidade de linhas]
+"""
+import os
+import sys
+import csv
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from servidor_api import gerar_registros
+from estado_incremental import ler_estado, gravar_estado, estado_a_partir_do_csv
+
+# Leitura anterior da última data (varredura completa do CSV), mantida para comparação
+def ultima_data_por_varredura(csv_path):
+    with open(csv_path, mode='r') as file:
+        reader = csv.DictReader(file)
+        datas = [row['last_updated'] for row in reader if row['last_updated']]
+        return max(datas) if datas else None
+
+def cronometrar(funcao, *args, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        segundos = time.perf_counter() - inicio
+        melhor = segundos if melhor is None else min(melhor, segundos)
+    return melhor, resultado
+
+def principal(maximo):
+    pasta = tempfile.mkdtemp()
+    csv_path = os.path.join(pasta, 'resultados.csv')
+    estado_path = os.path.join(pasta, 'resultados_estado.json')
+    print(f"{'linhas':>10} {'MB':>7} {'varredura (s)':>14} {'estado (ms)':>12} {'ganho':>9}")
+
+    quantidade = 10_000
+    while quantidade <= maximo:
+        registros = gerar_registros(quantidade)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=list(registros[0]))
+            escritor.writeheader()
+            escritor.writerows(registros)
+        gravar_estado(estado_path, estado_a_partir_do_csv(csv_path))
+
+        varredura, data_csv = cronometrar(ultima_data_por_varredura, csv_path)
+        leitura, estado = cronometrar(ler_estado, estado_path)
+        assert estado['marca_dagua'] == data_csv, 'Marca d\'água diverge da varredura'
+        megabytes = os.path.getsize(csv_path) / 1024 / 1024
+        print(f"{quantidade:>10,} {megabytes:>7.1f} {varredura:>14.3f} {leitura * 1000:>12.3f} "
+              f"{varredura / leitura:>8,.0f}x")
+        quantidade *= 10
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
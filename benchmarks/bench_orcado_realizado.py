@@ -0,0 +1,102 @@
+"""
+Benchmark do agregado ORCADO_REALIZADO (orçado x realizado) em SQLite.
+
+Carrega ORCAMENTO e DespesasDetalhadas sintéticos (60 meses) e mede:
+  - manutenção de um bloco de despesas: recálculo só dos grupos afetados
+    (orcado_realizado.atualizar_chaves) x reconstrução do agregado inteiro;
+  - consulta orçado x realizado por mês: na tabela agregada x reagregando as
+    tabelas fato, como os painéis faziam.
+
+Uso: python benchmarks/bench_orcado_realizado.py [linhas por tabela] [linhas do bloco]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+# Gera as duas tabelas fato com contas, centros de custo e filiais em comum
+def gerar_fatos(linhas, semente=42):
+    aleatorio = np.random.default_rng(semente)
+    meses = pd.date_range('2020-01-01', periods=60, freq='MS')
+    mes = meses[np.arange(linhas) % 60]
+    orcamento = pd.DataFrame({
+        'ORCAMENTO_ULTDATA': (mes + pd.Timedelta(days=27)).strftime('%Y-%m-%d'),
+        'ORCAMENTO_FILIALCOD': aleatorio.integers(1, 20, linhas),
+        'ORCAMENTO_CONTACOD': aleatorio.integers(1000, 1500, linhas),
+        'ORCAMENTO_CENTROCUSTOCOD': np.arange(linhas) // 60,
+        'ORCAMENTO_ORCADO': aleatorio.uniform(10, 10_000, linhas).round(2),
+        'ORCAMENTO_PERRATEIO': 100.0,
+    })
+    despesas = pd.DataFrame({
+        'DTBASE': (mes + pd.Timedelta(days=27)).strftime('%Y-%m-%d'),
+        'CODIGOCENTROCUSTO': orcamento['ORCAMENTO_CENTROCUSTOCOD'],
+        'CENTROCUSTOMASTER': 1,
+        'VLDESPESA': aleatorio.uniform(10, 10_000, linhas).round(2),
+        'CODFILIALPRINCIPAL': orcamento['ORCAMENTO_FILIALCOD'],
+        'CODCONTA': orcamento['ORCAMENTO_CONTACOD'],
+        'MES_A': mes.strftime('%Y-%m-%d'),
+    })
+    return orcamento, despesas
+
+def principal(linhas, linhas_bloco):
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['NEOBPO_DB_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+        from conexao_bd import obter_engine
+        from carga_em_lote import inserir_em_lote
+        from pipeline import carregar_modulo
+        import orcado_realizado
+
+        engine = obter_engine()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE CONTAS (CODCONTA INT PRIMARY KEY)")
+            conn.exec_driver_sql("CREATE TABLE CENTRO_DE_CUSTO (CODIGOCENTROCUSTO INT PRIMARY KEY)")
+        carregar_modulo('Envio_orcamento.py').criar_tabela_orcamento(engine)
+        carregar_modulo('DespesaDetalhadas.py').criar_tabela_despesas(engine)
+
+        orcamento, despesas = gerar_fatos(linhas)
+        conexao = engine.raw_connection()
+        inserir_em_lote(conexao, orcamento, 'ORCAMENTO')
+        inserir_em_lote(conexao, despesas, 'DespesasDetalhadas')
+        conexao.close()
+
+        segundos, _ = cronometrar(orcado_realizado.criar_tabela_orcado_realizado, engine)
+        print(f"{linhas} linhas em cada tabela fato; agregado montado em {segundos:.2f}s")
+
+        # Bloco de despesas já gravado nas tabelas fato; mede só a manutenção do agregado
+        bloco = despesas.sample(linhas_bloco, random_state=1)
+        with engine.begin() as conn:
+            segundos_chaves, gravadas = cronometrar(
+                orcado_realizado.atualizar_chaves, conn, orcado_realizado.chaves_afetadas(bloco, 'DespesasDetalhadas'))
+        with engine.begin() as conn:
+            segundos_total, _ = cronometrar(orcado_realizado.reconstruir, conn)
+        print(f"\nmanutenção após um bloco de {linhas_bloco} linhas")
+        print(f"  recálculo dos grupos afetados: {segundos_chaves:>7.3f}s ({gravadas} linhas do agregado)")
+        print(f"  reconstrução do agregado:      {segundos_total:>7.3f}s")
+
+        def consulta_fatos():
+            with engine.connect() as conn:
+                sql, parametros = orcado_realizado._select_fatos(conn)
+                return conn.exec_driver_sql(f"SELECT MES_A, SUM(ORCADO), SUM(REALIZADO) FROM ({sql}) g "
+                                            f"GROUP BY MES_A", parametros).fetchall()
+
+        segundos_agregado, resultado = cronometrar(
+            lambda: orcado_realizado.consultar_orcado_realizado(engine, agrupar_por=['MES_A']))
+        segundos_fatos, _ = cronometrar(consulta_fatos)
+        print(f"\nconsulta orçado x realizado por mês ({len(resultado)} meses)")
+        print(f"  na tabela agregada:           {segundos_agregado:>7.3f}s")
+        print(f"  reagregando as tabelas fato:  {segundos_fatos:>7.3f}s")
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 5_000)
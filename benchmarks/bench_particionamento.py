@@ -0,0 +1,70 @@
+"""
+Benchmark da recarga de um mês da tabela DespesasDetalhadas.
+
+Carrega um DESPESAS_.csv sintético (60 meses) em SQLite e compara o custo de
+recarregar um mês:
+  - mesclando o arquivo inteiro (MERGE via staging, como a carga fazia);
+  - substituindo só o mês pedido a partir do arquivo inteiro (meses_carga);
+  - substituindo o mês a partir de um arquivo só com aquele mês.
+No SQLite a troca de partição é emulada com DELETE + INSERT do mês; no SQL
+Server é TRUNCATE da partição + ALTER TABLE ... SWITCH.
+
+Uso: python benchmarks/bench_particionamento.py [linhas]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_csv_despesas
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def principal(linhas):
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['NEOBPO_DB_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+        from conexao_bd import obter_engine
+        from pipeline import carregar_modulo
+        engine = obter_engine()
+        arquivo = gerar_csv_despesas(os.path.join(pasta, 'DESPESAS_.csv'), linhas)
+        df = pd.read_csv(arquivo)
+
+        # Dimensões com os códigos do arquivo (as despesas órfãs seriam descartadas)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE CONTAS (CODCONTA INT PRIMARY KEY)")
+            conn.exec_driver_sql("CREATE TABLE CENTRO_DE_CUSTO (CODIGOCENTROCUSTO INT PRIMARY KEY)")
+            conn.exec_driver_sql("INSERT INTO CONTAS VALUES (?)", [(int(codigo),) for codigo in df['CODCONTA'].unique()])
+            conn.exec_driver_sql("INSERT INTO CENTRO_DE_CUSTO VALUES (?)",
+                                 [(int(codigo),) for codigo in df['CODIGOCENTROCUSTO'].unique()])
+        arquivo_mes = os.path.join(pasta, 'DESPESAS_2021_03.csv')
+        df[df['MES_A'] == '2021/03/01'].to_csv(arquivo_mes, index=False)
+
+        modulo = carregar_modulo('DespesaDetalhadas.py')
+        modulo.criar_tabela_despesas(engine)
+        segundos, _ = cronometrar(modulo.enviar_para_sql_server, engine, modulo.ler_csv(arquivo), 'DespesasDetalhadas')
+        print(f"{linhas} linhas em 60 meses; carga inicial em {segundos:.2f}s")
+        print(f"{'recarga de 2021-03':<44} {'segundos':>9} {'linhas escritas':>16}")
+
+        cenarios = [
+            ('MERGE do arquivo inteiro', lambda: modulo.enviar_para_sql_server(
+                engine, modulo.ler_csv(arquivo), 'DespesasDetalhadas')),
+            ('substituir 2021-03, lendo o arquivo inteiro', lambda: modulo.substituir_meses(
+                engine, arquivo, ['2021-03'])),
+            ('substituir 2021-03, arquivo só do mês', lambda: modulo.substituir_meses(engine, arquivo_mes)),
+        ]
+        for nome, funcao in cenarios:
+            segundos, resultado = cronometrar(funcao)
+            escritas = resultado.get('inseridos', 0) + resultado.get('atualizados', 0) + resultado.get('excluidos', 0)
+            print(f"{nome:<44} {segundos:>9.2f} {escritas:>16}")
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,69 @@
+"""
+Benchmark do processamento do texto extraído do PDF de centros de custo.
+
+Gera páginas de texto com uma fração de linhas ruidosas (cabeçalhos, rodapés,
+linhas quebradas) e compara a implementação anterior de processar_texto
+(re.match/re.sub a cada linha, um WARNING por linha ignorada e lista de listas
+convertida depois em DataFrame) com a atual (expressões compiladas, contagem
+agregada das linhas ignoradas e DataFrame montado uma única vez). Os avisos
+são gravados em os.devnull para medir o custo real do logging.
+
+Uso: python benchmarks/bench_processar_texto.py [linhas] [fração de ruído]
+"""
+import os
+import re
+import sys
+import time
+import logging
+import importlib.util
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_paginas_centro_custo
+
+# O script do PDF tem espaço no nome e precisa ser carregado pelo caminho
+spec = importlib.util.spec_from_file_location(
+    'extracao_centro_custo', os.path.join(RAIZ, 'Questao4_Extracao_de_Dados_de PDF_para_CSV.py'))
+extracao_centro_custo = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(extracao_centro_custo)
+
+logger = logging.getLogger()
+
+# Implementação anterior de processar_texto (+ montagem do DataFrame), mantida para comparação
+def processar_texto_anterior(textos):
+    dados = []
+    for texto in textos:
+        for linha in texto.split('\n'):
+            match = re.match(r'(\S+)\s+(.*\S)\s+(\S+)\s+(\d+)', linha.strip())
+            if match:
+                codigocentrocusto = re.sub(r'\D', '', match.group(1))
+                dados.append([codigocentrocusto, match.group(2), match.group(3), match.group(4)])
+            else:
+                logger.warning(f'Linha ignorada devido ao formato inesperado: {linha}')
+    return pd.DataFrame(dados, columns=['CODIGOCENTROCUSTO', 'DESCRICAO', 'CENTROCUSTO', 'CENTROCUSTO_COD'])
+
+def principal(linhas, fracao_ruido):
+    logging.basicConfig(level=logging.INFO, stream=open(os.devnull, 'w'),
+                        format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    paginas = gerar_paginas_centro_custo(linhas, fracao_ruido)
+    print(f"{linhas} linhas em {len(paginas)} páginas, {fracao_ruido:.0%} de ruído")
+
+    inicio = time.perf_counter()
+    antigo = processar_texto_anterior(paginas)
+    anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    novo = extracao_centro_custo.processar_texto(paginas)
+    atual = time.perf_counter() - inicio
+
+    assert antigo.equals(novo), 'Os resultados divergem'
+    print(f"{'anterior':<10} {anterior:>8.2f}s")
+    print(f"{'atual':<10} {atual:>8.2f}s  ({anterior / atual:.1f}x)")
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    fracao_ruido = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    principal(linhas, fracao_ruido)
@@ -0,0 +1,82 @@
+"""
+Benchmark da carga das dimensões: DELETE + recarga completa x sincronização.
+
+Para uma CONTAS sintética em SQLite, compara a carga anterior (DELETE de todas
+as linhas e inserção de todas de novo) com a sincronização por diferenças
+(sincronizacao_dimensoes) nos cenários de primeira carga, arquivo sem
+alterações e 1% das linhas alteradas. Sem alterações é medido duas vezes: com
+a impressão do arquivo (o SHA-256 é comparado ao CONTROLE_SINCRONIZACAO antes
+de qualquer leitura, como nos Envio_*_BD) e com a impressão das linhas.
+
+Uso: python benchmarks/bench_sincronizacao.py [linhas]
+"""
+import os
+import sys
+import time
+import logging
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from geradores import gerar_csv_contas
+from esquemas import ler_csv_tipado
+from carga_em_lote import inserir_em_lote
+from sincronizacao_dimensoes import sincronizar_dimensao, impressao_arquivo, dimensao_inalterada
+
+CRIAR_CONTAS = "CREATE TABLE CONTAS (CODCONTA INT PRIMARY KEY, CONTA VARCHAR(255), GRUPO VARCHAR(255))"
+
+# Carga anterior: apaga a tabela inteira e insere todas as linhas
+def recarregar(caminho_banco, df):
+    conexao = sqlite3.connect(caminho_banco)
+    conexao.execute("DELETE FROM CONTAS")
+    conexao.commit()
+    inserir_em_lote(conexao, df, 'CONTAS')
+    conexao.close()
+    return {'enviadas': len(df) * 2}
+
+# Com a impressão do arquivo, a execução sem alterações encerra antes de ler e comparar as linhas
+def sincronizar(engine, df, impressao=None):
+    if impressao and dimensao_inalterada(engine, 'CONTAS', impressao):
+        return {'enviadas': 0}
+    resultado = sincronizar_dimensao(engine, df, 'CONTAS', impressao=impressao)
+    return {'enviadas': resultado['inseridos'] + resultado['atualizados'] + resultado['excluidos']}
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+def principal(linhas):
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_csv = gerar_csv_contas(os.path.join(pasta, 'CONTAS_.csv'), linhas)
+        impressao = impressao_arquivo(caminho_csv)
+        df = ler_csv_tipado(caminho_csv, 'CONTAS')
+        # O gerador repete códigos em arquivos grandes; a tabela tem CODCONTA como chave primária
+        df = df.drop_duplicates(subset=['CODCONTA']).reset_index(drop=True)
+        print(f"{len(df)} contas")
+        print(f"{'cenário':<28} {'carga':<14} {'segundos':>9} {'linhas gravadas':>16}")
+        alterado = df.copy()
+        amostra = alterado.sample(frac=0.01, random_state=42).index
+        alterado['CONTA'] = alterado['CONTA'].astype(object)
+        alterado.loc[amostra, 'CONTA'] = alterado.loc[amostra, 'CONTA'] + ' (revisada)'
+
+        for carga in ('recarga', 'sincronização'):
+            caminho_banco = os.path.join(pasta, f'{carga}.db')
+            with sqlite3.connect(caminho_banco) as conexao:
+                conexao.execute(CRIAR_CONTAS)
+            engine = create_engine(f'sqlite:///{caminho_banco}')
+            executar = (lambda dados, impressao: recarregar(caminho_banco, dados)) if carga == 'recarga' \
+                else (lambda dados, impressao: sincronizar(engine, dados, impressao))
+            cenarios = (('primeira carga', df, impressao), ('sem alterações (arquivo)', df, impressao),
+                        ('sem alterações (linhas)', df, None), ('1% alterado', alterado, None))
+            for cenario, dados, impressao_cenario in cenarios:
+                segundos, resultado = cronometrar(executar, dados, impressao_cenario)
+                print(f"{cenario:<28} {carga:<14} {segundos:>9.3f} {resultado['enviadas']:>16}")
+            engine.dispose()
+
+if __name__ == '__main__':
+    principal(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,73 @@
+"""
+Benchmark de memória da conversão XML -> CSV do orçamento: árvore completa x iterparse.
+
+Para cada quantidade de registros, a conversão roda em um subprocesso separado
+(para isolar o pico de memória) e o pico de RSS é reportado. No modo
+'arvore' o XML é lido com etree.parse e todas as linhas são acumuladas antes
+de montar o DataFrame (implementação anterior); no modo 'streaming' os
+registros são lidos com iterparse e gravados lote a lote.
+
+Uso: python benchmarks/bench_xml_streaming.py [registros ...]
+"""
+import os
+import sys
+import json
+import logging
+import resource
+import subprocess
+import tempfile
+import time
+import pandas as pd
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import gerar_xml_orcamento
+from Questao_3_Avancado_Processamento_XML import (
+    analisar_elemento, validar_e_corrigir_dados, transformar_lote, xml_para_arquivo,
+)
+
+# Função que reproduz a leitura anterior: árvore inteira e lista de linhas em memória
+def converter_arvore(caminho_xml, caminho_csv):
+    raiz = etree.parse(caminho_xml, etree.XMLParser(recover=True)).getroot()
+    linhas = [validar_e_corrigir_dados(analisar_elemento(elemento)) for elemento in raiz]
+    transformar_lote(pd.DataFrame(linhas)).to_csv(caminho_csv, index=False, encoding='utf-8')
+
+# Função executada no subprocesso: converte o XML e devolve tempo e pico de RSS
+def medir_conversao(caminho_xml, modo, tamanho_lote):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_csv = os.path.join(pasta, 'orcamento.csv')
+        inicio = time.perf_counter()
+        if modo == 'streaming':
+            xml_para_arquivo(caminho_xml, caminho_csv, 'csv', tamanho_lote)
+        else:
+            converter_arvore(caminho_xml, caminho_csv)
+        segundos = time.perf_counter() - inicio
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pico_mb = pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+    return {'segundos': segundos, 'pico_rss_mb': pico_mb}
+
+def principal(tamanhos, tamanho_lote=50_000):
+    print(f"{'registros':>10} {'modo':>10} {'tamanho MB':>11} {'segundos':>9} {'pico RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for registros in tamanhos:
+            caminho_xml = gerar_xml_orcamento(os.path.join(pasta, f'orcamento_{registros}.xml'), registros)
+            tamanho_mb = os.path.getsize(caminho_xml) / 1024 / 1024
+            for modo in ('arvore', 'streaming'):
+                saida = subprocess.run(
+                    [sys.executable, __file__, '--medir', caminho_xml, modo, str(tamanho_lote)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                resultado = json.loads(saida.strip().splitlines()[-1])
+                print(f"{registros:>10} {modo:>10} {tamanho_mb:>11.1f} {resultado['segundos']:>9.2f} "
+                      f"{resultado['pico_rss_mb']:>12.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--medir':
+        print(json.dumps(medir_conversao(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+    else:
+        tamanhos = [int(valor) for valor in sys.argv[1:]] or [100_000, 500_000, 1_000_000]
+        principal(tamanhos)
@@ -0,0 +1,179 @@
+import csv
+import random
+from datetime import date
+
+# Colunas do CSV de despesas (DESPESAS_.csv)
+COLUNAS_DESPESAS = ['DTBASE', 'CODIGOCENTROCUSTO', 'CENTROCUSTOMASTER', 'VLDESPESA',
+                    'CODFILIALPRINCIPAL', 'CODCONTA', 'MES_A']
+
+# Função para gerar um CSV sintético de despesas sem montar o arquivo em memória
+def gerar_csv_despesas(caminho, linhas, semente=42):
+    """Grava um DESPESAS_.csv sintético com a quantidade de linhas pedida."""
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS_DESPESAS)
+        for i in range(linhas):
+            mes = date(2020 + (i // 12) % 5, i % 12 + 1, 1)
+            escritor.writerow([
+                mes.replace(day=28).strftime('%Y/%m/%d'),
+                i,
+                aleatorio.randint(1, 50),
+                round(aleatorio.uniform(10, 10_000), 2),
+                aleatorio.randint(1, 20),
+                aleatorio.randint(1000, 9999),
+                mes.strftime('%Y/%m/%d'),
+            ])
+    return caminho
+
+# Áreas usadas nas linhas do PDF sintético de centros de custo
+AREAS_CENTRO_CUSTO = ['ADMINISTRATIVO', 'COMERCIAL', 'FINANCEIRO', 'OPERACOES', 'TECNOLOGIA']
+
+# Função para gerar o texto das páginas do PDF de centros de custo, com uma fração de linhas ruidosas
+def gerar_paginas_centro_custo(linhas, fracao_ruido, linhas_por_pagina=45, semente=42):
+    """Retorna uma lista com o texto de cada página, como extrair_texto_pdf entrega."""
+    aleatorio = random.Random(semente)
+    ruidos = ['RELATÓRIO DE CENTROS DE CUSTO', 'Página', '', 'CÓDIGO DESCRIÇÃO ÁREA', '---']
+    paginas, atual = [], []
+    for codigo in range(1, linhas + 1):
+        if aleatorio.random() < fracao_ruido:
+            atual.append(aleatorio.choice(ruidos))
+        else:
+            area = aleatorio.choice(AREAS_CENTRO_CUSTO)
+            atual.append(f"{codigo // 1000}.{codigo % 1000:03d} Centro de custo {codigo} {area} "
+                         f"{AREAS_CENTRO_CUSTO.index(area) + 1}")
+        if len(atual) == linhas_por_pagina:
+            paginas.append('\n'.join(atual))
+            atual = []
+    if atual:
+        paginas.append('\n'.join(atual))
+    return paginas
+
+# Função para gerar um PDF sintético de centros de custo (uma linha de tabela por linha de texto)
+def gerar_pdf_centro_custo(caminho, paginas, linhas_por_pagina=45, semente=42):
+    """
+    Grava um CENTRO_DE_CUSTO.pdf sintético com a quantidade de páginas pedida,
+    no formato lido por processar_texto. O PDF é montado diretamente (fonte
+    Helvetica padrão), sem depender de bibliotecas de geração de PDF.
+    """
+    aleatorio = random.Random(semente)
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Árvore de páginas, preenchida depois que as páginas são numeradas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    ids_paginas = []
+    codigo = 0
+    for _ in range(paginas):
+        linhas = []
+        for _ in range(linhas_por_pagina):
+            codigo += 1
+            area = aleatorio.choice(AREAS_CENTRO_CUSTO)
+            linhas.append(f"{codigo // 1000}.{codigo % 1000:03d} Centro de custo {codigo} {area} "
+                          f"{AREAS_CENTRO_CUSTO.index(area) + 1}")
+        texto = ' T* '.join(f"({linha}) Tj" for linha in linhas)
+        conteudo = f"BT /F1 10 Tf 14 TL 40 800 Td {texto} ET".encode('latin-1')
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos)))
+        ids_paginas.append(len(objetos))
+    kids = ' '.join(f"{numero} 0 R" for numero in ids_paginas)
+    objetos[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(ids_paginas)} >>".encode('latin-1')
+
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(b"%PDF-1.4\n")
+        posicoes = []
+        for numero, objeto in enumerate(objetos, start=1):
+            posicoes.append(arquivo.tell())
+            arquivo.write(b"%d 0 obj\n" % numero + objeto + b"\nendobj\n")
+        inicio_xref = arquivo.tell()
+        arquivo.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for posicao in posicoes:
+            arquivo.write(b"%010d 00000 n \n" % posicao)
+        arquivo.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                      % (len(objetos) + 1, inicio_xref))
+    return caminho
+
+# Nomes dos dias da semana e dos meses usados em ORCAMENTO_ULTDATA
+DIAS_SEMANA = ['segunda-feira', 'terça-feira', 'quarta-feira', 'quinta-feira', 'sexta-feira', 'sábado', 'domingo']
+MESES = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho', 'agosto',
+         'setembro', 'outubro', 'novembro', 'dezembro']
+
+# Função para gerar um ORCAMENTO.xml sintético sem montar o documento em memória
+def gerar_xml_orcamento(caminho, registros, semente=42):
+    """Grava um ORCAMENTO.xml sintético com a quantidade de registros pedida."""
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('<?xml version="1.0" encoding="UTF-8"?>\n<dataroot>\n')
+        for i in range(registros):
+            dia = date(2020 + (i // 12) % 5, i % 12 + 1, 28)
+            arquivo.write(
+                f"<ORCAMENTO><ULTDATA>{DIAS_SEMANA[dia.weekday()]}, {dia.day} de {MESES[dia.month - 1]} "
+                f"de {dia.year}</ULTDATA><FILIALCOD>{aleatorio.randint(1, 20)}</FILIALCOD>"
+                f"<CONTACOD>{aleatorio.randint(1000, 9999)}</CONTACOD>"
+                f"<CENTROCUSTOCOD>{i}</CENTROCUSTOCOD>"
+                f"<ORCADO>{aleatorio.uniform(10, 10_000):.2f}</ORCADO><PERRATEIO>100</PERRATEIO></ORCAMENTO>\n"
+            )
+        arquivo.write('</dataroot>\n')
+    return caminho
+
+# Função para gerar um XML sintético com registros aninhados (níveis x campos por nível)
+def gerar_xml_aninhado(caminho, registros, niveis=4, campos=10):
+    """
+    Grava um XML em que cada registro tem 'niveis' níveis de elementos
+    aninhados e 'campos' folhas por nível, para medir o custo de achatar
+    registros profundos e largos.
+    """
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('<?xml version="1.0" encoding="UTF-8"?>\n<dataroot>\n')
+        for i in range(registros):
+            partes = ['<REGISTRO>']
+            for nivel in range(niveis):
+                partes.append(f'<NIVEL{nivel}>')
+                partes.extend(f'<CAMPO{campo}>{i}.{nivel}.{campo}</CAMPO{campo}>' for campo in range(campos))
+            partes.extend(f'</NIVEL{nivel}>' for nivel in reversed(range(niveis)))
+            partes.append('</REGISTRO>\n')
+            arquivo.write(''.join(partes))
+        arquivo.write('</dataroot>\n')
+    return caminho
+
+# Grupos usados no CONTAS_.csv sintético
+GRUPOS_CONTAS = ['RECEITAS', 'DESPESAS ADMINISTRATIVAS', 'DESPESAS COMERCIAIS', 'CUSTOS', 'IMPOSTOS', 'PESSOAL']
+
+# Função para gerar um CONTAS_.csv sintético, com códigos no formato '1.01.001'
+def gerar_csv_contas(caminho, linhas, semente=42):
+    """Grava um CONTAS_.csv sintético com a quantidade de linhas pedida."""
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['CODCONTA', 'CONTA', 'GRUPO'])
+        for i in range(linhas):
+            grupo = aleatorio.randrange(len(GRUPOS_CONTAS))
+            escritor.writerow([f"{grupo + 1}.{i // 1000 % 100:02d}.{i % 1000:03d}", f"Conta {i}", GRUPOS_CONTAS[grupo]])
+    return caminho
+
+# Função para gerar um CENTRO_DE_CUSTO.csv sintético, como o extraído do PDF
+def gerar_csv_centro_custo(caminho, linhas, semente=42):
+    """Grava um CENTRO_DE_CUSTO.csv sintético com a quantidade de linhas pedida."""
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['CODIGOCENTROCUSTO', 'DESCRICAO', 'CENTROCUSTO', 'CENTROCUSTO_COD'])
+        for i in range(linhas):
+            area = aleatorio.randrange(len(AREAS_CENTRO_CUSTO))
+            escritor.writerow([i + 1, f"Centro de custo {i + 1}", AREAS_CENTRO_CUSTO[area], area + 1])
+    return caminho
+
+# Função para gerar um ORCAMENTO_.csv sintético, no formato lido por Envio_orcamento
+def gerar_csv_orcamento(caminho, linhas, semente=42):
+    """Grava um ORCAMENTO_.csv sintético com a quantidade de linhas pedida."""
+    aleatorio = random.Random(semente)
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['ORCAMENTO_ULTDATA', 'ORCAMENTO_FILIALCOD', 'ORCAMENTO_CONTACOD',
+                           'ORCAMENTO_CENTROCUSTOCOD', 'ORCAMENTO_ORCADO', 'ORCAMENTO_PERRATEIO'])
+        for i in range(linhas):
+            dia = date(2020 + (i // 12) % 5, i % 12 + 1, 28)
+            escritor.writerow([dia.isoformat(), aleatorio.randint(1, 20), aleatorio.randint(1000, 9999), i,
+                               f"{aleatorio.uniform(10, 10_000):.2f}", 100])
+    return caminho
@@ -0,0 +1,136 @@
+"""
+Servidor HTTP local que simula a API do SheetDB nos benchmarks.
+
+Entrega registros paginados por limit/offset (com cabeçalho Link 'next',
+usado pelo cliente anterior), filtra por updated_after, aplica latência por
+pedido e, opcionalmente, um limite de pedidos por segundo que responde 429
+com Retry-After. Para os testes, 'falhas' programa respostas de erro por
+offset e 'historico' guarda (instante, offset, status) de cada pedido.
+"""
+import json
+import time
+import socket
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+# Função para gerar os registros da API, com last_updated crescente
+def gerar_registros(quantidade, inicio=datetime(2024, 1, 1)):
+    return [{'id': str(i), 'valor': f"{i * 1.5:.2f}", 'descricao': f"Registro {i}",
+             'last_updated': (inicio + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')}
+            for i in range(quantidade)]
+
+class ServidorAPI:
+    """
+    Uso:
+        with ServidorAPI(gerar_registros(10_000), latencia=0.05) as servidor:
+            url = servidor.url
+
+    falhas: {offset: [status, ...]} responde os status da lista, um por
+    pedido, antes de entregar a página daquele offset (429 leva Retry-After).
+    """
+
+    def __init__(self, registros, latencia=0.0, pedidos_por_segundo=None, retry_after=1, falhas=None):
+        self.registros = registros
+        self.falhas = {offset: list(status) for offset, status in (falhas or {}).items()}
+        self.historico = []
+        self.latencia = latencia
+        self.pedidos_por_segundo = pedidos_por_segundo
+        self.retry_after = retry_after
+        self.pedidos = 0
+        self.respostas_429 = 0
+        self.conexoes = 0
+        self._janela = []
+        self._trava = threading.Lock()
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._servidor.handle_error = lambda requisicao, endereco: None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}/api"
+
+    def __enter__(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    # Função para conferir o limite de pedidos por segundo (janela deslizante de 1s)
+    def _excedeu_limite(self):
+        if not self.pedidos_por_segundo:
+            return False
+        agora = time.monotonic()
+        with self._trava:
+            self._janela = [instante for instante in self._janela if agora - instante < 1.0]
+            if len(self._janela) >= self.pedidos_por_segundo:
+                self.respostas_429 += 1
+                return True
+            self._janela.append(agora)
+            return False
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Cabeçalhos e corpo saem em escritas separadas; sem isso o keep-alive sofre com o atraso do ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with servidor._trava:
+                    servidor.conexoes += 1
+
+            def _responder(self, status, corpo, cabecalhos=()):
+                conteudo = json.dumps(corpo).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(conteudo)))
+                for nome, valor in cabecalhos:
+                    self.send_header(nome, valor)
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+            def do_GET(self):
+                partes = urlsplit(self.path)
+                consulta = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+                limite = int(consulta.get('limit', 100))
+                offset = int(consulta.get('offset', 0))
+
+                with servidor._trava:
+                    servidor.pedidos += 1
+                    programadas = servidor.falhas.get(offset)
+                    status = programadas.pop(0) if programadas else None
+                    if status == 429:
+                        servidor.respostas_429 += 1
+                if status is None and servidor._excedeu_limite():
+                    status = 429
+                servidor.historico.append((time.monotonic(), offset, status or 200))
+                if status == 429:
+                    self._responder(429, {'error': 'Too Many Requests'}, [('Retry-After', str(servidor.retry_after))])
+                    return
+                if status:
+                    self._responder(status, {'error': 'Server Error'})
+                    return
+                time.sleep(servidor.latencia)
+
+                registros = servidor.registros
+                if consulta.get('updated_after'):
+                    registros = [registro for registro in registros
+                                 if registro['last_updated'] > consulta['updated_after']]
+                pagina = registros[offset:offset + limite]
+
+                cabecalhos = []
+                if offset + limite < len(registros):
+                    proxima = {**consulta, 'limit': limite, 'offset': offset + limite}
+                    cabecalhos.append(('Link', f'<{servidor.url}?{urlencode(proxima)}>; rel="next"'))
+                self._responder(200, pagina, cabecalhos)
+
+        return Handler
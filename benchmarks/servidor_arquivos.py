@@ -0,0 +1,118 @@
+"""
+Servidor HTTP local que simula o download de arquivos do Kaggle nos benchmarks.
+
+Serve arquivos em memória com ETag, Content-Disposition e pedidos Range
+(inclusive If-Range), com latência por pedido, limite de banda por conexão e
+queda de conexão opcional no meio da transferência, para exercitar a
+retomada do gerenciador_downloads.
+"""
+import time
+import socket
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class ServidorArquivos:
+    """
+    Uso:
+        with ServidorArquivos({'orcamento.xml': (b'...', 'orcamento.xml.zip')}) as servidor:
+            url = servidor.url('orcamento.xml')
+
+    arquivos: nome -> (conteúdo, nome enviado em Content-Disposition).
+    """
+
+    def __init__(self, arquivos, latencia=0.0, bytes_por_segundo=None, cair_apos_bytes=None):
+        self.arquivos = {nome: (conteudo, nome_envio, f'"{hashlib.sha1(conteudo).hexdigest()}"')
+                         for nome, (conteudo, nome_envio) in arquivos.items()}
+        self.latencia = latencia
+        self.bytes_por_segundo = bytes_por_segundo
+        self.cair_apos_bytes = cair_apos_bytes  # Derruba a primeira transferência de cada arquivo
+        self.bytes_enviados = 0
+        self.pedidos = 0
+        self._quedas = set()
+        self._trava = threading.Lock()
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._criar_handler())
+        self._servidor.daemon_threads = True
+        # Conexões encerradas pelo cliente (downloads pulados ou retomados) são esperadas
+        self._servidor.handle_error = lambda requisicao, endereco: None
+
+    def url(self, nome):
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}/{nome}"
+
+    def __enter__(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with servidor._trava:
+                    servidor.pedidos += 1
+                time.sleep(servidor.latencia)
+                item = servidor.arquivos.get(self.path.lstrip('/'))
+                if item is None:
+                    self.send_error(404)
+                    return
+                conteudo, nome_envio, etag = item
+
+                inicio = 0
+                faixa = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if faixa and (if_range is None or if_range == etag):
+                    inicio = int(faixa.split('=')[1].split('-')[0])
+                    if inicio >= len(conteudo):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{len(conteudo)}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {inicio}-{len(conteudo) - 1}/{len(conteudo)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(len(conteudo) - inicio))
+                self.send_header('ETag', etag)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Disposition', f'attachment; filename="{nome_envio}"')
+                self.end_headers()
+                self._enviar(conteudo, inicio)
+
+            def _enviar(self, conteudo, inicio):
+                limite = None
+                with servidor._trava:
+                    if servidor.cair_apos_bytes and self.path not in servidor._quedas:
+                        servidor._quedas.add(self.path)
+                        limite = inicio + servidor.cair_apos_bytes
+                pedaco = 64 * 1024
+                posicao = inicio
+                try:
+                    while posicao < len(conteudo):
+                        if limite is not None and posicao >= limite:
+                            # Simula a queda da conexão no meio da transferência
+                            self.wfile.flush()
+                            self.connection.shutdown(socket.SHUT_RDWR)
+                            self.close_connection = True
+                            return
+                        parte = conteudo[posicao:posicao + pedaco]
+                        self.wfile.write(parte)
+                        posicao += len(parte)
+                        with servidor._trava:
+                            servidor.bytes_enviados += len(parte)
+                        if servidor.bytes_por_segundo:
+                            time.sleep(len(parte) / servidor.bytes_por_segundo)
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente fechou a conexão (por exemplo ao pular um arquivo já atualizado)
+                    pass
+
+        return Handler
@@ -0,0 +1,376 @@
+"""
+Suíte de benchmarks do ETL completo com dados sintéticos.
+
+Gera as entradas de cada etapa (PDF e texto de centros de custo, XML de
+orçamento, CSVs de contas, centros de custo, orçamento e despesas, e as
+páginas da API servidas por servidor_api) na escala pedida e executa cada
+etapa em um subprocesso próprio, com a carga apontada para um SQLite
+temporário (NEOBPO_DB_URL). Cada etapa é medida com instrumentacao.medir
+(tempo, CPU, pico de RSS, idas ao banco e o detalhamento das subetapas) e o
+resultado é acrescentado a um arquivo JSONL, junto com o commit e a máquina,
+para comparar rodadas e acompanhar regressões.
+
+Os dados gerados são determinísticos (semente fixa); com --dados eles ficam
+guardados e são reaproveitados nas rodadas seguintes.
+
+Uso:
+    python benchmarks/suite.py [--escalas 10000 100000 ...] [--etapas pdf.processar_texto ...]
+                               [--saida resultados_suite.jsonl] [--dados PASTA] [--sem-limite]
+    python benchmarks/suite.py --comparar [--saida resultados_suite.jsonl] [--base RODADA] [--tolerancia 0.10]
+
+As duas formas terminam com código 1 se alguma etapa falhar (e a comparação,
+também se houver regressão), para que um job de regressão não aceite uma
+rodada com etapas quebradas.
+"""
+import os
+import sys
+import json
+import math
+import logging
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from geradores import (gerar_csv_contas, gerar_csv_centro_custo, gerar_csv_orcamento, gerar_csv_despesas,
+                       gerar_xml_orcamento, gerar_pdf_centro_custo, gerar_paginas_centro_custo)
+
+# Escalas padrão (linhas por entidade); a suíte aceita de 10 mil a 10 milhões
+ESCALAS_PADRAO = [10_000, 100_000]
+
+# Arquivo de resultados padrão, no diretório atual
+SAIDA_PADRAO = 'resultados_suite.jsonl'
+
+# Dimensões criadas antes das cargas que as consultam (orçamento e despesas)
+DDL_DIMENSOES = [
+    "CREATE TABLE CONTAS (CODCONTA INT PRIMARY KEY, CONTA VARCHAR(255), GRUPO VARCHAR(255))",
+    "CREATE TABLE CENTRO_DE_CUSTO (CODIGOCENTROCUSTO INT PRIMARY KEY, DESCRICAO VARCHAR(255), "
+    "CENTROCUSTO VARCHAR(255), CENTROCUSTO_COD INT)",
+]
+
+# Função para gerar um arquivo de entrada apenas se ele ainda não existir na pasta de dados
+def _arquivo(pasta, nome, gerar, *args):
+    caminho = os.path.join(pasta, nome)
+    if not os.path.exists(caminho):
+        temporario = caminho + '.tmp'
+        gerar(temporario, *args)
+        os.replace(temporario, caminho)
+    return caminho
+
+# Função para carregar um script da raiz pelo caminho (alguns nomes têm espaços)
+def _script(arquivo):
+    from pipeline import carregar_modulo
+    return carregar_modulo(arquivo)
+
+# Função para contar as linhas de uma tabela do SQLite da etapa
+def _contar_linhas(tabela):
+    from sqlalchemy import text
+    from conexao_bd import obter_engine
+    with obter_engine().connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
+
+# Função para criar as dimensões no SQLite da etapa, vazias ou com os códigos informados por tabela
+def _criar_dimensoes(chaves=None):
+    from conexao_bd import obter_engine
+    with obter_engine().begin() as conn:
+        for ddl in DDL_DIMENSOES:
+            conn.exec_driver_sql(ddl)
+        for tabela, (coluna, codigos) in (chaves or {}).items():
+            conn.exec_driver_sql(f"INSERT INTO {tabela} ({coluna}) VALUES (?)", [(int(codigo),) for codigo in codigos])
+
+# Função para obter os códigos de conta e centro de custo do CSV de despesas (as despesas órfãs são descartadas)
+def _chaves_despesas(entradas):
+    import pandas as pd
+    df = pd.read_csv(entradas['csv'], usecols=['CODCONTA', 'CODIGOCENTROCUSTO'])
+    return {'CONTAS': ('CODCONTA', df['CODCONTA'].unique()),
+            'CENTRO_DE_CUSTO': ('CODIGOCENTROCUSTO', df['CODIGOCENTROCUSTO'].unique())}
+
+# --- Etapas: preparar (no processo principal, fora da medição) e executar (no subprocesso, medido) ---
+
+def preparar_pdf(pasta, linhas):
+    paginas = math.ceil(linhas / 45)
+    return {'pdf': _arquivo(pasta, f'CENTRO_DE_CUSTO_{linhas}.pdf', gerar_pdf_centro_custo, paginas)}
+
+def executar_extrair_pdf(entradas, pasta):
+    modulo = _script('Questao4_Extracao_de_Dados_de PDF_para_CSV.py')
+    return sum(texto.count('\n') + 1 for texto in modulo.extrair_texto_pdf(entradas['pdf'], modulo.processos_extracao))
+
+def preparar_texto_pdf(pasta, linhas):
+    return {'linhas': linhas}
+
+def executar_processar_texto(entradas, pasta, paginas):
+    return len(_script('Questao4_Extracao_de_Dados_de PDF_para_CSV.py').processar_texto(paginas))
+
+def preparar_xml(pasta, linhas):
+    return {'xml': _arquivo(pasta, f'ORCAMENTO_{linhas}.xml', gerar_xml_orcamento, linhas)}
+
+def executar_xml_para_df(entradas, pasta):
+    return len(_script('Questao_3_Avancado_Processamento_XML.py').xml_para_df(entradas['xml']))
+
+def executar_xml_para_parquet(entradas, pasta):
+    modulo = _script('Questao_3_Avancado_Processamento_XML.py')
+    return modulo.xml_para_parquet_orcamento(entradas['xml'], os.path.join(pasta, 'ORCAMENTO_.parquet'))
+
+def preparar_api(pasta, linhas):
+    return {'registros': linhas}
+
+def executar_api(entradas, pasta, registros):
+    from servidor_api import ServidorAPI
+    from estado_incremental import estado_inicial
+    from gravacao_paginas import criar_gravador
+    modulo = _script('Questao_2_Consumo_Transformacao_de_Dados_API.py')
+    with ServidorAPI(registros) as servidor:
+        gravador = criar_gravador(os.path.join(pasta, 'api.csv'), 'csv')
+        return modulo.buscar_e_gravar(servidor.url, {}, os.path.join(pasta, 'api_estado.json'),
+                                      estado_inicial(), gravador)
+
+def preparar_contas(pasta, linhas):
+    return {'csv': _arquivo(pasta, f'CONTAS_{linhas}.csv', gerar_csv_contas, linhas)}
+
+def executar_contas(entradas, pasta):
+    modulo = _script('Envio_Contas_BD.py')
+    modulo.caminho_csv = entradas['csv']
+    modulo.executar()
+    return _contar_linhas('CONTAS')
+
+def preparar_centro_custo(pasta, linhas):
+    return {'csv': _arquivo(pasta, f'CENTRO_DE_CUSTO_{linhas}.csv', gerar_csv_centro_custo, linhas)}
+
+def executar_centro_custo(entradas, pasta):
+    modulo = _script('Envio_Centro_Custo_BD.py')
+    modulo.caminho_csv = entradas['csv']
+    modulo.executar()
+    return _contar_linhas('CENTRO_DE_CUSTO')
+
+def preparar_orcamento(pasta, linhas):
+    return {'csv': _arquivo(pasta, f'ORCAMENTO_{linhas}.csv', gerar_csv_orcamento, linhas)}
+
+def executar_orcamento(entradas, pasta):
+    modulo = _script('Envio_orcamento.py')
+    modulo.caminho_csv = entradas['csv']
+    modulo.executar()
+    return _contar_linhas('ORCAMENTO')
+
+def preparar_despesas(pasta, linhas):
+    return {'csv': _arquivo(pasta, f'DESPESAS_{linhas}.csv', gerar_csv_despesas, linhas)}
+
+def executar_despesas(entradas, pasta):
+    modulo = _script('Envio_Despesas.py')
+    modulo.caminho_csv = entradas['csv']
+    modulo.executar()
+    return _contar_linhas('DESPESA_DETALHADA')
+
+def executar_despesas_detalhadas(entradas, pasta):
+    modulo = _script('DespesaDetalhadas.py')
+    modulo.caminho_csv = entradas['csv']
+    modulo.executar()
+    return _contar_linhas('DespesasDetalhadas')
+
+# Entradas montadas no subprocesso, antes da medição (ficam em memória, como nas etapas reais)
+def _paginas_texto(entradas):
+    return {'paginas': gerar_paginas_centro_custo(entradas['linhas'], 0.3)}
+
+def _registros_api(entradas):
+    from servidor_api import gerar_registros
+    return {'registros': gerar_registros(entradas['registros'])}
+
+# Etapas da suíte: preparação, execução, montagem em memória, dimensões necessárias e escala máxima
+ETAPAS = {
+    'pdf.extrair_texto_pdf': {'preparar': preparar_pdf, 'executar': executar_extrair_pdf, 'limite': 100_000},
+    'pdf.processar_texto': {'preparar': preparar_texto_pdf, 'executar': executar_processar_texto,
+                            'montar': _paginas_texto, 'limite': 1_000_000},
+    'xml.xml_para_df': {'preparar': preparar_xml, 'executar': executar_xml_para_df, 'limite': 1_000_000},
+    'xml.xml_para_parquet_orcamento': {'preparar': preparar_xml, 'executar': executar_xml_para_parquet},
+    'api.buscar_e_gravar': {'preparar': preparar_api, 'executar': executar_api, 'montar': _registros_api,
+                            'limite': 1_000_000},
+    'carga.contas': {'preparar': preparar_contas, 'executar': executar_contas},
+    'carga.centro_custo': {'preparar': preparar_centro_custo, 'executar': executar_centro_custo},
+    'carga.orcamento': {'preparar': preparar_orcamento, 'executar': executar_orcamento, 'dimensoes': True},
+    'carga.despesas': {'preparar': preparar_despesas, 'executar': executar_despesas, 'dimensoes': _chaves_despesas},
+    'carga.despesas_detalhadas': {'preparar': preparar_despesas, 'executar': executar_despesas_detalhadas,
+                                  'dimensoes': _chaves_despesas},
+}
+
+# Função executada no subprocesso: mede uma etapa e grava o resultado em JSON
+def medir_etapa(nome, entradas, caminho_resultado):
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ['NEOBPO_DB_URL'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+        caminho_metricas = os.path.join(pasta, 'metricas.jsonl')
+        import instrumentacao
+        # Os scripts configuram o logging em INFO; só os erros interessam aqui
+        logging.disable(logging.WARNING)
+
+        etapa = ETAPAS[nome]
+        dimensoes = etapa.get('dimensoes')
+        if dimensoes:
+            # True: dimensões vazias; função: códigos a inserir, obtidos das entradas fora da medição
+            _criar_dimensoes(dimensoes(entradas) if callable(dimensoes) else None)
+        extras = etapa['montar'](entradas) if 'montar' in etapa else {}
+
+        instrumentacao.ativar(caminho_metricas)
+        resultado = {'status': 'ok', 'erro': None}
+        try:
+            with instrumentacao.medir(f'suite.{nome}') as medicao:
+                medicao.registrar(linhas_saida=etapa['executar'](entradas, pasta, **extras))
+        except Exception as e:
+            resultado.update({'status': 'erro', 'erro': f"{type(e).__name__}: {e}"})
+        registros = instrumentacao.ler_registros(caminho_metricas)
+        instrumentacao.desativar()
+
+    principal_ = registros[-1]
+    resultado.update({campo: principal_[campo] for campo in
+                      ('segundos', 'cpu_segundos', 'linhas_saida', 'bytes_lidos', 'pico_rss_mb', 'idas_ao_banco')})
+    resultado['subetapas'] = {linha['etapa']: round(linha['segundos'], 4)
+                              for linha in instrumentacao.resumir(registros[:-1])}
+    with open(caminho_resultado, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo)
+
+# Função para obter o commit atual do repositório, se houver
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Função para executar a suíte e acrescentar os resultados ao arquivo de saída
+def executar_suite(escalas, etapas, saida, pasta_dados=None, sem_limite=False):
+    """
+    Mede cada etapa em cada escala, num subprocesso por medição, e acrescenta
+    uma linha por medição ao arquivo de saída (inclusive as que falharam).
+
+    Retorna:
+        tuple: Identificador da rodada e lista de (etapa, escala, erro) das medições que falharam.
+    """
+    rodada = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    ambiente = {'rodada': rodada, 'commit': _commit(), 'python': platform.python_version(),
+                'plataforma': platform.platform(), 'cpus': os.cpu_count()}
+    print(f"Rodada {rodada} (commit {ambiente['commit'] or '-'}), resultados em {saida}")
+    print(f"{'etapa':<34} {'escala':>10} {'segundos':>9} {'linhas/s':>11} {'pico RSS MB':>12} {'idas BD':>8}  status")
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta_dados = pasta_dados or temporaria
+        os.makedirs(pasta_dados, exist_ok=True)
+        for linhas in escalas:
+            for nome in etapas:
+                etapa = ETAPAS[nome]
+                if linhas > etapa.get('limite', math.inf) and not sem_limite:
+                    print(f"{nome:<34} {linhas:>10} {'':>9} {'':>11} {'':>12} {'':>8}  pulada (limite "
+                          f"{etapa['limite']:,}; use --sem-limite)")
+                    continue
+
+                entradas = etapa['preparar'](pasta_dados, linhas)
+                caminho_resultado = os.path.join(temporaria, 'resultado.json')
+                processo = subprocess.run(
+                    [sys.executable, __file__, '--medir', nome, json.dumps(entradas), caminho_resultado],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                )
+                if processo.returncode == 0:
+                    with open(caminho_resultado, 'r', encoding='utf-8') as arquivo:
+                        resultado = json.load(arquivo)
+                    os.remove(caminho_resultado)
+                else:
+                    ultima = (processo.stderr.strip().splitlines() or ['falha sem mensagem'])[-1]
+                    resultado = {'status': 'erro', 'erro': ultima}
+
+                segundos = resultado.get('segundos')
+                por_segundo = (resultado['linhas_saida'] / segundos
+                               if resultado.get('linhas_saida') and segundos else None)
+                registro = {**ambiente, 'etapa': nome, 'escala': linhas, **resultado, 'linhas_por_segundo': por_segundo}
+                with open(saida, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+                def numero(valor, formato):
+                    return '-' if valor is None else formato.format(valor)
+                status = resultado['status'] if resultado['status'] == 'ok' else f"erro: {resultado['erro']}"
+                if resultado['status'] != 'ok':
+                    falhas.append((nome, linhas, resultado['erro']))
+                print(f"{nome:<34} {linhas:>10} {numero(segundos, '{:.2f}'):>9} {numero(por_segundo, '{:,.0f}'):>11} "
+                      f"{numero(resultado.get('pico_rss_mb'), '{:.1f}'):>12} "
+                      f"{numero(resultado.get('idas_ao_banco'), '{}'):>8}  {status}")
+    if falhas:
+        print(f"{len(falhas)} medição(ões) com erro; a rodada {rodada} não serve de base para comparação.")
+    return rodada, falhas
+
+# Função para comparar a última rodada com uma rodada de base
+def comparar(saida, base=None, tolerancia=0.10):
+    """
+    Compara, para cada etapa e escala presentes nas duas rodadas, a vazão
+    (linhas/s) e o pico de memória. Piora acima da tolerância é marcada como
+    regressão. Toda etapa com erro na rodada atual também conta, tenha ela
+    passado na base ou não: uma rodada com etapas quebradas não é válida.
+
+    Retorna:
+        int: Quantidade de regressões encontradas.
+    """
+    with open(saida, 'r', encoding='utf-8') as arquivo:
+        registros = [json.loads(linha) for linha in arquivo if linha.strip()]
+    rodadas = list(dict.fromkeys(registro['rodada'] for registro in registros))
+    if len(rodadas) < 2 and base is None:
+        print(f"{saida} tem só {len(rodadas)} rodada(s); nada a comparar.")
+        return 0
+    atual = rodadas[-1]
+    base = base or rodadas[-2]
+
+    def por_chave(rodada, status='ok'):
+        return {(registro['etapa'], registro['escala']): registro
+                for registro in registros if registro['rodada'] == rodada and registro['status'] == status}
+
+    antes, depois = por_chave(base), por_chave(atual)
+    com_erro = por_chave(atual, 'erro')
+    commits = {registro['rodada']: registro.get('commit') for registro in registros}
+    print(f"Base {base} (commit {commits.get(base) or '-'}) x atual {atual} (commit {commits.get(atual) or '-'})")
+    print(f"{'etapa':<34} {'escala':>10} {'linhas/s base':>14} {'linhas/s atual':>15} {'vazão':>8} "
+          f"{'RSS base':>9} {'RSS atual':>10}")
+    regressoes = 0
+    for chave in sorted(antes.keys() & depois.keys()):
+        anterior, novo = antes[chave], depois[chave]
+        variacao_vazao = (novo['linhas_por_segundo'] / anterior['linhas_por_segundo'] - 1
+                          if anterior.get('linhas_por_segundo') and novo.get('linhas_por_segundo') else None)
+        variacao_rss = (novo['pico_rss_mb'] / anterior['pico_rss_mb'] - 1
+                        if anterior.get('pico_rss_mb') and novo.get('pico_rss_mb') else None)
+        marcas = []
+        if variacao_vazao is not None and variacao_vazao < -tolerancia:
+            marcas.append('REGRESSÃO de vazão')
+        if variacao_rss is not None and variacao_rss > tolerancia:
+            marcas.append('REGRESSÃO de memória')
+        regressoes += bool(marcas)
+        vazao = '-' if variacao_vazao is None else f"{variacao_vazao:+.0%}"
+        print(f"{chave[0]:<34} {chave[1]:>10} {anterior.get('linhas_por_segundo') or 0:>14,.0f} "
+              f"{novo.get('linhas_por_segundo') or 0:>15,.0f} {vazao:>8} {anterior.get('pico_rss_mb') or 0:>9.1f} "
+              f"{novo.get('pico_rss_mb') or 0:>10.1f}  {', '.join(marcas)}")
+    for chave in sorted(com_erro):
+        situacao = 'REGRESSÃO: passava na base e falhou' if chave in antes else 'ERRO'
+        print(f"{chave[0]:<34} {chave[1]:>10}  {situacao} ({com_erro[chave]['erro']})")
+    regressoes += len(com_erro)
+    print(f"{regressoes} regressão(ões) acima de {tolerancia:.0%} ou etapa(s) com erro.")
+    return regressoes
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--medir':
+        medir_etapa(sys.argv[2], json.loads(sys.argv[3]), sys.argv[4])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Suíte de benchmarks do ETL com dados sintéticos.')
+    parser.add_argument('--escalas', nargs='+', type=int, default=ESCALAS_PADRAO, help='Linhas por entidade')
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument('--saida', default=SAIDA_PADRAO, help='Arquivo JSONL de resultados (acrescentado)')
+    parser.add_argument('--dados', help='Pasta onde os dados gerados são guardados e reaproveitados')
+    parser.add_argument('--sem-limite', action='store_true', help='Ignora a escala máxima de cada etapa')
+    parser.add_argument('--comparar', action='store_true', help='Compara a última rodada com a anterior (ou --base)')
+    parser.add_argument('--base', help='Rodada de base para --comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.10, help='Piora tolerada em --comparar (0.10 = 10%%)')
+    argumentos = parser.parse_args()
+
+    if argumentos.comparar:
+        sys.exit(1 if comparar(argumentos.saida, argumentos.base, argumentos.tolerancia) else 0)
+    _, falhas = executar_suite(argumentos.escalas, argumentos.etapas, argumentos.saida, argumentos.dados,
+                               argumentos.sem_limite)
+    # Uma etapa quebrada não pode passar por rodada válida em um job de regressão
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from sqlalchemy import text
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tabelas de dimensão conhecidas e suas colunas de chave
+DIMENSOES = {
+    'CONTAS': 'CODCONTA',
+    'CENTRO_DE_CUSTO': 'CODIGOCENTROCUSTO',
+}
+
+# Caminho opcional do snapshot em disco (vazio desativa o snapshot)
+CAMINHO_SNAPSHOT = os.getenv('NEOBPO_CACHE_DIMENSOES', '')
+
+# Cache em memória: tabela -> {'versao': versão da dimensão (ver versao_dimensao) ou None, 'chaves': set}
+_cache = {}
+_trava = threading.Lock()
+
+# Função para ler todas as chaves de uma dimensão
+def _ler_chaves(conn, tabela):
+    coluna = DIMENSOES[tabela]
+    return set(conn.execute(text(f"SELECT {coluna} FROM {tabela}")).scalars())
+
+# Função para calcular a versão de uma dimensão a partir das próprias chaves
+def _versao_das_chaves(chaves):
+    resumo = hashlib.sha1(','.join(map(str, sorted(chaves))).encode('utf-8'))
+    return [len(chaves), resumo.hexdigest()]
+
+# Função para obter a versão atual de uma dimensão
+def versao_dimensao(conn, tabela):
+    """
+    Lê a versão da dimensão: [contagem, soma de verificação das chaves]. No
+    SQL Server é uma única consulta agregada (CHECKSUM_AGG sobre o
+    BINARY_CHECKSUM da chave), que muda com qualquer inclusão, exclusão ou
+    troca de chave, salvo colisão do checksum. Nos demais bancos, que não têm
+    uma soma de verificação agregada, as chaves são lidas e resumidas com SHA-1.
+    """
+    if conn.dialect.name == 'mssql':
+        coluna = DIMENSOES[tabela]
+        contagem, checksum = conn.execute(
+            text(f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM({coluna})) FROM {tabela}")
+        ).one()
+        return [int(contagem), checksum]
+    return _versao_das_chaves(_ler_chaves(conn, tabela))
+
+# Função para ler o snapshot em disco
+def _ler_snapshot(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Snapshot de dimensões ignorado ({caminho}): {e}")
+        return {}
+
+# Função para gravar o snapshot em disco de forma atômica
+def _gravar_snapshot(caminho):
+    conteudo = {tabela: {'versao': item['versao'], 'chaves': sorted(item['chaves'])}
+                for tabela, item in _cache.items()}
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo)
+    os.replace(temporario, caminho)
+
+# Função para obter as chaves de uma dimensão, lendo o banco apenas quando necessário
+def obter_chaves(conn, tabela, caminho_snapshot=None):
+    """
+    Retorna o conjunto de chaves da dimensão. Depois da primeira consulta, as
+    chaves ficam em memória pelo resto da execução e cada consulta seguinte é
+    uma busca em memória, sem ida ao banco: as gravações do próprio processo
+    nas dimensões mantêm o cache em dia (registrar_chaves e invalidar).
+
+    Na primeira consulta, a versão da dimensão (ver versao_dimensao) é
+    conferida contra o snapshot em disco; se conferir, as chaves vêm do
+    snapshot e a tabela não é lida.
+
+    Parâmetros:
+        conn (Connection): Conexão SQLAlchemy.
+        tabela (str): Nome da dimensão (chave de DIMENSOES).
+        caminho_snapshot (str, opcional): Snapshot em disco; padrão NEOBPO_CACHE_DIMENSOES.
+
+    Retorna:
+        set: Chaves da dimensão. O conjunto é compartilhado; não deve ser alterado
+        diretamente (use registrar_chaves).
+    """
+    caminho_snapshot = caminho_snapshot if caminho_snapshot is not None else CAMINHO_SNAPSHOT
+    with _trava:
+        item = _cache.get(tabela)
+        if item is not None:
+            return item['chaves']
+
+        inicio = time.perf_counter()
+        if conn.dialect.name != 'mssql':
+            # Sem soma de verificação no banco, a versão sai das próprias chaves lidas
+            chaves = _ler_chaves(conn, tabela)
+            versao = _versao_das_chaves(chaves)
+        else:
+            versao = versao_dimensao(conn, tabela)
+            salvo = _ler_snapshot(caminho_snapshot).get(tabela) if caminho_snapshot else None
+            if salvo and salvo['versao'] == versao:
+                _cache[tabela] = {'versao': versao, 'chaves': set(salvo['chaves'])}
+                logger.info(f"Chaves da tabela {tabela} carregadas do snapshot {caminho_snapshot}.")
+                return _cache[tabela]['chaves']
+            chaves = _ler_chaves(conn, tabela)
+
+        _cache[tabela] = {'versao': versao, 'chaves': chaves}
+        logger.info(f"{len(chaves)} chaves lidas da tabela {tabela} em {time.perf_counter() - inicio:.2f}s.")
+        if caminho_snapshot:
+            _gravar_snapshot(caminho_snapshot)
+        return chaves
+
+# Função para registrar no cache chaves inseridas pelo próprio processo
+def registrar_chaves(tabela, novas_chaves, versao=None, caminho_snapshot=None):
+    """
+    Acrescenta ao cache chaves recém-inseridas. A versão da dimensão depois da
+    inserção deve ser informada quando conhecida; sem ela, a versão guardada
+    fica desconhecida e a próxima execução relê a tabela em vez de usar o
+    snapshot.
+    """
+    caminho_snapshot = caminho_snapshot if caminho_snapshot is not None else CAMINHO_SNAPSHOT
+    with _trava:
+        item = _cache.get(tabela)
+        novas_chaves = set(novas_chaves)
+        if item is None or not novas_chaves:
+            return
+        item['chaves'] |= novas_chaves
+        item['versao'] = versao
+        if caminho_snapshot:
+            _gravar_snapshot(caminho_snapshot)
+
+# Função para descartar o cache de uma dimensão (ou de todas)
+def invalidar(tabela=None):
+    with _trava:
+        if tabela is None:
+            _cache.clear()
+        else:
+            _cache.pop(tabela, None)
+
+# Função para validar as chaves estrangeiras de um DataFrame contra as dimensões em cache
+def validar_chaves(conn, df, colunas_dimensoes):
+    """
+    Confere, em memória, se os códigos do DataFrame existem nas dimensões.
+    As linhas órfãs são registradas no log; quem chama descarta essas linhas
+    filtrando o DataFrame pela máscara retornada (df[validar_chaves(...)]).
+
+    Parâmetros:
+        conn (Connection): Conexão SQLAlchemy usada se o cache precisar ser carregado.
+        df (DataFrame): Dados da tabela fato.
+        colunas_dimensoes (dict): Coluna do DataFrame -> tabela de dimensão.
+
+    Retorna:
+        Series: Máscara booleana com True nas linhas cujas chaves existem (ou são nulas) em todas as dimensões.
+    """
+    validas = None
+    for coluna, tabela in colunas_dimensoes.items():
+        # Código nulo não referencia a dimensão (como em uma chave estrangeira do banco)
+        existe = df[coluna].isin(obter_chaves(conn, tabela)) | df[coluna].isna()
+        orfaos = df.loc[~existe, coluna].unique()
+        if len(orfaos):
+            logger.warning(f"{int((~existe).sum())} linhas descartadas: {coluna} inexistente na tabela {tabela} "
+                           f"(ex.: {orfaos[:5].tolist()}).")
+        validas = existe if validas is None else validas & existe
+    return validas
@@ -0,0 +1,306 @@
+import os
+import atexit
+import argparse
+import logging
+import threading
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from resumo_arquivos import calcular_sha256
+from instrumentacao import medir
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Pasta do cache de extração (vazio desativa o cache; ex.: NEOBPO_CACHE_EXTRACAO=.cache_extracao)
+VARIAVEL_PASTA = 'NEOBPO_CACHE_EXTRACAO'
+PASTA_CACHE = os.getenv(VARIAVEL_PASTA, '')
+
+# Tamanho máximo do cache em MB; as entradas usadas há mais tempo são removidas primeiro
+TAMANHO_MAXIMO_MB = float(os.getenv('NEOBPO_CACHE_EXTRACAO_MB', '1024'))
+
+# Compressão das entradas (a mesma dos Parquet intermediários)
+COMPRESSAO = 'zstd'
+
+# Contadores desta execução, registrados no log ao final do processo
+_contadores = {'acertos': 0, 'falhas': 0, 'gravadas': 0, 'removidas': 0}
+# Resumos já calculados nesta execução: (caminho, tamanho, mtime) -> sha256
+_resumos = {}
+_trava = threading.Lock()
+_resumo_agendado = False
+
+# Função para ligar o cache em tempo de execução (a variável NEOBPO_CACHE_EXTRACAO faz o mesmo)
+def ativar(pasta, tamanho_maximo_mb=None):
+    global PASTA_CACHE, TAMANHO_MAXIMO_MB
+    PASTA_CACHE = str(pasta)
+    if tamanho_maximo_mb is not None:
+        TAMANHO_MAXIMO_MB = float(tamanho_maximo_mb)
+
+# Função para desligar o cache
+def desativar():
+    global PASTA_CACHE
+    PASTA_CACHE = ''
+
+# Função para verificar se o cache está ligado
+def ativo():
+    return bool(PASTA_CACHE)
+
+# Função para obter uma cópia dos contadores de acertos, falhas, entradas gravadas e removidas
+def estatisticas():
+    with _trava:
+        return dict(_contadores)
+
+# Função para registrar no log os contadores desta execução
+def registrar_resumo():
+    contadores = estatisticas()
+    if contadores['acertos'] or contadores['falhas']:
+        logger.info(f"Cache de extração ({PASTA_CACHE}): {contadores['acertos']} acerto(s), "
+                    f"{contadores['falhas']} falha(s), {contadores['gravadas']} entrada(s) gravada(s), "
+                    f"{contadores['removidas']} removida(s).")
+
+# Função para somar um contador e agendar o resumo ao final do processo, uma única vez
+def _contar(contador):
+    global _resumo_agendado
+    with _trava:
+        _contadores[contador] += 1
+        if not _resumo_agendado:
+            atexit.register(registrar_resumo)
+            _resumo_agendado = True
+
+# Função para obter o SHA-256 do arquivo, calculado uma única vez por versão do arquivo na execução
+def _resumo_arquivo(caminho):
+    estado = os.stat(caminho)
+    chave = (os.path.abspath(caminho), estado.st_size, estado.st_mtime_ns)
+    with _trava:
+        resumo = _resumos.get(chave)
+    if resumo is None:
+        resumo = calcular_sha256(caminho)
+        with _trava:
+            _resumos[chave] = resumo
+    return resumo
+
+# Função para obter o caminho da entrada do cache de um arquivo de origem
+def caminho_entrada(caminho_origem, extrator, versao):
+    """
+    A chave é o conteúdo do arquivo (SHA-256) mais o extrator e a sua versão:
+    um arquivo baixado de novo com os mesmos bytes reaproveita a entrada, mesmo
+    com outro nome, e uma nova versão do extrator não lê entradas antigas.
+    """
+    return os.path.join(PASTA_CACHE, f"{extrator}-{versao}-{_resumo_arquivo(caminho_origem)}.parquet")
+
+# Função para verificar se o arquivo de origem pode usar o cache
+def _usar_cache(caminho_origem):
+    return bool(PASTA_CACHE) and os.path.isfile(caminho_origem)
+
+# Função para marcar a entrada como usada agora (ordem da remoção por LRU)
+def _tocar(caminho):
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+
+# Função para montar o esquema de gravação a partir do primeiro bloco
+def _esquema_gravacao(esquema):
+    # Índices de dicionário largos e colunas só com nulos como texto, para os blocos seguintes caberem no esquema
+    campos = []
+    for campo in esquema:
+        if pa.types.is_dictionary(campo.type):
+            campo = campo.with_type(pa.dictionary(pa.int32(), campo.type.value_type, campo.type.ordered))
+        elif pa.types.is_null(campo.type):
+            campo = campo.with_type(pa.string())
+        campos.append(campo)
+    return pa.schema(campos, metadata=esquema.metadata)
+
+# Função para remover as entradas usadas há mais tempo até o cache caber no tamanho máximo
+def remover_excedente(tamanho_maximo_mb=None):
+    """
+    Remove as entradas menos usadas recentemente (a data de modificação de
+    cada entrada é atualizada a cada acerto) até o total caber no limite.
+
+    Retorna:
+        int: Quantidade de entradas removidas.
+    """
+    limite = (TAMANHO_MAXIMO_MB if tamanho_maximo_mb is None else tamanho_maximo_mb) * 1024 * 1024
+    entradas = []
+    for item in os.scandir(PASTA_CACHE):
+        if item.is_file() and item.name.endswith('.parquet'):
+            estado = item.stat()
+            entradas.append((estado.st_mtime_ns, estado.st_size, item.path))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    removidas = 0
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+        except OSError as e:
+            logger.warning(f"Não foi possível remover a entrada do cache {caminho}: {e}")
+            continue
+        total -= tamanho
+        removidas += 1
+        _contar('removidas')
+    if removidas:
+        logger.info(f"{removidas} entrada(s) removida(s) do cache de extração para caber em "
+                    f"{limite / 1024 / 1024:,.0f} MB.")
+    return removidas
+
+# Gravação de uma entrada, bloco a bloco, em um arquivo temporário renomeado no fim
+class _GravacaoEntrada:
+    def __init__(self, destino):
+        self.destino = destino
+        self.temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.escritor = None
+
+    def gravar(self, df):
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        if self.escritor is None:
+            self.escritor = pq.ParquetWriter(self.temporario, _esquema_gravacao(tabela.schema), compression=COMPRESSAO)
+        self.escritor.write_table(tabela.cast(self.escritor.schema))
+
+    def concluir(self):
+        if self.escritor is None:
+            return
+        self.escritor.close()
+        os.replace(self.temporario, self.destino)
+        _contar('gravadas')
+        remover_excedente()
+
+    def descartar(self, motivo=None):
+        if motivo is not None:
+            logger.warning(f"Resultado não guardado no cache de extração ({self.destino}): {motivo}")
+        if self.escritor is not None:
+            self.escritor.close()
+            self.escritor = None
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+# Função para extrair um arquivo, reaproveitando o resultado guardado para o mesmo conteúdo
+def extrair_com_cache(caminho_origem, extrator, versao, extrair):
+    """
+    Retorna o DataFrame extraído do arquivo de origem. Com o cache ligado e uma
+    entrada para o mesmo conteúdo, extrator e versão, o DataFrame é lido do
+    Parquet guardado (com os mesmos tipos) e extrair não é chamada; caso
+    contrário, chama extrair e guarda o resultado.
+
+    Parâmetros:
+        caminho_origem (str): Arquivo de origem (PDF, XML, CSV).
+        extrator (str): Nome do extrator (ex.: 'pdf.centro_custo').
+        versao (str ou int): Versão do extrator; deve mudar sempre que o resultado mudar.
+        extrair (callable): Função sem argumentos que faz a extração e retorna um DataFrame.
+
+    Retorna:
+        DataFrame: Resultado da extração.
+    """
+    if not _usar_cache(caminho_origem):
+        return extrair()
+
+    destino = caminho_entrada(caminho_origem, extrator, versao)
+    if os.path.exists(destino):
+        try:
+            with medir('cache_extracao.leitura', extrator=extrator) as medicao:
+                medicao.registrar(bytes_lidos=os.path.getsize(destino))
+                df = pq.read_table(destino).to_pandas()
+                medicao.registrar(linhas_saida=len(df))
+            _tocar(destino)
+            _contar('acertos')
+            logger.info(f"Cache de extração: {extrator} de {caminho_origem} lido de {destino}.")
+            return df
+        except Exception as e:
+            logger.warning(f"Entrada do cache de extração ilegível, extraindo de novo ({destino}): {e}")
+
+    _contar('falhas')
+    df = extrair()
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    gravacao = _GravacaoEntrada(destino)
+    try:
+        gravacao.gravar(df)
+        gravacao.concluir()
+    except Exception as e:
+        gravacao.descartar(e)
+    return df
+
+# Função para extrair um arquivo em blocos, reaproveitando o resultado guardado para o mesmo conteúdo
+def iterar_com_cache(caminho_origem, extrator, versao, gerar_blocos, tamanho_bloco):
+    """
+    Equivalente a extrair_com_cache para extrações em blocos. Num acerto, os
+    blocos são lidos do Parquet guardado com tamanho_bloco linhas; numa
+    falha, os blocos de gerar_blocos() são repassados e gravados à medida que
+    passam, e a entrada só é criada se todos forem consumidos e couberem no
+    esquema do primeiro bloco.
+
+    Parâmetros:
+        caminho_origem (str): Arquivo de origem.
+        extrator (str): Nome do extrator.
+        versao (str ou int): Versão do extrator.
+        gerar_blocos (callable): Função sem argumentos que retorna o iterador de DataFrames.
+        tamanho_bloco (int): Linhas por bloco na leitura do cache.
+
+    Retorna:
+        Iterador de DataFrames.
+    """
+    if not _usar_cache(caminho_origem):
+        yield from gerar_blocos()
+        return
+
+    destino = caminho_entrada(caminho_origem, extrator, versao)
+    if os.path.exists(destino):
+        try:
+            arquivo = pq.ParquetFile(destino)
+        except Exception as e:
+            logger.warning(f"Entrada do cache de extração ilegível, extraindo de novo ({destino}): {e}")
+        else:
+            _tocar(destino)
+            _contar('acertos')
+            logger.info(f"Cache de extração: {extrator} de {caminho_origem} lido de {destino}.")
+            try:
+                for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+                    yield pa.Table.from_batches([lote]).to_pandas()
+            finally:
+                arquivo.close()
+            return
+
+    _contar('falhas')
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    gravacao = _GravacaoEntrada(destino)
+    concluida = False
+    try:
+        for df in gerar_blocos():
+            if gravacao is not None:
+                try:
+                    gravacao.gravar(df)
+                except Exception as e:
+                    gravacao.descartar(e)
+                    gravacao = None
+            yield df
+        if gravacao is not None:
+            gravacao.concluir()
+        concluida = True
+    finally:
+        # Consumo interrompido ou erro na extração: o resultado parcial não vira entrada
+        if gravacao is not None and not concluida:
+            gravacao.descartar()
+
+# Função para listar as entradas do cache, da usada mais recentemente para a mais antiga
+def listar_entradas():
+    if not PASTA_CACHE or not os.path.isdir(PASTA_CACHE):
+        return []
+    entradas = [(item.stat().st_mtime, item.stat().st_size, item.name) for item in os.scandir(PASTA_CACHE)
+                if item.is_file() and item.name.endswith('.parquet')]
+    return sorted(entradas, reverse=True)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Lista, limita ou esvazia o cache de extração.')
+    parser.add_argument('pasta', nargs='?', default=PASTA_CACHE, help=f'Pasta do cache (padrão: {VARIAVEL_PASTA})')
+    parser.add_argument('--limitar', type=float, metavar='MB', help='Remove as entradas mais antigas até caber em MB')
+    parser.add_argument('--limpar', action='store_true', help='Remove todas as entradas')
+    argumentos = parser.parse_args()
+    if not argumentos.pasta:
+        parser.error(f'informe a pasta do cache ou defina {VARIAVEL_PASTA}')
+    ativar(argumentos.pasta)
+    if argumentos.limpar or argumentos.limitar is not None:
+        remover_excedente(0 if argumentos.limpar else argumentos.limitar)
+    entradas = listar_entradas()
+    for usada, tamanho, nome in entradas:
+        print(f"{datetime.fromtimestamp(usada):%Y-%m-%d %H:%M:%S} {tamanho / 1024 / 1024:>10.1f} MB  {nome}")
+    print(f"{len(entradas)} entrada(s), {sum(tamanho for _, tamanho, _ in entradas) / 1024 / 1024:,.1f} MB")
@@ -0,0 +1,74 @@
+import time
+import logging
+import pandas as pd
+from instrumentacao import registrar_idas_ao_banco
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tamanho padrão de cada lote enviado ao banco
+TAMANHO_LOTE_PADRAO = 5000
+
+# Função para converter o DataFrame em tuplas de parâmetros (NaN -> NULL)
+def linhas_como_parametros(df):
+    """
+    Converte as linhas do DataFrame em tuplas de valores nativos do Python,
+    trocando valores nulos por None para que o driver os envie como NULL.
+
+    Parâmetros:
+        df (DataFrame): DataFrame com os dados.
+
+    Retorna:
+        list[tuple]: Uma tupla por linha, na ordem das colunas do DataFrame.
+    """
+    df_objetos = df.astype(object).where(pd.notnull(df), None)
+    return list(df_objetos.itertuples(index=False, name=None))
+
+# Função para inserir o DataFrame em lotes parametrizados
+def inserir_em_lote(conexao, df, nome_tabela, tamanho_lote=TAMANHO_LOTE_PADRAO, confirmar=True):
+    """
+    Insere o DataFrame na tabela usando INSERTs parametrizados enviados em lotes
+    via executemany. Com pyodbc, ativa o fast_executemany para que cada lote seja
+    enviado ao SQL Server com array binding em uma única ida ao servidor.
+    Funciona com qualquer conexão DB-API que use o estilo de parâmetro '?',
+    como pyodbc e sqlite3.
+
+    Parâmetros:
+        conexao: Conexão DB-API (pyodbc.Connection, sqlite3.Connection).
+        df (DataFrame): DataFrame contendo os dados a serem inseridos.
+        nome_tabela (str): Nome da tabela onde os dados serão inseridos.
+        tamanho_lote (int): Quantidade de linhas por executemany.
+        confirmar (bool): Se True, executa commit ao final da carga.
+
+    Retorna:
+        dict: Linhas inseridas, tempo total em segundos e linhas por segundo.
+    """
+    colunas = ', '.join(df.columns)
+    marcadores = ', '.join(['?'] * len(df.columns))
+    inserir_query = f"INSERT INTO {nome_tabela} ({colunas}) VALUES ({marcadores})"
+
+    linhas = linhas_como_parametros(df)
+    inicio = time.perf_counter()
+    cursor = conexao.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+
+    posicao = 0
+    try:
+        for posicao in range(0, len(linhas), tamanho_lote):
+            cursor.executemany(inserir_query, linhas[posicao:posicao + tamanho_lote])
+            registrar_idas_ao_banco()
+        if confirmar:
+            conexao.commit()
+            registrar_idas_ao_banco()
+    except Exception as e:
+        logger.error(f"Erro ao inserir lote na tabela {nome_tabela} (linha inicial {posicao}): {e}")
+        raise
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    linhas_por_segundo = len(linhas) / segundos if segundos > 0 else float('inf')
+    logger.info(f"{len(linhas)} linhas inseridas na tabela {nome_tabela} em {segundos:.2f}s "
+                f"({linhas_por_segundo:,.0f} linhas/s, lotes de {tamanho_lote}).")
+    return {'linhas': len(linhas), 'segundos': segundos, 'linhas_por_segundo': linhas_por_segundo}
@@ -0,0 +1,199 @@
+import time
+import random
+import asyncio
+import contextlib
+import logging
+from email.utils import parsedate_to_datetime
+import aiohttp
+from instrumentacao import registrar_bytes_lidos
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Parâmetros padrão da paginação e do controle de taxa
+LIMITE_PAGINA_PADRAO = 100
+CONCORRENCIA_PADRAO = 4
+TENTATIVAS_PADRAO = 5
+ESPERA_429_PADRAO = 5.0  # Usada quando o 429 não traz Retry-After
+
+# Função para interpretar o cabeçalho Retry-After (segundos ou data HTTP)
+def segundos_retry_after(valor, padrao=ESPERA_429_PADRAO):
+    if not valor:
+        return padrao
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return padrao
+
+class LimitadorAdaptativo:
+    """
+    Limita os pedidos simultâneos e se adapta às respostas 429 do servidor.
+    A cada 429, todos os pedidos param até o fim do Retry-After e o limite de
+    pedidos simultâneos cai pela metade; depois de uma sequência de respostas
+    bem-sucedidas, o limite volta a subir de um em um até o máximo configurado.
+    """
+
+    def __init__(self, maximo, sucessos_para_subir=10):
+        self.maximo = maximo
+        self.limite = maximo
+        self.sucessos_para_subir = sucessos_para_subir
+        self.em_uso = 0
+        self.pausa_ate = 0.0
+        self.sucessos = 0
+        self.respostas_429 = 0
+        self._condicao = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condicao:
+            while True:
+                espera = self.pausa_ate - time.monotonic()
+                if espera > 0:
+                    # Acorda no fim da pausa ou antes, se outra resposta mudar o estado
+                    try:
+                        await asyncio.wait_for(self._condicao.wait(), espera)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.em_uso >= self.limite:
+                    await self._condicao.wait()
+                else:
+                    self.em_uso += 1
+                    return self
+
+    async def __aexit__(self, *excecao):
+        async with self._condicao:
+            self.em_uso -= 1
+            self._condicao.notify_all()
+
+    async def registrar_sucesso(self):
+        async with self._condicao:
+            self.sucessos += 1
+            if self.limite < self.maximo and self.sucessos >= self.sucessos_para_subir:
+                self.limite += 1
+                self.sucessos = 0
+                self._condicao.notify_all()
+
+    async def registrar_429(self, espera):
+        async with self._condicao:
+            self.respostas_429 += 1
+            self.sucessos = 0
+            self.limite = max(1, self.limite // 2)
+            self.pausa_ate = max(self.pausa_ate, time.monotonic() + espera)
+            logger.warning(f"Limite de taxa excedido; pausa de {espera:.1f}s e até {self.limite} "
+                           f"pedido(s) simultâneo(s).")
+
+# Função para buscar uma página, com novas tentativas em 429, erros 5xx e falhas de conexão
+async def _buscar_pagina(sessao, limitador, api_url, params, tentativas):
+    for tentativa in range(tentativas):
+        try:
+            async with limitador:
+                async with sessao.get(api_url, params=params) as resposta:
+                    if resposta.status == 429:
+                        espera = segundos_retry_after(resposta.headers.get('Retry-After'))
+                    elif resposta.status >= 500:
+                        espera = None
+                    else:
+                        resposta.raise_for_status()
+                        dados = await resposta.json(content_type=None)
+                        # O corpo já foi lido pelo json(); read() devolve o mesmo buffer
+                        registrar_bytes_lidos(len(await resposta.read()))
+                        await limitador.registrar_sucesso()
+                        return dados
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            logger.error(f"Erro na requisição (offset {params.get('offset')}): {e}")
+            espera = None
+
+        if espera is not None:
+            await limitador.registrar_429(espera)
+        else:
+            # Erro transitório: espera exponencial com variação aleatória
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** tentativa) * (0.5 + random.random()))
+    raise RuntimeError(f"Falha ao buscar a página com offset {params.get('offset')} após {tentativas} tentativas.")
+
+# Função para buscar as páginas de uma API paginada por offset, com pré-busca concorrente
+async def buscar_paginas(api_url, headers=None, params=None, limite_pagina=LIMITE_PAGINA_PADRAO,
+                         concorrencia=CONCORRENCIA_PADRAO, tentativas=TENTATIVAS_PADRAO, offset_inicial=0,
+                         sessao=None):
+    """
+    Gerador assíncrono que entrega as páginas (listas de registros) na ordem
+    dos offsets. Até 'concorrencia' páginas seguintes são pedidas
+    antecipadamente pela mesma sessão keep-alive; a paginação termina na
+    primeira página com menos de limite_pagina registros.
+
+    Parâmetros:
+        api_url (str): Endereço da API.
+        headers (dict, opcional): Cabeçalhos (por exemplo Authorization).
+        params (dict, opcional): Parâmetros fixos da consulta (por exemplo updated_after).
+        limite_pagina (int): Registros por página (parâmetro limit).
+        concorrencia (int): Máximo de páginas pedidas ao mesmo tempo.
+        tentativas (int): Tentativas por página.
+        offset_inicial (int): Offset da primeira página.
+        sessao (ClientSession, opcional): Sessão aiohttp já aberta.
+
+    Retorna:
+        Gerador assíncrono de tuplas (offset, registros da página).
+    """
+    params = dict(params or {})
+    limitador = LimitadorAdaptativo(concorrencia)
+    propria = sessao is None
+    if propria:
+        conector = aiohttp.TCPConnector(limit=concorrencia)
+        sessao = aiohttp.ClientSession(headers=headers, connector=conector,
+                                       timeout=aiohttp.ClientTimeout(total=120))
+
+    def agendar(offset):
+        pagina = {**params, 'limit': limite_pagina, 'offset': offset}
+        return asyncio.ensure_future(_buscar_pagina(sessao, limitador, api_url, pagina, tentativas))
+
+    inicio = time.perf_counter()
+    registros = 0
+    proximo_offset = offset_inicial
+    pendentes = []
+    try:
+        # Mantém 'concorrencia' páginas à frente da que está sendo entregue
+        for _ in range(concorrencia):
+            pendentes.append((proximo_offset, agendar(proximo_offset)))
+            proximo_offset += limite_pagina
+
+        while pendentes:
+            offset, tarefa = pendentes.pop(0)
+            dados = await tarefa
+            if dados:
+                registros += len(dados)
+                yield offset, dados
+            if len(dados or []) < limite_pagina:
+                break
+            pendentes.append((proximo_offset, agendar(proximo_offset)))
+            proximo_offset += limite_pagina
+    finally:
+        for _, tarefa in pendentes:
+            tarefa.cancel()
+        await asyncio.gather(*(tarefa for _, tarefa in pendentes), return_exceptions=True)
+        if propria:
+            await sessao.close()
+        segundos = time.perf_counter() - inicio
+        logger.info(f"{registros} registros buscados em {segundos:.2f}s "
+                    f"({limitador.respostas_429} respostas 429).")
+
+# Função para consumir todas as páginas a partir de código síncrono
+def consumir_paginas(api_url, ao_receber_pagina, headers=None, params=None, **opcoes):
+    """
+    Executa buscar_paginas em um loop de eventos próprio e chama
+    ao_receber_pagina(offset, registros) para cada página, na ordem.
+
+    Retorna:
+        int: Total de registros recebidos.
+    """
+    async def consumir():
+        total = 0
+        # aclosing encerra a sessão e as pré-buscas mesmo se ao_receber_pagina falhar
+        async with contextlib.aclosing(buscar_paginas(api_url, headers, params, **opcoes)) as paginas:
+            async for offset, dados in paginas:
+                ao_receber_pagina(offset, dados)
+                total += len(dados)
+        return total
+
+    return asyncio.run(consumir())
@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import threading
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import QueuePool
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Parâmetros padrão de conexão (podem ser substituídos pela variável NEOBPO_DB_URL)
+SERVIDOR_PADRAO = r'DESKTOP-A0LJ7MK\SQLEXPRESS'
+BANCO_PADRAO = 'CASE_NEOBPO'
+DRIVER_PADRAO = 'ODBC Driver 17 for SQL Server'
+VARIAVEL_URL = 'NEOBPO_DB_URL'
+
+# Configuração padrão do pool de conexões
+CONFIG_POOL = {
+    'pool_size': 5,          # Conexões mantidas abertas
+    'max_overflow': 5,       # Conexões extras permitidas em picos
+    'pool_timeout': 30,      # Segundos aguardando uma conexão livre
+    'pool_recycle': 1800,    # Recicla conexões com mais de 30 minutos
+    'pool_pre_ping': True,   # Descarta conexões mortas antes de entregar
+}
+
+# Engines já criadas nesta execução, uma por URL
+_engines = {}
+_trava = threading.Lock()
+
+# Pool que mede o tempo de espera por uma conexão livre
+class PoolMedido(QueuePool):
+    metricas = None
+
+    def recreate(self):
+        # Mantém as métricas quando a engine recria o pool (por exemplo em dispose())
+        novo_pool = super().recreate()
+        novo_pool.metricas = self.metricas
+        return novo_pool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            if self.metricas is not None:
+                with _trava:
+                    self.metricas['espera_total_s'] += espera
+                    self.metricas['espera_max_s'] = max(self.metricas['espera_max_s'], espera)
+
+# Função para montar a URL de conexão com o SQL Server (autenticação integrada)
+def url_sql_server(servidor=SERVIDOR_PADRAO, banco=BANCO_PADRAO, driver=DRIVER_PADRAO):
+    """
+    Monta a URL SQLAlchemy (mssql+pyodbc) para o SQL Server.
+
+    Parâmetros:
+        servidor (str): Nome do servidor SQL.
+        banco (str, opcional): Nome do banco de dados. Se None, conecta ao banco padrão do login.
+        driver (str): Driver ODBC a ser utilizado.
+
+    Retorna:
+        URL: URL de conexão.
+    """
+    connection_string = f"DRIVER={{{driver}}};SERVER={servidor};"
+    if banco:
+        connection_string += f"DATABASE={banco};"
+    connection_string += "Trusted_Connection=yes;"
+    return URL.create("mssql+pyodbc", query={"odbc_connect": connection_string})
+
+# Função para registrar os eventos que alimentam as métricas do pool
+def _instalar_metricas(engine):
+    metricas = {'conexoes_criadas': 0, 'checkouts': 0, 'checkins': 0, 'invalidadas': 0,
+                'espera_total_s': 0.0, 'espera_max_s': 0.0}
+    engine.pool.metricas = metricas
+
+    def contar(nome):
+        def ouvinte(*args):
+            with _trava:
+                metricas[nome] += 1
+        return ouvinte
+
+    event.listen(engine, 'connect', contar('conexoes_criadas'))
+    event.listen(engine, 'checkout', contar('checkouts'))
+    event.listen(engine, 'checkin', contar('checkins'))
+    event.listen(engine, 'invalidate', contar('invalidadas'))
+
+# Função para obter a engine compartilhada da execução
+def obter_engine(url=None, **opcoes_pool):
+    """
+    Retorna a engine SQLAlchemy da URL informada, criando-a apenas na primeira
+    chamada. Todas as etapas de carga de uma execução reutilizam a mesma engine
+    e, portanto, o mesmo pool de conexões.
+
+    A URL é escolhida nesta ordem: parâmetro url, variável de ambiente
+    NEOBPO_DB_URL (por exemplo 'sqlite:///teste.db' em testes) e, por fim,
+    o SQL Server padrão (SERVIDOR_PADRAO/BANCO_PADRAO).
+
+    Parâmetros:
+        url (str | URL, opcional): URL de conexão.
+        **opcoes_pool: Substituem os valores de CONFIG_POOL.
+
+    Retorna:
+        Engine: Engine com pool configurado e métricas em engine.pool.metricas.
+    """
+    url = make_url(url or os.getenv(VARIAVEL_URL) or url_sql_server())
+    chave = url.render_as_string(hide_password=False)
+
+    with _trava:
+        engine = _engines.get(chave)
+    if engine is not None:
+        return engine
+
+    config = {**CONFIG_POOL, **opcoes_pool}
+    argumentos = {}
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # SQLite em memória usa um pool próprio de conexão única
+        argumentos['pool_pre_ping'] = config['pool_pre_ping']
+    else:
+        argumentos.update(config)
+        argumentos['poolclass'] = PoolMedido
+    if url.get_backend_name() == 'mssql':
+        # Array binding nos executemany do pyodbc (to_sql e INSERTs em lote)
+        argumentos['fast_executemany'] = True
+
+    try:
+        engine = create_engine(url, **argumentos)
+        _instalar_metricas(engine)
+    except Exception as e:
+        logger.error(f"Erro ao criar a engine de conexão: {e}")
+        raise
+
+    with _trava:
+        engine = _engines.setdefault(chave, engine)
+    logger.info(f"Engine de conexão criada para {url.render_as_string(hide_password=True)}.")
+    return engine
+
+# Função para obter uma conexão DB-API do pool (pyodbc/sqlite3)
+def conexao_dbapi(engine=None):
+    """
+    Retorna uma conexão DB-API emprestada do pool da engine, para o código que
+    usa cursor/commit diretamente. Ao chamar close(), a conexão volta ao pool.
+    """
+    engine = engine or obter_engine()
+    return engine.raw_connection()
+
+# Função para verificar se uma tabela já existe no banco da engine
+def tabela_existe(engine, tabela):
+    return inspect(engine).has_table(tabela)
+
+# Função para consultar as métricas do pool
+def metricas_pool(engine=None):
+    """Retorna as métricas acumuladas do pool da engine (checkouts, tempo de espera etc.)."""
+    engine = engine or obter_engine()
+    with _trava:
+        metricas = dict(getattr(engine.pool, 'metricas', None) or {})
+    metricas['status'] = engine.pool.status()
+    return metricas
+
+# Função para registrar no log as métricas de todas as engines da execução
+def registrar_metricas_pool():
+    with _trava:
+        engines = list(_engines.values())
+    for engine in engines:
+        metricas = metricas_pool(engine)
+        if 'checkouts' not in metricas:
+            continue
+        logger.info(f"Pool {engine.url.get_backend_name()}: {metricas['checkouts']} checkouts, "
+                    f"{metricas['conexoes_criadas']} conexões criadas, "
+                    f"espera total {metricas['espera_total_s']:.3f}s (máx. {metricas['espera_max_s']:.3f}s). "
+                    f"{metricas['status']}")
+
+# Função para encerrar as conexões de todas as engines
+def fechar_engines():
+    with _trava:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
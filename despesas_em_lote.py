@@ -0,0 +1,96 @@
+import time
+import sqlite3
+import logging
+from carga_em_lote import linhas_como_parametros
+from instrumentacao import registrar_idas_ao_banco
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Colunas do tipo dbo.TipoDespesaDetalhada, na ordem declarada no SQL Server
+COLUNAS_DESPESA_DETALHADA = ['DTBASE', 'CODIGOCENTROCUSTO', 'CENTROCUSTOMASTER', 'VLDESPESA',
+                             'CODFILIALPRINCIPAL', 'CODCONTA', 'MES_A']
+
+# Quantidade padrão de linhas enviadas em cada chamada da procedure
+TAMANHO_LOTE_PADRAO = 1000
+
+# Função para enviar um lote à sp_Despesas_Detalhadas_Lote (TVP) ou à variante JSON
+def _executar_lote_sql_server(conexao, lote, modo):
+    cursor = conexao.cursor()
+    try:
+        if modo == 'json':
+            cursor.execute("{CALL sp_Despesas_Detalhadas_Lote_Json (?)}",
+                           lote.to_json(orient='records', date_format='iso'))
+        else:
+            # O pyodbc envia uma lista de tuplas como parâmetro de tabela (TVP)
+            cursor.execute("{CALL sp_Despesas_Detalhadas_Lote (?)}", [linhas_como_parametros(lote)])
+        inseridos, atualizados = cursor.fetchone()
+        conexao.commit()
+        registrar_idas_ao_banco(2)
+    finally:
+        cursor.close()
+    return inseridos, atualizados
+
+# Função que emula a sp_Despesas_Detalhadas_Lote_Json no SQLite (json_each + ON CONFLICT)
+def _executar_lote_sqlite(conexao, lote):
+    lote_json = lote.to_json(orient='records', date_format='iso')
+    colunas = ', '.join(COLUNAS_DESPESA_DETALHADA)
+    extracoes = ', '.join(f"json_extract(value, '$.{coluna}')" for coluna in COLUNAS_DESPESA_DETALHADA)
+    atribuicoes = ', '.join(f"{coluna} = excluded.{coluna}"
+                            for coluna in COLUNAS_DESPESA_DETALHADA if coluna != 'CODIGOCENTROCUSTO')
+
+    with conexao:
+        atualizados = conexao.execute(
+            "SELECT COUNT(*) FROM json_each(?) "
+            "JOIN DESPESA_DETALHADA d ON d.CODIGOCENTROCUSTO = json_extract(value, '$.CODIGOCENTROCUSTO')",
+            (lote_json,),
+        ).fetchone()[0]
+        conexao.execute(
+            f"INSERT INTO DESPESA_DETALHADA ({colunas}) SELECT {extracoes} FROM json_each(?) WHERE true "
+            f"ON CONFLICT (CODIGOCENTROCUSTO) DO UPDATE SET {atribuicoes}",
+            (lote_json,),
+        )
+    registrar_idas_ao_banco(3)
+    return len(lote) - atualizados, atualizados
+
+# Função para enviar o DataFrame de despesas em lotes para a procedure em lote
+def enviar_despesas_em_lote(conexao, df, tamanho_lote=TAMANHO_LOTE_PADRAO, modo='tvp'):
+    """
+    Divide o DataFrame em lotes e envia cada lote para a sp_Despesas_Detalhadas_Lote,
+    que faz o upsert do lote inteiro com um único MERGE e uma única transação.
+    Com uma conexão sqlite3, a procedure é emulada localmente com a mesma semântica,
+    o que permite testar o fluxo sem um SQL Server.
+
+    Parâmetros:
+        conexao: Conexão pyodbc com o SQL Server ou sqlite3.Connection.
+        df (DataFrame): Despesas com as colunas de COLUNAS_DESPESA_DETALHADA.
+        tamanho_lote (int): Quantidade de linhas por chamada da procedure.
+        modo (str): 'tvp' (parâmetro de tabela) ou 'json' (array JSON), apenas no SQL Server.
+
+    Retorna:
+        dict: Totais de linhas inseridas e atualizadas e quantidade de lotes enviados.
+    """
+    # Uma chave repetida no mesmo lote seria aplicada uma única vez; prevalece a última
+    df = df[COLUNAS_DESPESA_DETALHADA].drop_duplicates(subset=['CODIGOCENTROCUSTO'], keep='last')
+    emulado = isinstance(conexao, sqlite3.Connection)
+
+    inicio = time.perf_counter()
+    totais = {'inseridos': 0, 'atualizados': 0, 'lotes': 0}
+    for posicao in range(0, len(df), tamanho_lote):
+        lote = df.iloc[posicao:posicao + tamanho_lote]
+        try:
+            if emulado:
+                inseridos, atualizados = _executar_lote_sqlite(conexao, lote)
+            else:
+                inseridos, atualizados = _executar_lote_sql_server(conexao, lote, modo)
+        except Exception as e:
+            logger.error(f"Erro ao enviar o lote iniciado na linha {posicao} para sp_Despesas_Detalhadas_Lote: {e}")
+            raise
+        totais['inseridos'] += inseridos
+        totais['atualizados'] += atualizados
+        totais['lotes'] += 1
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f"{len(df)} despesas enviadas em {totais['lotes']} lotes em {segundos:.2f}s: "
+                f"{totais['inseridos']} inseridas, {totais['atualizados']} atualizadas.")
+    return totais
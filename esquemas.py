@@ -0,0 +1,117 @@
+import pandas as pd
+import pyarrow as pa
+from leitura_em_blocos import ler_csv_em_blocos
+from normalizacao_datas import converter_datas
+
+# Tipos lógicos das colunas: tipo do pandas na leitura e tipo do Arrow no Parquet
+TIPOS_LOGICOS = {
+    'int16': ('Int16', pa.int16()),
+    'int32': ('Int32', pa.int32()),
+    'texto': ('string', pa.string()),
+    'categoria': ('category', pa.dictionary(pa.int32(), pa.string())),
+    # DECIMAL(18, 2) das tabelas; no pandas fica em float64, aceito por todos os drivers
+    'decimal': ('float64', pa.decimal128(18, 2)),
+    # Datas em texto ISO (yyyy-mm-dd), como são enviadas ao banco, vindas do CSV ou do Parquet; poucas distintas, então categoria
+    'data': ('category', pa.date32()),
+}
+
+# Registro das entidades: colunas com o tipo lógico e opções de leitura do CSV
+ESQUEMAS = {
+    'CONTAS': {
+        'colunas': {'CODCONTA': 'int32', 'CONTA': 'texto', 'GRUPO': 'categoria'},
+        # Códigos como '1.01.001' viram 101001
+        'separador_milhar': '.',
+    },
+    'CENTRO_DE_CUSTO': {
+        'colunas': {
+            'CODIGOCENTROCUSTO': 'int32',
+            'DESCRICAO': 'texto',
+            'CENTROCUSTO': 'categoria',
+            'CENTROCUSTO_COD': 'int32',
+        },
+        'separador_milhar': '.',
+    },
+    'ORCAMENTO': {
+        'colunas': {
+            'ORCAMENTO_ULTDATA': 'data',
+            'ORCAMENTO_FILIALCOD': 'int16',
+            'ORCAMENTO_CONTACOD': 'int32',
+            'ORCAMENTO_CENTROCUSTOCOD': 'int32',
+            'ORCAMENTO_ORCADO': 'decimal',
+            'ORCAMENTO_PERRATEIO': 'decimal',
+        },
+    },
+    'DESPESAS': {
+        'colunas': {
+            'DTBASE': 'data',
+            'CODIGOCENTROCUSTO': 'int32',
+            'CENTROCUSTOMASTER': 'int32',
+            'VLDESPESA': 'decimal',
+            'CODFILIALPRINCIPAL': 'int16',
+            'CODCONTA': 'int32',
+            'MES_A': 'data',
+        },
+    },
+}
+
+# Função para obter a definição de uma entidade do registro
+def _entidade(nome):
+    try:
+        return ESQUEMAS[nome]
+    except KeyError:
+        raise ValueError(f"Entidade sem esquema registrado: {nome}") from None
+
+# Função para obter os tipos do pandas das colunas de uma entidade
+def tipos_pandas(entidade):
+    return {coluna: TIPOS_LOGICOS[tipo][0] for coluna, tipo in _entidade(entidade)['colunas'].items()}
+
+# Função para obter o esquema Arrow (Parquet) de uma entidade
+def esquema_arrow(entidade):
+    return pa.schema([(coluna, TIPOS_LOGICOS[tipo][1]) for coluna, tipo in _entidade(entidade)['colunas'].items()])
+
+# Função para ler o CSV de uma entidade já com os tipos do registro
+def ler_csv_tipado(caminho_arquivo, entidade, tamanho_bloco=None):
+    """
+    Lê o CSV aplicando os tipos do registro na própria leitura. As colunas
+    inteiras são lidas pelo parser nativo (que também é o único que aceita
+    'thousands', usado nas entidades com separador de milhar nos códigos) e
+    convertidas logo em seguida para o inteiro anulável estreito. As colunas
+    de data são normalizadas para texto ISO ('yyyy-mm-dd', categoria) com
+    converter_datas, seja qual for o formato do arquivo ('yyyy/mm/dd',
+    'dd/mm/yyyy'...), de modo que o CSV e o Parquet intermediário resultem
+    no mesmo DataFrame.
+
+    Parâmetros:
+        caminho_arquivo (str): Caminho do arquivo CSV.
+        entidade (str): Nome da entidade no registro (ESQUEMAS).
+        tamanho_bloco (int, opcional): Se informado, retorna um iterador de blocos.
+
+    Retorna:
+        DataFrame, ou iterador de DataFrames se tamanho_bloco for informado.
+    """
+    tipos = tipos_pandas(entidade)
+    # Inteiros lidos pelo parser como int64/float64 (bem mais rápido) e estreitados em seguida
+    inteiros = {coluna: tipo for coluna, tipo in tipos.items() if tipo.startswith('Int')}
+    leitura = {coluna: tipo for coluna, tipo in tipos.items() if coluna not in inteiros}
+    opcoes = {}
+    separador = _entidade(entidade).get('separador_milhar')
+    if separador:
+        opcoes['thousands'] = separador
+
+    datas = [coluna for coluna, tipo in _entidade(entidade)['colunas'].items() if tipo == 'data']
+
+    def ajustar(df):
+        df = df.astype({coluna: tipo for coluna, tipo in inteiros.items() if coluna in df.columns})
+        for coluna in datas:
+            if coluna in df.columns:
+                # Só os valores distintos são convertidos (ver normalizacao_datas.converter_datas)
+                df[coluna] = converter_datas(df[coluna], '%Y-%m-%d').astype('category')
+        return df
+
+    if tamanho_bloco:
+        return (ajustar(bloco) for bloco in ler_csv_em_blocos(caminho_arquivo, leitura, tamanho_bloco, **opcoes))
+    return ajustar(pd.read_csv(caminho_arquivo, dtype=leitura, **opcoes))
+
+# Função para medir a memória de um DataFrame por coluna, em MB
+def memoria_por_coluna(df):
+    return df.memory_usage(deep=True, index=False) / 1024 / 1024
@@ -0,0 +1,133 @@
+import os
+import csv
+import json
+import hashlib
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Colunas padrão da data de atualização e do identificador dos registros
+COLUNA_DATA_PADRAO = 'last_updated'
+COLUNA_ID_PADRAO = 'id'
+
+# Função para obter a chave de um registro (o id ou, na falta dele, um hash do conteúdo)
+def chave_registro(registro, coluna_id=COLUNA_ID_PADRAO):
+    valor = registro.get(coluna_id)
+    if valor not in (None, ''):
+        return str(valor)
+    conteudo = json.dumps(registro, sort_keys=True, default=str)
+    return 'sha1:' + hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+# Função para criar um estado a partir de uma marca d'água conhecida
+def estado_inicial(marca_dagua=None, chaves_fronteira=()):
+    return {'marca_dagua': marca_dagua, 'chaves_fronteira': sorted(chaves_fronteira)}
+
+# Função para ler o estado salvo (None se ainda não existir)
+def ler_estado(caminho):
+    """
+    Lê o estado da carga incremental: a maior data de atualização já gravada
+    (marca d'água) e as chaves dos registros com exatamente essa data.
+    O custo não depende do tamanho do histórico.
+    """
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Estado incremental ignorado ({caminho}): {e}")
+        return None
+
+# Função para gravar o estado de forma atômica
+def gravar_estado(caminho, estado):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(estado, arquivo)
+    os.replace(temporario, caminho)
+
+# Função para montar o estado lendo o CSV uma única vez (migração de execuções anteriores)
+def estado_a_partir_do_csv(caminho_csv, coluna_data=COLUNA_DATA_PADRAO, coluna_id=COLUNA_ID_PADRAO):
+    marca_dagua = None
+    chaves = set()
+    try:
+        with open(caminho_csv, mode='r', newline='', encoding='utf-8') as arquivo:
+            leitor = csv.DictReader(arquivo)
+            if coluna_data not in (leitor.fieldnames or []):
+                return estado_inicial()
+            for registro in leitor:
+                data = registro[coluna_data]
+                if not data:
+                    continue
+                if marca_dagua is None or data > marca_dagua:
+                    marca_dagua, chaves = data, {chave_registro(registro, coluna_id)}
+                elif data == marca_dagua:
+                    chaves.add(chave_registro(registro, coluna_id))
+    except FileNotFoundError:
+        return estado_inicial()
+    logger.info(f"Estado incremental reconstruído a partir de {caminho_csv}: marca d'água {marca_dagua}.")
+    return estado_inicial(marca_dagua, chaves)
+
+# Função para descartar registros já gravados (anteriores ou na fronteira da marca d'água)
+def filtrar_novos(registros, estado, coluna_data=COLUNA_DATA_PADRAO, coluna_id=COLUNA_ID_PADRAO):
+    """
+    Mantém apenas os registros ainda não gravados: os com data posterior à
+    marca d'água e, com a mesma data, os cujas chaves não estão na fronteira.
+    Assim a carga não depende de o filtro da API ser exclusivo ou inclusivo
+    e registros reenviados na fronteira não são duplicados.
+
+    Retorna:
+        list: Registros novos, sem repetições (mesma chave e data) entre si.
+    """
+    marca_dagua = estado.get('marca_dagua')
+    fronteira = set(estado.get('chaves_fronteira', ()))
+    vistos = set()
+    novos = []
+    repetidos = 0
+    for registro in registros:
+        data = registro.get(coluna_data) or ''
+        if marca_dagua is not None and data and data < marca_dagua:
+            repetidos += 1
+            continue
+        chave = chave_registro(registro, coluna_id)
+        # A mesma versão do registro (chave e data) entregue duas vezes é gravada uma única vez
+        if (chave, data) in vistos or (data == marca_dagua and chave in fronteira):
+            repetidos += 1
+            continue
+        vistos.add((chave, data))
+        novos.append(registro)
+    if repetidos:
+        logger.info(f"{repetidos} registros já gravados foram descartados na fronteira da marca d'água.")
+    return novos
+
+# Função para avançar o estado após gravar um lote de registros novos
+def avancar_estado(estado, registros, coluna_data=COLUNA_DATA_PADRAO, coluna_id=COLUNA_ID_PADRAO):
+    marca_dagua = estado.get('marca_dagua')
+    chaves = set(estado.get('chaves_fronteira', ()))
+    for registro in registros:
+        data = registro.get(coluna_data)
+        if not data:
+            continue
+        if marca_dagua is None or data > marca_dagua:
+            marca_dagua, chaves = data, {chave_registro(registro, coluna_id)}
+        elif data == marca_dagua:
+            chaves.add(chave_registro(registro, coluna_id))
+    return estado_inicial(marca_dagua, chaves)
+
+# Função para registrar no estado o ponto de retomada de uma carga em andamento
+def registrar_checkpoint(estado, consulta, carga, proximo_offset, posicao=None):
+    """
+    Devolve o estado com as páginas já confirmadas (marca d'água avançada)
+    e o ponto de retomada da carga: o estado usado na consulta à API, o
+    identificador da carga, o offset da próxima página e a posição
+    confirmada do arquivo de saída.
+    """
+    return {
+        **estado_inicial(estado.get('marca_dagua'), estado.get('chaves_fronteira', ())),
+        'em_andamento': {
+            'consulta': estado_inicial(consulta.get('marca_dagua'), consulta.get('chaves_fronteira', ())),
+            'carga': carga,
+            'proximo_offset': proximo_offset,
+            'posicao': posicao,
+        },
+    }
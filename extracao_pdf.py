@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import pdfplumber
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Quantidade padrão de páginas extraídas por tarefa do pool de processos
+PAGINAS_POR_BLOCO_PADRAO = 16
+
+# Quantidade padrão de processos: um por núcleo disponível
+PROCESSOS_PADRAO = os.cpu_count() or 1
+
+# Função para contar as páginas do PDF
+def contar_paginas(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+# Função para percorrer um intervalo de páginas do PDF
+def _iterar_intervalo(pdf_path, inicio, fim):
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(inicio, fim):
+            pagina = pdf.pages[i]
+            yield i + 1, pagina.extract_text()
+            # Libera o layout já processado; sem isso o pdfplumber mantém todas as páginas em memória
+            pagina.close()
+
+# Função executada em cada processo: extrai o texto de um intervalo de páginas
+def extrair_intervalo(pdf_path, inicio, fim):
+    """
+    Abre o PDF no próprio processo e extrai o texto das páginas [inicio, fim).
+
+    Retorna:
+        list: Tuplas (número da página, texto ou None) na ordem das páginas.
+    """
+    return list(_iterar_intervalo(pdf_path, inicio, fim))
+
+# Função para entregar os textos de um intervalo, avisando sobre páginas vazias
+def _textos_validos(paginas):
+    for numero, texto in paginas:
+        if texto:
+            yield texto
+        else:
+            logger.warning(f'Nenhum texto encontrado na página {numero}.')
+
+# Função para iterar sobre o texto das páginas do PDF, em série ou em paralelo
+def iterar_textos_pdf(pdf_path, processos=None, paginas_por_bloco=PAGINAS_POR_BLOCO_PADRAO):
+    """
+    Extrai o texto das páginas do PDF. Com processos > 1, os intervalos de
+    páginas são distribuídos entre um pool de processos, já que a extração do
+    pdfplumber é limitada por CPU. Os textos são entregues na ordem das páginas
+    assim que cada intervalo fica pronto, para que o processamento comece antes
+    do fim da extração.
+
+    Parâmetros:
+        pdf_path (str): Caminho do arquivo PDF.
+        processos (int, opcional): Quantidade de processos; None ou 1 extrai em série.
+        paginas_por_bloco (int): Quantidade de páginas por tarefa do pool.
+
+    Retorna:
+        Iterador com o texto de cada página que contém texto.
+    """
+    inicio = time.perf_counter()
+    total_paginas = contar_paginas(pdf_path)
+    intervalos = [(posicao, min(posicao + paginas_por_bloco, total_paginas))
+                  for posicao in range(0, total_paginas, paginas_por_bloco)]
+    processos = min(processos or 1, len(intervalos))
+
+    if processos <= 1:
+        yield from _textos_validos(_iterar_intervalo(pdf_path, 0, total_paginas))
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            pendentes = {executor.submit(extrair_intervalo, pdf_path, primeira, ultima): primeira
+                         for primeira, ultima in intervalos}
+            prontos = {}
+            proximo = 0
+            while pendentes:
+                concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    prontos[pendentes.pop(futuro)] = futuro.result()
+                # Entrega apenas os intervalos contíguos, preservando a ordem das páginas
+                while proximo in prontos:
+                    paginas = prontos.pop(proximo)
+                    yield from _textos_validos(paginas)
+                    proximo += len(paginas)
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f'{total_paginas} páginas extraídas em {segundos:.2f}s com {processos} processo(s).')
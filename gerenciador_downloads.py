@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import time
+import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout, ChunkedEncodingError
+from resumo_arquivos import calcular_sha256
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Arquivo, na pasta de destino, com o registro dos downloads concluídos
+NOME_MANIFESTO = '.downloads.json'
+
+# Quantidade padrão de downloads simultâneos
+MAX_DOWNLOADS_PADRAO = 3
+
+# Tamanho de cada pedaço lido da rede; um pedaço incompleto se perde quando a conexão cai
+TAMANHO_PEDACO = 64 * 1024
+
+# Protege o manifesto, atualizado por vários downloads ao mesmo tempo
+_trava = threading.Lock()
+
+# Função para ler o manifesto da pasta de destino
+def ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, NOME_MANIFESTO), 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifesto de downloads ignorado ({pasta}): {e}")
+        return {}
+
+# Função para atualizar a entrada de um arquivo e gravar o manifesto de forma atômica
+def _atualizar_manifesto(pasta, manifesto, nome_arquivo, entrada):
+    caminho = os.path.join(pasta, NOME_MANIFESTO)
+    with _trava:
+        manifesto[nome_arquivo] = entrada
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(manifesto, arquivo, indent=2)
+        os.replace(temporario, caminho)
+
+# Função para obter o nome do arquivo enviado pelo servidor (por exemplo 'orcamento.xml.zip')
+def _nome_da_resposta(resposta, nome_arquivo):
+    disposicao = resposta.headers.get('Content-Disposition', '')
+    encontrado = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposicao)
+    return os.path.basename(encontrado.group(1)) if encontrado else nome_arquivo
+
+# Função para obter o tamanho total do arquivo a partir da resposta (completa ou parcial)
+def _tamanho_total(resposta):
+    if resposta.status_code == 206:
+        encontrado = re.search(r'/(\d+)$', resposta.headers.get('Content-Range', ''))
+        return int(encontrado.group(1)) if encontrado else None
+    tamanho = resposta.headers.get('Content-Length')
+    return int(tamanho) if tamanho is not None else None
+
+# Função para conferir se o resultado de um download anterior continua íntegro no disco
+def _artefato_integro(pasta, entrada):
+    extraidos = entrada.get('extraidos')
+    if extraidos is not None:
+        # O zip foi removido após a extração; confere os arquivos extraídos
+        return all(os.path.exists(os.path.join(pasta, nome)) and os.path.getsize(os.path.join(pasta, nome)) == tamanho
+                   for nome, tamanho in extraidos.items())
+    caminho = os.path.join(pasta, entrada['arquivo'])
+    return (os.path.exists(caminho) and os.path.getsize(caminho) == entrada['tamanho']
+            and calcular_sha256(caminho) == entrada['sha256'])
+
+# Função para baixar um arquivo com retomada e tentativas de reconexão
+def baixar_arquivo(sessao, url, pasta, nome_arquivo, manifesto, tentativas=5, fator_espera=1.0, timeout=60):
+    """
+    Baixa um arquivo para a pasta de destino. O conteúdo é gravado em
+    '<nome>.part' e, se a conexão cair, a próxima tentativa (ou a próxima
+    execução) continua do ponto em que parou com um pedido Range. Se o
+    servidor informar o mesmo tamanho e ETag registrados no manifesto e o
+    arquivo local estiver íntegro, o download é pulado sem transferir o corpo.
+
+    Parâmetros:
+        sessao (Session): Sessão HTTP (autenticação, pool de conexões).
+        url (str): Endereço do arquivo.
+        pasta (str): Pasta de destino.
+        nome_arquivo (str): Nome lógico do arquivo (chave no manifesto).
+        manifesto (dict): Manifesto da pasta, atualizado ao fim do download.
+        tentativas (int): Quantidade máxima de tentativas.
+        fator_espera (float): Base, em segundos, da espera exponencial entre tentativas.
+        timeout (float): Timeout de conexão e de leitura, em segundos.
+
+    Retorna:
+        dict: nome, caminho local, status ('pulado', 'baixado' ou 'retomado') e bytes transferidos.
+    """
+    parcial = os.path.join(pasta, f"{nome_arquivo}.part")
+    entrada = manifesto.get(nome_arquivo)
+    transferidos = 0
+    retomado = False
+
+    for tentativa in range(tentativas):
+        inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        cabecalhos = {}
+        if inicio and entrada and entrada.get('etag_parcial'):
+            # If-Range: se o arquivo mudou no servidor, a resposta vem completa (200)
+            cabecalhos = {'Range': f"bytes={inicio}-", 'If-Range': entrada['etag_parcial']}
+        else:
+            inicio = 0
+
+        try:
+            logger.info(f"Tentativa {tentativa + 1} de download do arquivo {nome_arquivo}"
+                        f"{f' a partir do byte {inicio}' if inicio else ''}...")
+            with sessao.get(url, headers=cabecalhos, stream=True, timeout=timeout) as resposta:
+                if resposta.status_code == 416:
+                    # Parte local maior que o arquivo remoto: recomeça do zero
+                    os.remove(parcial)
+                    continue
+                resposta.raise_for_status()
+
+                etag = resposta.headers.get('ETag')
+                total = _tamanho_total(resposta)
+                if (not inicio and entrada and entrada.get('etag') and etag == entrada['etag']
+                        and total == entrada['tamanho'] and _artefato_integro(pasta, entrada)):
+                    logger.info(f"Arquivo {nome_arquivo} já está atualizado; download pulado.")
+                    return {'nome': nome_arquivo, 'caminho': os.path.join(pasta, entrada['arquivo']),
+                            'status': 'pulado', 'bytes': 0}
+
+                if resposta.status_code != 206:
+                    inicio = 0
+                    entrada = {'url': url, 'etag_parcial': etag}
+                    _atualizar_manifesto(pasta, manifesto, nome_arquivo, entrada)
+                retomado = retomado or inicio > 0
+
+                with open(parcial, 'ab' if inicio else 'wb') as arquivo:
+                    for pedaco in resposta.iter_content(TAMANHO_PEDACO):
+                        arquivo.write(pedaco)
+                        transferidos += len(pedaco)
+                nome_local = _nome_da_resposta(resposta, nome_arquivo)
+
+            tamanho = os.path.getsize(parcial)
+            if total is not None and tamanho != total:
+                raise ChunkedEncodingError(f"download incompleto ({tamanho} de {total} bytes)")
+
+            caminho = os.path.join(pasta, nome_local)
+            os.replace(parcial, caminho)
+            _atualizar_manifesto(pasta, manifesto, nome_arquivo, {
+                'url': url, 'arquivo': nome_local, 'tamanho': tamanho, 'etag': etag,
+                'sha256': calcular_sha256(caminho),
+            })
+            logger.info(f"Download do arquivo {nome_arquivo} concluído com sucesso ({tamanho} bytes).")
+            return {'nome': nome_arquivo, 'caminho': caminho,
+                    'status': 'retomado' if retomado else 'baixado', 'bytes': transferidos}
+        except (ConnectionError, Timeout, ChunkedEncodingError) as e:
+            # Erros de conexão: a parte já gravada é mantida para a próxima tentativa
+            logger.error(f"Erro ao baixar o arquivo {nome_arquivo}: {e}")
+            time.sleep(fator_espera * (2 ** tentativa))
+
+    raise RuntimeError(f"Falha ao baixar o arquivo {nome_arquivo} após {tentativas} tentativas.")
+
+# Função para extrair um zip baixado e registrar os arquivos extraídos no manifesto
+def extrair_zip(pasta, nome_arquivo, caminho_zip, manifesto):
+    with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
+        zip_ref.extractall(pasta)
+        extraidos = {membro.filename: membro.file_size for membro in zip_ref.infolist() if not membro.is_dir()}
+    # Remover o arquivo zip após a extração
+    os.remove(caminho_zip)
+    _atualizar_manifesto(pasta, manifesto, nome_arquivo, {**manifesto[nome_arquivo], 'extraidos': extraidos})
+    logger.info(f"Arquivo {os.path.basename(caminho_zip)} extraído e deletado.")
+    return list(extraidos)
+
+# Função para criar uma sessão HTTP com pool de conexões do tamanho do pool de downloads
+def criar_sessao(autenticacao=None, max_downloads=MAX_DOWNLOADS_PADRAO):
+    sessao = requests.Session()
+    sessao.auth = autenticacao
+    adaptador = HTTPAdapter(pool_maxsize=max_downloads)
+    sessao.mount('http://', adaptador)
+    sessao.mount('https://', adaptador)
+    return sessao
+
+# Função para baixar vários arquivos em paralelo, extraindo os zips enquanto os demais baixam
+def baixar_arquivos(arquivos, pasta, sessao=None, max_downloads=MAX_DOWNLOADS_PADRAO, extrair=True,
+                    tentativas=5, fator_espera=1.0):
+    """
+    Baixa os arquivos com um pool limitado de downloads simultâneos. Cada zip
+    é extraído (em uma thread própria) assim que termina de baixar, em paralelo
+    com os downloads restantes. Reexecuções pulam os arquivos que não mudaram.
+
+    Parâmetros:
+        arquivos (dict): Nome lógico do arquivo -> URL.
+        pasta (str): Pasta de destino (criada se não existir).
+        sessao (Session, opcional): Sessão HTTP; padrão criar_sessao().
+        max_downloads (int): Quantidade máxima de downloads simultâneos.
+        extrair (bool): Se True, extrai e remove os arquivos .zip baixados.
+        tentativas (int): Tentativas por arquivo.
+        fator_espera (float): Base da espera exponencial entre tentativas.
+
+    Retorna:
+        dict: Nome lógico -> resultado de baixar_arquivo (status 'falhou' em caso de erro).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    sessao = sessao or criar_sessao(max_downloads=max_downloads)
+    manifesto = ler_manifesto(pasta)
+    resultados = {}
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_downloads) as downloads, ThreadPoolExecutor(max_workers=1) as extracoes:
+        futuros = {downloads.submit(baixar_arquivo, sessao, url, pasta, nome, manifesto, tentativas, fator_espera): nome
+                   for nome, url in arquivos.items()}
+        pendentes = {}
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                logger.error(f"Erro ao baixar o arquivo {nome}: {e}")
+                resultados[nome] = {'nome': nome, 'caminho': None, 'status': 'falhou', 'bytes': 0}
+                continue
+            caminho = resultados[nome]['caminho']
+            # Também extrai zips que uma execução anterior baixou mas não chegou a extrair
+            if extrair and caminho.endswith('.zip') and os.path.exists(caminho):
+                pendentes[extracoes.submit(extrair_zip, pasta, nome, caminho, manifesto)] = nome
+
+        for futuro in as_completed(pendentes):
+            nome = pendentes[futuro]
+            try:
+                resultados[nome]['extraidos'] = futuro.result()
+            except Exception as e:
+                logger.error(f"Erro ao extrair o arquivo {resultados[nome]['caminho']}: {e}")
+                resultados[nome]['status'] = 'falhou'
+
+    segundos = time.perf_counter() - inicio
+    transferidos = sum(resultado['bytes'] for resultado in resultados.values())
+    logger.info(f"{len(arquivos)} arquivos processados em {segundos:.2f}s "
+                f"({transferidos / 1024 / 1024:.1f} MB transferidos).")
+    return resultados
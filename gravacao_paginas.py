@@ -0,0 +1,131 @@
+import os
+import csv
+import glob
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Páginas (row groups) por arquivo Parquet; cada arquivo fechado é um ponto de retomada
+PAGINAS_POR_ARQUIVO_PADRAO = 100
+
+class GravadorCSV:
+    """
+    Acrescenta cada página ao final de um CSV assim que ela chega. Cada
+    página gravada é confirmada (flush + fsync) e a posição confirmada é o
+    tamanho do arquivo; ao retomar uma carga interrompida, o arquivo é
+    truncado nessa posição, descartando o que foi escrito depois do último
+    checkpoint. As colunas seguem o cabeçalho existente (ou a primeira página).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.colunas = None
+        self._arquivo = None
+
+    def abrir(self, carga, retomada=None):
+        if retomada and retomada.get('posicao') is not None and os.path.exists(self.caminho):
+            if os.path.getsize(self.caminho) > retomada['posicao']:
+                logger.warning(f"Descartando {os.path.getsize(self.caminho) - retomada['posicao']} bytes "
+                               f"não confirmados de {self.caminho}.")
+                with open(self.caminho, 'r+b') as arquivo:
+                    arquivo.truncate(retomada['posicao'])
+        if os.path.exists(self.caminho) and os.path.getsize(self.caminho) > 0:
+            with open(self.caminho, mode='r', newline='', encoding='utf-8') as arquivo:
+                self.colunas = next(csv.reader(arquivo))
+        self._arquivo = open(self.caminho, mode='a', newline='', encoding='utf-8')
+
+    def gravar(self, offset, registros):
+        df = pd.DataFrame(registros)
+        cabecalho = self.colunas is None
+        if cabecalho:
+            self.colunas = list(df.columns)
+        elif list(df.columns) != self.colunas:
+            extras = [coluna for coluna in df.columns if coluna not in self.colunas]
+            if extras:
+                logger.warning(f"Colunas fora do cabeçalho de {self.caminho} ignoradas: {extras}")
+            df = df.reindex(columns=self.colunas)
+        df.to_csv(self._arquivo, header=cabecalho, index=False)
+
+    def confirmar(self, forcar=False):
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        return True
+
+    @property
+    def posicao(self):
+        return os.path.getsize(self.caminho)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+class GravadorParquet:
+    """
+    Grava as páginas como row groups de arquivos Parquet em uma pasta, um
+    arquivo a cada 'paginas_por_arquivo' páginas. O arquivo é escrito como
+    '.tmp' e só é confirmado (renomeado) ao ser fechado; ao retomar uma carga,
+    arquivos temporários e arquivos da mesma carga a partir do offset de
+    retomada são removidos. Todas as colunas são gravadas como texto, como
+    chegam da API.
+    """
+
+    def __init__(self, pasta, paginas_por_arquivo=PAGINAS_POR_ARQUIVO_PADRAO):
+        self.pasta = pasta
+        self.paginas_por_arquivo = paginas_por_arquivo
+        self.carga = None
+        self._escritor = None
+        self._esquema = None
+        self._temporario = None
+        self._paginas = 0
+
+    def abrir(self, carga, retomada=None):
+        os.makedirs(self.pasta, exist_ok=True)
+        self.carga = carga
+        for temporario in glob.glob(os.path.join(self.pasta, '*.parquet.tmp')):
+            os.remove(temporario)
+        if retomada:
+            for caminho in glob.glob(os.path.join(self.pasta, f"{carga}-*.parquet")):
+                offset = int(os.path.basename(caminho)[len(carga) + 1:-len('.parquet')])
+                if offset >= retomada['proximo_offset']:
+                    os.remove(caminho)
+
+    def gravar(self, offset, registros):
+        df = pd.DataFrame(registros)
+        if self._escritor is None:
+            self._esquema = pa.schema([(str(coluna), pa.string()) for coluna in df.columns])
+            self._temporario = os.path.join(self.pasta, f"{self.carga}-{offset:09d}.parquet.tmp")
+            self._escritor = pq.ParquetWriter(self._temporario, self._esquema)
+        df = df.reindex(columns=self._esquema.names).astype('string')
+        self._escritor.write_table(pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False))
+        self._paginas += 1
+
+    def confirmar(self, forcar=False):
+        if self._escritor is None:
+            return True
+        if not forcar and self._paginas < self.paginas_por_arquivo:
+            return False
+        self._escritor.close()
+        os.replace(self._temporario, self._temporario[:-len('.tmp')])
+        self._escritor = None
+        self._paginas = 0
+        return True
+
+    @property
+    def posicao(self):
+        return None
+
+    def fechar(self):
+        self.confirmar(forcar=True)
+
+# Função para criar o gravador de páginas do formato pedido
+def criar_gravador(caminho, formato='csv', **opcoes):
+    if formato == 'csv':
+        return GravadorCSV(caminho)
+    if formato == 'parquet':
+        return GravadorParquet(caminho, **opcoes)
+    raise ValueError(f"Formato de saída não suportado: {formato}")
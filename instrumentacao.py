@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import logging
+import threading
+import functools
+import contextlib
+import contextvars
+from collections.abc import Iterator
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import psutil
+except ImportError:
+    # Opcional: sem o psutil, o pico de memória e os bytes lidos vêm de resource e /proc (Linux)
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Arquivo JSONL das métricas (vazio desativa a instrumentação; ex.: NEOBPO_METRICAS=metricas.jsonl)
+VARIAVEL_METRICAS = 'NEOBPO_METRICAS'
+CAMINHO_METRICAS = os.getenv(VARIAVEL_METRICAS, '')
+
+# Identificador da execução, gravado em cada linha
+EXECUCAO = os.getenv('NEOBPO_EXECUCAO') or f"{datetime.now():%Y%m%d%H%M%S}-{os.getpid()}"
+
+# Medições abertas no contexto atual (por thread e por tarefa assíncrona), da mais externa para a mais interna
+_abertas = contextvars.ContextVar('medicoes_abertas', default=())
+
+# Registros concluídos nesta execução, para o resumo
+_registros = []
+_trava = threading.Lock()
+_ouvinte_instalado = False
+_resumo_agendado = False
+
+# Medição de uma etapa: contadores preenchidos durante a execução
+class Medicao:
+    def __init__(self, etapa, atributos=None):
+        self.etapa = etapa
+        self.atributos = dict(atributos or {})
+        self.linhas_entrada = None
+        self.linhas_saida = None
+        self.bytes_lidos = None
+        self.idas_ao_banco = 0
+
+    def registrar(self, linhas_entrada=None, linhas_saida=None, bytes_lidos=None):
+        """Soma linhas e bytes à medição; pode ser chamada várias vezes (por exemplo, por bloco)."""
+        if linhas_entrada is not None:
+            self.linhas_entrada = (self.linhas_entrada or 0) + int(linhas_entrada)
+        if linhas_saida is not None:
+            self.linhas_saida = (self.linhas_saida or 0) + int(linhas_saida)
+        if bytes_lidos is not None:
+            self.bytes_lidos = (self.bytes_lidos or 0) + int(bytes_lidos)
+
+# Medição usada com a instrumentação desligada: aceita as mesmas chamadas e não faz nada
+class _MedicaoInativa(Medicao):
+    def registrar(self, linhas_entrada=None, linhas_saida=None, bytes_lidos=None):
+        pass
+
+_INATIVA = _MedicaoInativa('inativa')
+
+# Função para ligar a instrumentação em tempo de execução (a variável NEOBPO_METRICAS faz o mesmo)
+def ativar(caminho):
+    global CAMINHO_METRICAS
+    CAMINHO_METRICAS = str(caminho)
+
+# Função para desligar a instrumentação
+def desativar():
+    global CAMINHO_METRICAS
+    CAMINHO_METRICAS = ''
+
+# Função para verificar se a instrumentação está ligada
+def ativa():
+    return bool(CAMINHO_METRICAS)
+
+# Função para obter a medição mais interna aberta no contexto atual
+def medicao_atual():
+    abertas = _abertas.get()
+    return abertas[-1] if abertas else _INATIVA
+
+# Função para contar idas ao banco em todas as medições abertas no contexto atual
+def registrar_idas_ao_banco(quantidade=1):
+    for medicao in _abertas.get():
+        medicao.idas_ao_banco += quantidade
+
+# Função para somar bytes lidos de arquivos em todas as medições abertas no contexto atual
+def registrar_bytes_lidos(quantidade):
+    for medicao in _abertas.get():
+        medicao.registrar(bytes_lidos=quantidade)
+
+# Ouvinte do SQLAlchemy: cada execute/executemany enviado ao driver é uma ida ao banco
+def _contar_execucao(conn, cursor, statement, parameters, context, executemany):
+    registrar_idas_ao_banco()
+
+def _instalar_ouvinte():
+    global _ouvinte_instalado
+    with _trava:
+        if not _ouvinte_instalado:
+            event.listen(Engine, 'before_cursor_execute', _contar_execucao)
+            _ouvinte_instalado = True
+
+# Função para obter o pico de memória residente do processo, em MB
+def _pico_rss_mb():
+    if psutil is not None:
+        memoria = psutil.Process().memory_info()
+        # peak_wset só existe no Windows; nos demais sistemas, o RSS atual
+        return getattr(memoria, 'peak_wset', memoria.rss) / 1024 / 1024
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+    return None
+
+# Função para obter o total de bytes lidos pelo processo até agora
+def _bytes_lidos_processo():
+    if psutil is not None:
+        contadores = psutil.Process().io_counters()
+        return getattr(contadores, 'read_chars', contadores.read_bytes)
+    try:
+        with open('/proc/self/io', 'r') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('rchar:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return None
+
+# Função para gravar um registro no arquivo JSONL e guardá-lo para o resumo
+def _emitir(registro):
+    with _trava:
+        _registros.append(registro)
+        try:
+            with open(CAMINHO_METRICAS, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas em {CAMINHO_METRICAS}: {e}")
+
+# Função para abrir a medição no contexto atual durante um trecho, somando tempo, CPU e bytes lidos
+@contextlib.contextmanager
+def _trecho(medicao, tempos):
+    token = _abertas.set(_abertas.get() + (medicao,))
+    inicio = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    lidos_antes = _bytes_lidos_processo()
+    try:
+        yield
+    finally:
+        _abertas.reset(token)
+        tempos['segundos'] += time.perf_counter() - inicio
+        tempos['cpu_segundos'] += time.thread_time() - inicio_cpu
+        if lidos_antes is not None:
+            tempos['bytes_processo'] = (tempos['bytes_processo'] or 0) + _bytes_lidos_processo() - lidos_antes
+
+# Função para iniciar os acumuladores de uma medição
+def _novos_tempos():
+    return {'inicio': datetime.now().isoformat(timespec='milliseconds'), 'segundos': 0.0, 'cpu_segundos': 0.0,
+            'bytes_processo': None}
+
+# Função para gravar a linha de uma medição concluída
+def _concluir(medicao, tempos, erro=None):
+    # Bytes informados pela etapa ou, na falta deles, os lidos pelo processo nos trechos medidos
+    bytes_lidos = medicao.bytes_lidos if medicao.bytes_lidos is not None else tempos['bytes_processo']
+    _emitir({
+        'execucao': EXECUCAO,
+        'etapa': medicao.etapa,
+        'inicio': tempos['inicio'],
+        'segundos': round(tempos['segundos'], 6),
+        'cpu_segundos': round(tempos['cpu_segundos'], 6),
+        'linhas_entrada': medicao.linhas_entrada,
+        'linhas_saida': medicao.linhas_saida,
+        'bytes_lidos': bytes_lidos,
+        'pico_rss_mb': _pico_rss_mb(),
+        'idas_ao_banco': medicao.idas_ao_banco,
+        'thread': threading.current_thread().name,
+        'status': 'erro' if erro else 'ok',
+        'erro': erro,
+        **({'atributos': medicao.atributos} if medicao.atributos else {}),
+    })
+
+# Função para medir uma etapa (gerenciador de contexto)
+@contextlib.contextmanager
+def medir(etapa, **atributos):
+    """
+    Mede a etapa executada dentro do bloco with: tempo de relógio, tempo de CPU
+    da thread, linhas de entrada e de saída, bytes lidos, pico de memória
+    residente do processo e idas ao banco. Ao sair, grava uma linha JSON em
+    NEOBPO_METRICAS. Com a instrumentação desligada, entrega uma medição
+    inativa e não mede nada.
+
+    Os bytes lidos são os informados pela própria etapa (registrar_bytes_lidos
+    ou medicao.registrar); se nenhum for informado, usa-se o total lido pelo
+    processo no período, que inclui o das outras threads.
+
+    Parâmetros:
+        etapa (str): Nome da etapa no relatório.
+        **atributos: Valores extras gravados junto com a medição (tabela, arquivo etc.).
+
+    Retorna:
+        Medicao: Objeto cujo método registrar() soma linhas e bytes à medição.
+    """
+    if not CAMINHO_METRICAS:
+        yield _INATIVA
+        return
+
+    _instalar_ouvinte()
+    _agendar_resumo()
+    medicao = Medicao(etapa, atributos)
+    tempos = _novos_tempos()
+    erro = None
+    try:
+        with _trecho(medicao, tempos):
+            yield medicao
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _concluir(medicao, tempos, erro)
+
+# Função para contar as linhas de um DataFrame, Series, array ou tabela Arrow (None para os demais valores)
+def _linhas(valor):
+    forma = getattr(valor, 'shape', None)
+    if isinstance(forma, tuple) and forma:
+        return forma[0]
+    return None
+
+# Função para medir um iterador retornado por uma função instrumentada, bloco a bloco
+def _medir_iteracao(medicao, tempos, iterador):
+    """
+    Mantém a medição aberta apenas enquanto cada bloco é produzido (o consumo
+    do bloco pelo chamador não entra), somando tempo, CPU, bytes e as linhas
+    de cada bloco. A linha é gravada quando o iterador termina, falha ou é
+    fechado antes do fim.
+    """
+    erro = None
+    try:
+        while True:
+            with _trecho(medicao, tempos):
+                try:
+                    bloco = next(iterador)
+                except StopIteration:
+                    return
+                medicao.registrar(linhas_saida=_linhas(bloco))
+            yield bloco
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        fechar = getattr(iterador, 'close', None)
+        if fechar is not None:
+            fechar()
+        _concluir(medicao, tempos, erro)
+
+# Decorador para medir cada chamada de uma função como uma etapa
+def instrumentar(etapa):
+    """
+    Mede cada chamada da função como uma etapa. As linhas de entrada são as do
+    primeiro argumento com formato tabular (DataFrame, Series, tabela Arrow) e
+    as de saída, as do valor retornado, quando ele tiver esse formato. Se a
+    função retornar um iterador (leitura em blocos, por exemplo), a medição
+    continua enquanto ele é consumido e as linhas de saída são as dos blocos.
+    Com a instrumentação desligada, a função é chamada diretamente.
+    """
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not CAMINHO_METRICAS:
+                return funcao(*args, **kwargs)
+            _instalar_ouvinte()
+            _agendar_resumo()
+            medicao = Medicao(etapa)
+            tempos = _novos_tempos()
+            try:
+                with _trecho(medicao, tempos):
+                    entrada = next((linhas for linhas in map(_linhas, (*args, *kwargs.values())) if linhas is not None),
+                                   None)
+                    medicao.registrar(linhas_entrada=entrada)
+                    resultado = funcao(*args, **kwargs)
+            except BaseException as e:
+                _concluir(medicao, tempos, f"{type(e).__name__}: {e}")
+                raise
+            if isinstance(resultado, Iterator) and _linhas(resultado) is None:
+                return _medir_iteracao(medicao, tempos, resultado)
+            medicao.registrar(linhas_saida=_linhas(resultado))
+            _concluir(medicao, tempos)
+            return resultado
+        return envoltorio
+    return decorar
+
+# Função para agregar os registros por etapa
+def resumir(registros):
+    """
+    Soma os registros de cada etapa (chamadas, tempos, linhas, bytes e idas ao
+    banco; o pico de memória é o maior observado).
+
+    Retorna:
+        list[dict]: Uma linha por etapa, da mais demorada para a mais rápida.
+    """
+    etapas = {}
+    for registro in registros:
+        linha = etapas.setdefault(registro['etapa'], {
+            'etapa': registro['etapa'], 'chamadas': 0, 'erros': 0, 'segundos': 0.0, 'cpu_segundos': 0.0,
+            'linhas_entrada': None, 'linhas_saida': None, 'bytes_lidos': None, 'idas_ao_banco': 0,
+            'pico_rss_mb': None,
+        })
+        linha['chamadas'] += 1
+        linha['erros'] += registro['status'] != 'ok'
+        linha['segundos'] += registro['segundos']
+        linha['cpu_segundos'] += registro['cpu_segundos']
+        linha['idas_ao_banco'] += registro['idas_ao_banco']
+        for campo in ('linhas_entrada', 'linhas_saida', 'bytes_lidos'):
+            if registro.get(campo) is not None:
+                linha[campo] = (linha[campo] or 0) + registro[campo]
+        if registro.get('pico_rss_mb') is not None:
+            linha['pico_rss_mb'] = max(linha['pico_rss_mb'] or 0.0, registro['pico_rss_mb'])
+    return sorted(etapas.values(), key=lambda linha: linha['segundos'], reverse=True)
+
+# Função para montar a tabela de resumo em texto
+def tabela_resumo(registros):
+    def numero(valor, formato='{:,.0f}'):
+        return '-' if valor is None else formato.format(valor)
+
+    linhas = [f"{'Etapa':<40}{'Chamadas':>9}{'Tempo (s)':>11}{'CPU (s)':>10}{'Linhas entr.':>14}"
+              f"{'Linhas saída':>14}{'MB lidos':>10}{'Idas BD':>9}{'Pico RSS MB':>13}"]
+    for linha in resumir(registros):
+        megabytes = None if linha['bytes_lidos'] is None else linha['bytes_lidos'] / 1024 / 1024
+        etapa = linha['etapa'] + (f" ({linha['erros']} erro(s))" if linha['erros'] else '')
+        linhas.append(f"{etapa:<40}{linha['chamadas']:>9}{linha['segundos']:>11.2f}{linha['cpu_segundos']:>10.2f}"
+                      f"{numero(linha['linhas_entrada']):>14}{numero(linha['linhas_saida']):>14}"
+                      f"{numero(megabytes, '{:,.1f}'):>10}{linha['idas_ao_banco']:>9}"
+                      f"{numero(linha['pico_rss_mb'], '{:,.1f}'):>13}")
+    return '\n'.join(linhas)
+
+# Função para imprimir o resumo das etapas medidas nesta execução
+def imprimir_resumo():
+    with _trava:
+        registros = list(_registros)
+    if registros:
+        print(f"Métricas da execução {EXECUCAO} (detalhes em {CAMINHO_METRICAS}):")
+        print(tabela_resumo(registros))
+
+# Função para imprimir o resumo ao final do processo, uma única vez
+def _agendar_resumo():
+    global _resumo_agendado
+    with _trava:
+        if not _resumo_agendado:
+            atexit.register(imprimir_resumo)
+            _resumo_agendado = True
+
+# Função para ler os registros de um arquivo JSONL de métricas
+def ler_registros(caminho, execucao=None):
+    """
+    Lê as métricas gravadas. Sem execucao, retorna as da última execução do
+    arquivo; com execucao='todas', retorna todas.
+    """
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        registros = [json.loads(linha) for linha in arquivo if linha.strip()]
+    if execucao == 'todas' or not registros:
+        return registros
+    execucao = execucao or registros[-1]['execucao']
+    return [registro for registro in registros if registro['execucao'] == execucao]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resume por etapa as métricas gravadas em NEOBPO_METRICAS.')
+    parser.add_argument('arquivo', nargs='?', default=CAMINHO_METRICAS or 'metricas.jsonl',
+                        help='Arquivo JSONL de métricas')
+    parser.add_argument('--execucao', help="Execução a resumir (padrão: a última; 'todas' para o arquivo inteiro)")
+    argumentos = parser.parse_args()
+    print(tabela_resumo(ler_registros(argumentos.arquivo, argumentos.execucao)))
@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import argparse
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from leitura_em_blocos import ler_csv_em_blocos, TAMANHO_BLOCO_PADRAO
+from esquemas import ESQUEMAS, esquema_arrow, ler_csv_tipado
+from normalizacao_datas import converter_datas
+from instrumentacao import registrar_bytes_lidos
+from cache_extracao import extrair_com_cache, iterar_com_cache
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Esquemas declarados dos arquivos intermediários, derivados do registro de esquemas
+ESQUEMA_CENTRO_CUSTO = esquema_arrow('CENTRO_DE_CUSTO')
+ESQUEMA_CONTAS = esquema_arrow('CONTAS')
+ESQUEMA_ORCAMENTO = esquema_arrow('ORCAMENTO')
+ESQUEMA_DESPESAS = esquema_arrow('DESPESAS')
+
+# Compressão dos arquivos Parquet
+COMPRESSAO = 'zstd'
+
+# Versão da leitura tipada dos CSVs no cache de extração (a definição da entidade também entra na chave)
+# 2: datas normalizadas para ISO na leitura, como no Parquet
+VERSAO_LEITURA_CSV = 2
+
+# Tipos do pandas na leitura (os mesmos do registro de esquemas usados na leitura dos CSVs)
+_TIPOS_PANDAS = {
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.string(): pd.StringDtype(),
+}
+
+# Função para obter o caminho do Parquet correspondente a um CSV
+def caminho_parquet(caminho_csv):
+    return os.path.splitext(str(caminho_csv))[0] + '.parquet'
+
+# Função para escolher o arquivo a ser lido pela carga: o Parquet, se existir, ou o CSV
+def caminho_intermediario(caminho_csv):
+    parquet = caminho_parquet(caminho_csv)
+    return parquet if os.path.exists(parquet) else caminho_csv
+
+# Função para converter uma coluna do DataFrame para o tipo declarado no esquema
+def _conformar_coluna(serie, campo):
+    textual = not (pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie))
+    if pa.types.is_integer(campo.type):
+        if textual:
+            # Códigos com separador de milhar ('1.234') como nos CSVs de contas e centros de custo
+            serie = serie.astype('string').str.strip().str.replace('.', '', regex=False)
+        convertida = pd.to_numeric(serie, errors='coerce').astype('Int64')
+    elif pa.types.is_floating(campo.type):
+        convertida = pd.to_numeric(serie, errors='coerce').astype('float64')
+    elif pa.types.is_decimal(campo.type):
+        # Arredonda na escala declarada para que a conversão para decimal seja exata
+        convertida = pd.to_numeric(serie, errors='coerce').astype('float64').round(campo.type.scale)
+    elif pa.types.is_date(campo.type):
+        datas = serie if pd.api.types.is_datetime64_any_dtype(serie) else converter_datas(serie)
+        convertida = datas.dt.floor('D')
+    else:
+        convertida = serie.astype('string')
+
+    if pa.types.is_dictionary(campo.type):
+        return pa.array(convertida, type=pa.string(), from_pandas=True).dictionary_encode().cast(campo.type)
+    if textual and not (pa.types.is_string(campo.type) or pa.types.is_dictionary(campo.type)):
+        texto = serie.astype('string').str.strip()
+        perdidos = texto.notna() & (texto != '') & convertida.isna()
+        if perdidos.any():
+            raise ValueError(f"{int(perdidos.sum())} valores inválidos na coluna {campo.name} ({campo.type}) "
+                             f"(ex.: {texto[perdidos].unique()[:5].tolist()}).")
+    return pa.array(convertida, from_pandas=True).cast(campo.type)
+
+# Função para converter um DataFrame em uma tabela Arrow com o esquema declarado
+def conformar_tabela(df, esquema):
+    """
+    Seleciona as colunas do esquema, na ordem declarada, e converte cada uma
+    para o seu tipo. Valores que não podem ser convertidos interrompem a
+    gravação com ValueError em vez de virarem nulos silenciosamente.
+    """
+    faltantes = [nome for nome in esquema.names if nome not in df.columns]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes para o esquema declarado: {faltantes}")
+    colunas = [_conformar_coluna(df[campo.name], campo) for campo in esquema]
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+# Função para gravar um DataFrame (ou lotes de DataFrames) em Parquet com o esquema declarado
+def gravar_parquet(dados, caminho, esquema):
+    """
+    Grava os dados em Parquet, um row group por lote. O arquivo é escrito
+    como '.tmp' e renomeado no fim, então a carga nunca lê um arquivo pela
+    metade.
+
+    Parâmetros:
+        dados (DataFrame ou iterável de DataFrames): Dados a gravar.
+        caminho (str): Arquivo Parquet de saída.
+        esquema (Schema): Esquema declarado da entidade (ver esquemas.esquema_arrow).
+
+    Retorna:
+        int: Total de linhas gravadas.
+    """
+    lotes = [dados] if isinstance(dados, pd.DataFrame) else dados
+    temporario = f"{caminho}.tmp"
+    total = 0
+    try:
+        with pq.ParquetWriter(temporario, esquema, compression=COMPRESSAO) as escritor:
+            for df in lotes:
+                escritor.write_table(conformar_tabela(df, esquema))
+                total += len(df)
+        os.replace(temporario, caminho)
+    except Exception as e:
+        logger.error(f"Erro ao gravar o arquivo Parquet {caminho}: {e}")
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    logger.info(f"{total} linhas gravadas em {caminho}.")
+    return total
+
+# Função para converter uma tabela Arrow no DataFrame esperado pela carga
+def _para_pandas(tabela):
+    # Datas voltam em texto ISO (yyyy-mm-dd, categoria) e decimais em float64, como na leitura dos CSVs
+    for indice, campo in enumerate(tabela.schema):
+        if pa.types.is_date(campo.type):
+            datas = tabela.column(indice).cast(pa.string()).dictionary_encode()
+            tabela = tabela.set_column(indice, campo.name, datas)
+        elif pa.types.is_decimal(campo.type):
+            # Via texto: a conversão direta de decimal para float64 não devolve o double mais próximo
+            valores = tabela.column(indice).cast(pa.string()).cast(pa.float64())
+            tabela = tabela.set_column(indice, campo.name, valores)
+    return tabela.to_pandas(types_mapper=_TIPOS_PANDAS.get)
+
+# Função para ler um arquivo Parquet inteiro
+def ler_parquet(caminho, colunas=None):
+    return _para_pandas(pq.read_table(caminho, columns=colunas))
+
+# Função para ler um arquivo Parquet em blocos de tamanho fixo
+def ler_parquet_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO_PADRAO, colunas=None):
+    """Equivalente a ler_csv_em_blocos para Parquet: um DataFrame por bloco de linhas."""
+    arquivo = pq.ParquetFile(caminho)
+    try:
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=colunas):
+            yield _para_pandas(pa.Table.from_batches([lote]))
+    finally:
+        arquivo.close()
+
+# Função para obter a versão da leitura de uma entidade: muda quando o seu registro de esquema muda
+def versao_leitura_csv(entidade):
+    definicao = json.dumps(ESQUEMAS[entidade], sort_keys=True)
+    return f"{VERSAO_LEITURA_CSV}.{hashlib.sha1(definicao.encode('utf-8')).hexdigest()[:12]}"
+
+# Função para ler o arquivo intermediário de uma carga (Parquet ou CSV)
+def ler_intermediario(caminho, entidade, tamanho_bloco=None):
+    """
+    Lê o arquivo intermediário pelo formato da extensão. O Parquet já traz os
+    tipos declarados; o CSV é lido com os tipos do registro de esquemas. Os
+    DataFrames resultantes têm os mesmos tipos nos dois formatos. Com o cache
+    de extração ligado, um CSV já lido com o mesmo conteúdo vem do cache.
+
+    Parâmetros:
+        caminho (str): Arquivo .parquet ou .csv.
+        entidade (str): Nome da entidade no registro de esquemas (ver esquemas.ESQUEMAS).
+        tamanho_bloco (int, opcional): Se informado, retorna um iterador de blocos.
+
+    Retorna:
+        DataFrame, ou iterador de DataFrames se tamanho_bloco for informado.
+    """
+    registrar_bytes_lidos(os.path.getsize(caminho))
+    if str(caminho).lower().endswith('.parquet'):
+        if tamanho_bloco:
+            return ler_parquet_em_blocos(caminho, tamanho_bloco)
+        return ler_parquet(caminho)
+    extrator = f"csv.{entidade}"
+    versao = versao_leitura_csv(entidade)
+    if tamanho_bloco:
+        return iterar_com_cache(caminho, extrator, versao,
+                                lambda: ler_csv_tipado(caminho, entidade, tamanho_bloco), tamanho_bloco)
+    return extrair_com_cache(caminho, extrator, versao, lambda: ler_csv_tipado(caminho, entidade))
+
+# Função para ler o arquivo intermediário em blocos, registrando os erros de leitura
+def ler_em_blocos(caminho, entidade, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Gerador sobre os blocos de ler_intermediario. Como os blocos são lidos
+    só durante a iteração, um erro de leitura surge no consumo e não na
+    chamada; é registrado aqui, com o arquivo, e repassado.
+
+    Parâmetros:
+        caminho (str): Arquivo .parquet ou .csv.
+        entidade (str): Nome da entidade no registro de esquemas.
+        tamanho_bloco (int): Linhas por bloco.
+
+    Retorna:
+        Gerador de DataFrames.
+    """
+    try:
+        yield from ler_intermediario(caminho, entidade, tamanho_bloco)
+    except Exception as e:
+        logger.error(f"Erro ao ler o arquivo {caminho}: {e}")
+        raise
+    logger.info(f"Arquivo {caminho} lido com sucesso.")
+
+# Função para converter um CSV existente no Parquet da entidade, em blocos
+def converter_csv_para_parquet(caminho_csv, esquema, caminho_saida=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Converte um CSV já gerado no intermediário Parquet, lendo as colunas como
+    texto e convertendo-as para os tipos declarados, bloco a bloco.
+
+    Retorna:
+        str: Caminho do arquivo Parquet gerado.
+    """
+    caminho_saida = caminho_saida or caminho_parquet(caminho_csv)
+    tipos_texto = {nome: 'string' for nome in esquema.names}
+    gravar_parquet(ler_csv_em_blocos(caminho_csv, tipos_texto, tamanho_bloco), caminho_saida, esquema)
+    return caminho_saida
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Converte um CSV intermediário em Parquet com esquema declarado.')
+    parser.add_argument('entidade', choices=sorted(ESQUEMAS))
+    parser.add_argument('csv', help='Arquivo CSV de entrada')
+    parser.add_argument('parquet', nargs='?', help='Arquivo Parquet de saída (padrão: mesmo nome do CSV)')
+    argumentos = parser.parse_args()
+    converter_csv_para_parquet(argumentos.csv, esquema_arrow(argumentos.entidade), argumentos.parquet)
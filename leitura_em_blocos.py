@@ -0,0 +1,94 @@
+import time
+import logging
+import pandas as pd
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Quantidade padrão de linhas lidas por bloco
+TAMANHO_BLOCO_PADRAO = 100_000
+
+# Função para ler o CSV em blocos de tamanho fixo
+def ler_csv_em_blocos(caminho_arquivo, tipos, tamanho_bloco=TAMANHO_BLOCO_PADRAO, **opcoes):
+    """
+    Lê o arquivo CSV em blocos de tamanho fixo com tipos explícitos, sem
+    carregar o arquivo inteiro em memória.
+
+    Parâmetros:
+        caminho_arquivo (str): Caminho do arquivo CSV.
+        tipos (dict): Tipo de cada coluna, repassado ao pd.read_csv.
+        tamanho_bloco (int): Quantidade de linhas por bloco.
+        **opcoes: Demais opções do pd.read_csv (por exemplo thousands).
+
+    Retorna:
+        Iterador de DataFrames com no máximo tamanho_bloco linhas cada.
+    """
+    try:
+        leitor = pd.read_csv(caminho_arquivo, dtype=tipos, chunksize=tamanho_bloco, **opcoes)
+    except Exception as e:
+        logger.error(f"Erro ao abrir o arquivo CSV {caminho_arquivo}: {e}")
+        raise
+    with leitor:
+        # Os erros de formato aparecem só ao ler cada bloco, já durante a iteração
+        try:
+            yield from leitor
+        except Exception as e:
+            logger.error(f"Erro ao ler o arquivo CSV {caminho_arquivo}: {e}")
+            raise
+
+# Função para validar um bloco antes da carga
+def validar_bloco(df, tipos, colunas_chave=()):
+    """
+    Confere se o bloco contém todas as colunas declaradas e descarta as linhas
+    com alguma coluna de chave nula.
+
+    Parâmetros:
+        df (DataFrame): Bloco lido do CSV.
+        tipos (dict): Colunas esperadas e seus tipos.
+        colunas_chave (iterable): Colunas que não podem ser nulas.
+
+    Retorna:
+        DataFrame: Bloco com as linhas válidas.
+    """
+    faltantes = [coluna for coluna in tipos if coluna not in df.columns]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes no arquivo CSV: {faltantes}")
+
+    colunas_chave = list(colunas_chave)
+    if not colunas_chave:
+        return df
+
+    validas = df[colunas_chave].notna().all(axis=1)
+    descartadas = len(df) - int(validas.sum())
+    if descartadas:
+        logger.warning(f"{descartadas} linhas descartadas por chave nula em {colunas_chave}.")
+        return df[validas]
+    return df
+
+# Função para validar e carregar cada bloco do CSV
+def carregar_em_blocos(blocos, carregar_bloco, tipos, colunas_chave=()):
+    """
+    Valida e carrega cada bloco assim que é lido, de modo que apenas um bloco
+    fique em memória por vez, qualquer que seja o tamanho do arquivo.
+
+    Parâmetros:
+        blocos: Iterador de DataFrames (ver ler_csv_em_blocos).
+        carregar_bloco (callable): Função que recebe um DataFrame e o envia ao banco.
+        tipos (dict): Colunas esperadas e seus tipos.
+        colunas_chave (iterable): Colunas que não podem ser nulas.
+
+    Retorna:
+        int: Total de linhas carregadas.
+    """
+    inicio = time.perf_counter()
+    total = 0
+    for numero, bloco in enumerate(blocos, start=1):
+        bloco = validar_bloco(bloco, tipos, colunas_chave)
+        if not bloco.empty:
+            carregar_bloco(bloco)
+        total += len(bloco)
+        logger.info(f"Bloco {numero} carregado ({len(bloco)} linhas, {total} no total).")
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f"{total} linhas carregadas em blocos em {segundos:.2f}s.")
+    return total
@@ -0,0 +1,149 @@
+import time
+import logging
+from contextlib import contextmanager
+from sqlalchemy.engine import Connection
+from carga_em_lote import inserir_em_lote, TAMANHO_LOTE_PADRAO
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Função para montar o MERGE do SQL Server entre a staging e a tabela de destino
+def _sql_merge_sql_server(tabela_destino, tabela_staging, colunas, colunas_chave):
+    colunas_valor = [coluna for coluna in colunas if coluna not in colunas_chave]
+    condicao_chave = ' AND '.join(f"target.{coluna} = source.{coluna}" for coluna in colunas_chave)
+    lista_colunas = ', '.join(colunas)
+    valores_origem = ', '.join(f"source.{coluna}" for coluna in colunas)
+
+    clausula_update = ''
+    if colunas_valor:
+        # EXCEPT compara os valores tratando NULL = NULL, evitando atualizar linhas sem mudança
+        origem = ', '.join(f"source.{coluna}" for coluna in colunas_valor)
+        destino = ', '.join(f"target.{coluna}" for coluna in colunas_valor)
+        atribuicoes = ', '.join(f"{coluna} = source.{coluna}" for coluna in colunas_valor)
+        clausula_update = f"""
+    WHEN MATCHED AND EXISTS (SELECT {origem} EXCEPT SELECT {destino}) THEN
+        UPDATE SET {atribuicoes}"""
+
+    return f"""
+    SET NOCOUNT ON;
+    DECLARE @acoes TABLE (acao NVARCHAR(10));
+
+    MERGE {tabela_destino} WITH (HOLDLOCK) AS target
+    USING {tabela_staging} AS source
+    ON ({condicao_chave}){clausula_update}
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT ({lista_colunas})
+        VALUES ({valores_origem})
+    OUTPUT $action INTO @acoes;
+
+    SELECT
+        COALESCE(SUM(CASE WHEN acao = 'INSERT' THEN 1 ELSE 0 END), 0) AS inseridos,
+        COALESCE(SUM(CASE WHEN acao = 'UPDATE' THEN 1 ELSE 0 END), 0) AS atualizados
+    FROM @acoes;
+    """
+
+# Função para executar o equivalente ao MERGE no SQLite (INSERT ... ON CONFLICT)
+def _mesclar_sqlite(conn, tabela_destino, tabela_staging, colunas, colunas_chave):
+    colunas_valor = [coluna for coluna in colunas if coluna not in colunas_chave]
+    condicao_chave = ' AND '.join(f"t.{coluna} = s.{coluna}" for coluna in colunas_chave)
+    lista_colunas = ', '.join(colunas)
+    lista_chaves = ', '.join(colunas_chave)
+
+    inseridos = conn.exec_driver_sql(
+        f"SELECT COUNT(*) FROM {tabela_staging} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {tabela_destino} t WHERE {condicao_chave})"
+    ).scalar()
+
+    if colunas_valor:
+        mudou = ' OR '.join(f"s.{coluna} IS NOT t.{coluna}" for coluna in colunas_valor)
+        atualizados = conn.exec_driver_sql(
+            f"SELECT COUNT(*) FROM {tabela_staging} s JOIN {tabela_destino} t ON {condicao_chave} WHERE {mudou}"
+        ).scalar()
+        atribuicoes = ', '.join(f"{coluna} = excluded.{coluna}" for coluna in colunas_valor)
+        mudou_destino = ' OR '.join(f"{tabela_destino}.{coluna} IS NOT excluded.{coluna}" for coluna in colunas_valor)
+        acao_conflito = f"DO UPDATE SET {atribuicoes} WHERE {mudou_destino}"
+    else:
+        atualizados = 0
+        acao_conflito = "DO NOTHING"
+
+    conn.exec_driver_sql(
+        f"INSERT INTO {tabela_destino} ({lista_colunas}) "
+        f"SELECT {lista_colunas} FROM {tabela_staging} WHERE true "
+        f"ON CONFLICT ({lista_chaves}) {acao_conflito}"
+    )
+    return inseridos, atualizados
+
+# Função para obter a conexão da mesclagem: a transação de quem chamou ou uma nova, confirmada ao final
+@contextmanager
+def _transacao(conexao):
+    if isinstance(conexao, Connection):
+        yield conexao
+    else:
+        with conexao.begin() as conn:
+            yield conn
+
+# Função para fazer o upsert do DataFrame na tabela de destino via tabela de staging
+def mesclar_via_staging(conexao, df, tabela_destino, colunas_chave, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Carrega o DataFrame em uma tabela de staging temporária da sessão e aplica
+    um único MERGE set-based staging -> destino pelas colunas de chave. Só as
+    linhas novas são inseridas e só as linhas com valores diferentes são
+    atualizadas, de modo que uma recarga custa O(delta) e não O(tabela).
+    No SQLite o MERGE é emulado com INSERT ... ON CONFLICT DO UPDATE.
+
+    Com uma Engine, a mesclagem roda e é confirmada em uma transação própria;
+    com uma Connection, roda na transação aberta por quem chamou, que decide
+    o commit (por exemplo, junto com a atualização do agregado orçado x realizado).
+
+    Parâmetros:
+        conexao (Engine ou Connection): Engine SQLAlchemy ou conexão com a transação em andamento.
+        df (DataFrame): Dados a serem mesclados; as colunas devem existir no destino.
+        tabela_destino (str): Nome da tabela de destino.
+        colunas_chave (list): Colunas que identificam uma linha no destino: as da chave primária, que nas
+            tabelas particionadas por mês incluem a coluna de partição (ver particionamento.criar_tabela_particionada).
+        tamanho_lote (int): Quantidade de linhas por lote na carga da staging.
+
+    Retorna:
+        dict: Quantidade de linhas inseridas e atualizadas.
+    """
+    colunas_chave = list(colunas_chave)
+    colunas = list(df.columns)
+    lista_colunas = ', '.join(colunas)
+
+    # Linhas repetidas na mesma chave fariam o MERGE falhar; prevalece a última
+    df = df.drop_duplicates(subset=colunas_chave, keep='last')
+
+    inicio = time.perf_counter()
+    try:
+        with _transacao(conexao) as conn:
+            if conn.dialect.name == 'mssql':
+                tabela_staging = f"#{tabela_destino}_staging"
+                conn.exec_driver_sql(f"SELECT TOP 0 {lista_colunas} INTO {tabela_staging} FROM {tabela_destino}")
+            else:
+                tabela_staging = f"temp.{tabela_destino}_staging"
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tabela_staging}")
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {tabela_staging} AS SELECT {lista_colunas} FROM {tabela_destino} WHERE 0"
+                )
+
+            # A staging usa a mesma conexão (e transação) do MERGE
+            inserir_em_lote(conn.connection, df, tabela_staging, tamanho_lote=tamanho_lote, confirmar=False)
+
+            if conn.dialect.name == 'mssql':
+                resultado = conn.exec_driver_sql(
+                    _sql_merge_sql_server(tabela_destino, tabela_staging, colunas, colunas_chave)
+                ).fetchone()
+                inseridos, atualizados = int(resultado[0]), int(resultado[1])
+            else:
+                inseridos, atualizados = _mesclar_sqlite(conn, tabela_destino, tabela_staging, colunas, colunas_chave)
+
+            conn.exec_driver_sql(f"DROP TABLE {tabela_staging}")
+    except Exception as e:
+        logger.error(f"Erro ao mesclar dados na tabela {tabela_destino}: {e}")
+        raise
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f"Tabela {tabela_destino} mesclada em {segundos:.2f}s: "
+                f"{inseridos} linhas inseridas, {atualizados} atualizadas, "
+                f"{len(df) - inseridos - atualizados} sem alteração.")
+    return {'inseridos': inseridos, 'atualizados': atualizados}
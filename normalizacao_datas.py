@@ -0,0 +1,91 @@
+import logging
+import threading
+import pandas as pd
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Número de cada mês em português (com e sem acento)
+MESES_PORTUGUES = {
+    'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+
+# Padrões aceitos: '30 de junho de 2024' (com ou sem dia da semana), 'dd/mm/yyyy' e ISO ('yyyy-mm-dd' ou 'yyyy/mm/dd')
+PADRAO_EXTENSO = r'(?P<dia>\d{1,2})\s+de\s+(?P<mes>[^\W\d_]+)\s+de\s+(?P<ano>\d{4})'
+PADRAO_BARRAS = r'^(?P<dia>\d{1,2})/(?P<mes>\d{1,2})/(?P<ano>\d{4})$'
+PADRAO_ISO = r'^(?P<ano>\d{4})[-/](?P<mes>\d{1,2})[-/](?P<dia>\d{1,2})'
+
+# Limite de valores distintos guardados entre chamadas (as datas se repetem muito entre lotes)
+LIMITE_CACHE = 100_000
+
+# Cache valor original -> data convertida, compartilhado entre lotes e threads
+_cache = {}
+_trava = threading.Lock()
+
+# Função para montar datas a partir das colunas dia/mês/ano extraídas por um padrão
+def _montar_datas(partes):
+    return pd.to_datetime(
+        pd.DataFrame({
+            'year': pd.to_numeric(partes['ano'], errors='coerce').astype('float64'),
+            'month': pd.to_numeric(partes['mes'], errors='coerce').astype('float64'),
+            'day': pd.to_numeric(partes['dia'], errors='coerce').astype('float64'),
+        }),
+        errors='coerce',
+    )
+
+# Função para converter um conjunto de valores distintos, coluna a coluna
+def _converter_distintos(valores):
+    textos = pd.Series(valores, dtype='string').str.strip().str.lower()
+
+    extenso = textos.str.extract(PADRAO_EXTENSO)
+    extenso['mes'] = extenso['mes'].map(MESES_PORTUGUES)
+    datas = _montar_datas(extenso)
+
+    for padrao in (PADRAO_BARRAS, PADRAO_ISO):
+        faltantes = datas.isna()
+        if not faltantes.any():
+            break
+        datas[faltantes] = _montar_datas(textos[faltantes].str.extract(padrao))
+    return datas
+
+# Função para converter uma coluna de datas em português, dd/mm/yyyy ou ISO
+def converter_datas(serie, formato=None):
+    """
+    Converte uma coluna inteira de datas para datetime64. Aceita datas por
+    extenso em português ('domingo, 30 de junho de 2024' ou '30 de junho de
+    2024'), 'dd/mm/yyyy' e ISO ('yyyy-mm-dd' ou 'yyyy/mm/dd'). Cada valor distinto é
+    convertido uma única vez e guardado em cache para os próximos lotes.
+
+    Parâmetros:
+        serie (Series): Coluna com as datas em texto.
+        formato (str, opcional): Formato strftime da saída (por exemplo '%d/%m/%Y').
+            A formatação também é feita só sobre os valores distintos.
+
+    Retorna:
+        Series: Datas convertidas (datetime64 ou texto no formato pedido),
+        com valor nulo nos valores inválidos ou vazios.
+    """
+    codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+
+    with _trava:
+        conhecidos = [_cache.get(valor) for valor in distintos]
+    novos = [valor for valor, data in zip(distintos, conhecidos) if data is None]
+    if novos:
+        convertidos = dict(zip(novos, _converter_distintos(novos)))
+        with _trava:
+            if len(_cache) + len(convertidos) > LIMITE_CACHE:
+                _cache.clear()
+            _cache.update(convertidos)
+        conhecidos = [convertidos.get(valor, data) for valor, data in zip(distintos, conhecidos)]
+
+    # NaT no fim do vetor atende os valores nulos (código -1)
+    tabela = pd.DatetimeIndex(conhecidos + [pd.NaT])
+    invalidos = [valor for valor, data in zip(distintos, tabela) if pd.isna(data)]
+    if invalidos:
+        quantidade = int(serie.isin(invalidos).sum())
+        logger.warning(f"{quantidade} datas inválidas na coluna {serie.name} (ex.: {invalidos[:5]}).")
+
+    if formato:
+        tabela = tabela.strftime(formato)
+    return pd.Series(tabela[codigos], index=serie.index, name=serie.name)
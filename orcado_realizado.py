@@ -0,0 +1,345 @@
+import time
+import logging
+import argparse
+import pandas as pd
+from sqlalchemy import text, bindparam, inspect
+from carga_em_lote import inserir_em_lote
+from conexao_bd import obter_engine
+from normalizacao_datas import converter_datas
+from particionamento import condicao_meses, inicio_do_mes
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tabela agregada de orçado x realizado
+TABELA_AGREGADO = 'ORCADO_REALIZADO'
+
+# Granularidade do agregado; as três primeiras colunas identificam o grupo recalculado a cada carga
+COLUNAS_GRUPO = ['MES_A', 'CODCONTA', 'CODIGOCENTROCUSTO', 'CODFILIALPRINCIPAL']
+COLUNAS_CHAVE = ['MES_A', 'CODCONTA', 'CODIGOCENTROCUSTO']
+
+# Tabelas fato que alimentam o agregado: colunas de cada uma na granularidade do agregado
+FATOS = {
+    'ORCAMENTO': {
+        'data': 'ORCAMENTO_ULTDATA',
+        'CODCONTA': 'ORCAMENTO_CONTACOD',
+        'CODIGOCENTROCUSTO': 'ORCAMENTO_CENTROCUSTOCOD',
+        'CODFILIALPRINCIPAL': 'ORCAMENTO_FILIALCOD',
+        'valor': 'ORCAMENTO_ORCADO',
+        'medida': 'ORCADO',
+    },
+    'DespesasDetalhadas': {
+        'data': 'MES_A',
+        'CODCONTA': 'CODCONTA',
+        'CODIGOCENTROCUSTO': 'CODIGOCENTROCUSTO',
+        'CODFILIALPRINCIPAL': 'CODFILIALPRINCIPAL',
+        'valor': 'VLDESPESA',
+        'medida': 'REALIZADO',
+    },
+}
+
+# Nome do bloqueio de aplicação (sp_getapplock) que serializa as atualizações do agregado no SQL Server
+RECURSO_BLOQUEIO = TABELA_AGREGADO
+
+# Função para verificar se o erro do CREATE TABLE é o de tabela já existente (SQLite ou SQL Server, erro 2714)
+def _ja_existe(erro):
+    mensagem = str(erro)
+    return 'already exists' in mensagem or 'There is already an object named' in mensagem
+
+# Função para criar a tabela agregada; se for nova, ela é montada a partir das tabelas fato
+def criar_tabela_orcado_realizado(engine):
+    """
+    Cria a tabela ORCADO_REALIZADO e a reconstrói a partir das tabelas fato,
+    na mesma transação. As cargas de orçamento e de despesas chamam esta
+    função em paralelo: não há verificação prévia de existência, o CREATE é
+    executado direto e, se a outra carga criou a tabela antes, o erro de
+    tabela já existente é ignorado (a reconstrução fica com quem a criou).
+    """
+    try:
+        with engine.begin() as conn:
+            bloquear_agregado(conn)
+            conn.exec_driver_sql(f"""
+                CREATE TABLE {TABELA_AGREGADO} (
+                    MES_A DATE NOT NULL,
+                    CODCONTA INT NOT NULL,
+                    CODIGOCENTROCUSTO INT NOT NULL,
+                    CODFILIALPRINCIPAL INT,
+                    ORCADO DECIMAL(18, 2) NOT NULL,
+                    REALIZADO DECIMAL(18, 2) NOT NULL,
+                    VARIACAO DECIMAL(18, 2) NOT NULL
+                )
+            """)
+            # Um grupo por linha; o prefixo (COLUNAS_CHAVE) atende o recálculo dos grupos de uma carga
+            conn.exec_driver_sql(f"CREATE UNIQUE INDEX UX_{TABELA_AGREGADO} ON {TABELA_AGREGADO} "
+                                 f"({', '.join(COLUNAS_GRUPO)})")
+            logger.info(f"Tabela {TABELA_AGREGADO} criada com sucesso.")
+            reconstruir(conn)
+    except Exception as e:
+        if not _ja_existe(e):
+            logger.error(f"Erro ao criar a tabela {TABELA_AGREGADO}: {e}")
+            raise
+
+    try:
+        if engine.dialect.name != 'mssql':
+            # O recálculo de um grupo busca as linhas da conta e do centro de custo nas tabelas fato
+            # (no SQL Server o columnstore particionado dispensa esses índices)
+            with engine.begin() as conn:
+                for tabela, colunas in FATOS.items():
+                    if inspect(conn).has_table(tabela):
+                        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS IX_{tabela}_CONTA_CENTRO ON {tabela} "
+                                             f"({colunas['CODCONTA']}, {colunas['CODIGOCENTROCUSTO']})")
+    except Exception as e:
+        logger.error(f"Erro ao criar os índices das tabelas fato: {e}")
+        raise
+
+# Função para serializar, até o fim da transação, as cargas que atualizam o agregado
+def bloquear_agregado(conn):
+    """
+    No SQL Server, obtém um bloqueio de aplicação exclusivo (sp_getapplock)
+    ligado à transação de conn, de modo que duas cargas não intercalem a
+    exclusão e a reinserção do mesmo grupo do agregado. As cargas chamam esta
+    função no início da transação, antes de gravar nas tabelas fato: quem
+    espera o bloqueio ainda não segura linhas que a outra carga precisa ler
+    no recálculo. Obter o bloqueio de novo na mesma transação não espera.
+    No SQLite não faz nada: o banco já admite um único escritor por vez.
+
+    Parâmetros:
+        conn (Connection): Conexão SQLAlchemy com a transação em andamento.
+    """
+    if conn.dialect.name != 'mssql':
+        return
+    retorno = conn.exec_driver_sql(
+        "SET NOCOUNT ON; DECLARE @retorno INT; "
+        "EXEC @retorno = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction'; "
+        "SELECT @retorno", (RECURSO_BLOQUEIO,)
+    ).scalar()
+    if retorno < 0:
+        raise RuntimeError(f"Não foi possível obter o bloqueio do agregado {TABELA_AGREGADO} (retorno {retorno}).")
+
+# Função para montar a expressão SQL do primeiro dia do mês de uma coluna de data
+def _expressao_mes(coluna, sql_server):
+    if sql_server:
+        return f"DATEFROMPARTS(YEAR({coluna}), MONTH({coluna}), 1)"
+    # No SQLite a data é texto ISO: a leitura do CSV e a do Parquet normalizam as datas (ver esquemas.ler_csv_tipado)
+    return f"date({coluna}, 'start of month')"
+
+# Função para montar o SELECT das tabelas fato na granularidade do agregado
+def _select_fatos(conn, juncao=None, filtros=None):
+    """
+    Monta o SELECT que agrega as tabelas fato existentes (UNION ALL de
+    ORCAMENTO e DespesasDetalhadas) por COLUNAS_GRUPO.
+
+    Parâmetros:
+        juncao (str, opcional): Tabela de chaves (MES_A, CODCONTA, CODIGOCENTROCUSTO) que restringe os grupos.
+        filtros (callable, opcional): Recebe (coluna de data, sql_server) e retorna (condição SQL, parâmetros).
+
+    Retorna:
+        tuple: SQL e parâmetros ('?'), ou (None, ()) se nenhuma tabela fato existir.
+    """
+    sql_server = conn.dialect.name == 'mssql'
+    partes, parametros = [], []
+    for tabela, colunas in FATOS.items():
+        if not inspect(conn).has_table(tabela):
+            continue
+        mes = _expressao_mes(f"f.{colunas['data']}", sql_server)
+        medidas = {'ORCADO': 'CAST(0 AS DECIMAL(18, 2))', 'REALIZADO': 'CAST(0 AS DECIMAL(18, 2))'}
+        medidas[colunas['medida']] = f"f.{colunas['valor']}"
+        sql = (f"SELECT {mes} AS MES_A, f.{colunas['CODCONTA']} AS CODCONTA, "
+               f"f.{colunas['CODIGOCENTROCUSTO']} AS CODIGOCENTROCUSTO, "
+               f"f.{colunas['CODFILIALPRINCIPAL']} AS CODFILIALPRINCIPAL, "
+               f"{medidas['ORCADO']} AS ORCADO, {medidas['REALIZADO']} AS REALIZADO")
+        condicoes = [f"f.{colunas['data']} IS NOT NULL"]
+        if juncao:
+            juncao_chaves = (f"c.CODCONTA = f.{colunas['CODCONTA']} "
+                             f"AND c.CODIGOCENTROCUSTO = f.{colunas['CODIGOCENTROCUSTO']} AND c.MES_A = {mes}")
+            if sql_server:
+                sql += f" FROM {tabela} f JOIN {juncao} c ON {juncao_chaves}"
+            else:
+                # CROSS JOIN fixa a ordem no SQLite: para cada chave, busca a conta e o centro de custo no índice
+                sql += f" FROM {juncao} c CROSS JOIN {tabela} f"
+                condicoes.append(juncao_chaves)
+        else:
+            sql += f" FROM {tabela} f"
+        if filtros:
+            condicao, valores = filtros(f"f.{colunas['data']}", sql_server)
+            condicoes.append(condicao)
+            parametros += valores
+        partes.append(f"{sql} WHERE {' AND '.join(condicoes)}")
+
+    if not partes:
+        return None, ()
+    grupo = ', '.join(COLUNAS_GRUPO)
+    return (f"SELECT {grupo}, SUM(ORCADO) AS ORCADO, SUM(REALIZADO) AS REALIZADO, "
+            f"SUM(REALIZADO) - SUM(ORCADO) AS VARIACAO "
+            f"FROM ({' UNION ALL '.join(partes)}) fatos GROUP BY {grupo}"), tuple(parametros)
+
+# Função para inserir no agregado os grupos calculados pelo SELECT das tabelas fato
+def _inserir_grupos(conn, sql, parametros):
+    if sql is None:
+        return 0
+    return conn.exec_driver_sql(
+        f"INSERT INTO {TABELA_AGREGADO} ({', '.join(COLUNAS_GRUPO)}, ORCADO, REALIZADO, VARIACAO) {sql}", parametros
+    ).rowcount
+
+# Função para extrair de um bloco carregado os grupos do agregado que ele afeta
+def chaves_afetadas(df, tabela_fato):
+    """
+    Retorna os grupos (MES_A, CODCONTA, CODIGOCENTROCUSTO) distintos das linhas
+    de um bloco da tabela fato, com MES_A em texto ISO (primeiro dia do mês).
+    """
+    colunas = FATOS[tabela_fato]
+    meses = converter_datas(df[colunas['data']]).dt.to_period('M').dt.start_time.dt.strftime('%Y-%m-%d')
+    chaves = pd.DataFrame({
+        'MES_A': meses,
+        'CODCONTA': df[colunas['CODCONTA']],
+        'CODIGOCENTROCUSTO': df[colunas['CODIGOCENTROCUSTO']],
+    })
+    return chaves.dropna().drop_duplicates().reset_index(drop=True)
+
+# Função para recalcular no agregado apenas os grupos afetados por uma carga
+def atualizar_chaves(conn, chaves):
+    """
+    Recalcula os grupos informados a partir das tabelas fato: as linhas do
+    agregado desses grupos são excluídas e reinseridas com as somas atuais de
+    orçado e realizado (todas as filiais do grupo). O custo é proporcional às
+    linhas dos grupos afetados, não às tabelas inteiras, e o resultado fica
+    certo também quando a carga atualiza linhas que já existiam.
+
+    Parâmetros:
+        conn (Connection): Conexão SQLAlchemy; roda na transação de quem chama.
+        chaves (DataFrame): Grupos afetados (ver chaves_afetadas).
+
+    Retorna:
+        int: Quantidade de linhas do agregado gravadas (0 se o agregado ainda não foi criado).
+    """
+    if chaves.empty or not inspect(conn).has_table(TABELA_AGREGADO):
+        return 0
+    bloquear_agregado(conn)
+    inicio = time.perf_counter()
+    sql_server = conn.dialect.name == 'mssql'
+    tabela_chaves = '#chaves_orcado_realizado' if sql_server else 'temp.chaves_orcado_realizado'
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tabela_chaves}")
+    conn.exec_driver_sql(f"CREATE TABLE {tabela_chaves} (MES_A DATE, CODCONTA INT, CODIGOCENTROCUSTO INT, "
+                         f"PRIMARY KEY ({', '.join(COLUNAS_CHAVE)}))")
+    inserir_em_lote(conn.connection, chaves[COLUNAS_CHAVE], tabela_chaves, confirmar=False)
+
+    lista_chaves = ', '.join(COLUNAS_CHAVE)
+    if sql_server:
+        condicao = ' AND '.join(f"c.{coluna} = {TABELA_AGREGADO}.{coluna}" for coluna in COLUNAS_CHAVE)
+        conn.exec_driver_sql(f"DELETE FROM {TABELA_AGREGADO} WHERE EXISTS "
+                             f"(SELECT 1 FROM {tabela_chaves} c WHERE {condicao})")
+    else:
+        # Com IN de tuplas o SQLite percorre as chaves e busca cada uma no índice do agregado
+        conn.exec_driver_sql(f"DELETE FROM {TABELA_AGREGADO} WHERE ({lista_chaves}) IN "
+                             f"(SELECT {lista_chaves} FROM {tabela_chaves})")
+
+    filtros = None
+    if sql_server:
+        # Faixa de meses das chaves, para o SQL Server ler só as partições desses meses
+        meses = [inicio_do_mes(mes) for mes in chaves['MES_A'].unique()]
+        filtros = lambda coluna, _: condicao_meses(coluna, meses)
+    gravadas = _inserir_grupos(conn, *_select_fatos(conn, juncao=tabela_chaves, filtros=filtros))
+    conn.exec_driver_sql(f"DROP TABLE {tabela_chaves}")
+    logger.info(f"{len(chaves)} grupos recalculados na tabela {TABELA_AGREGADO} "
+                f"({gravadas} linhas) em {time.perf_counter() - inicio:.2f}s.")
+    return gravadas
+
+# Função para recalcular no agregado meses inteiros (após uma substituição de meses)
+def atualizar_meses(conn, meses):
+    """
+    Recalcula todos os grupos dos meses informados ('2024-03', date...).
+
+    Retorna:
+        int: Quantidade de linhas do agregado gravadas.
+    """
+    meses = sorted({inicio_do_mes(mes) for mes in meses})
+    if not meses or not inspect(conn).has_table(TABELA_AGREGADO):
+        return 0
+    bloquear_agregado(conn)
+    inicio = time.perf_counter()
+    condicao, parametros = condicao_meses('MES_A', meses)
+    conn.exec_driver_sql(f"DELETE FROM {TABELA_AGREGADO} WHERE {condicao}", parametros)
+    gravadas = _inserir_grupos(conn, *_select_fatos(
+        conn, filtros=lambda coluna, sql_server: condicao_meses(coluna, meses, sql_server)))
+    logger.info(f"{len(meses)} meses recalculados na tabela {TABELA_AGREGADO} "
+                f"({gravadas} linhas) em {time.perf_counter() - inicio:.2f}s.")
+    return gravadas
+
+# Função para recalcular o agregado inteiro a partir das tabelas fato
+def reconstruir(conn):
+    bloquear_agregado(conn)
+    inicio = time.perf_counter()
+    conn.exec_driver_sql(f"DELETE FROM {TABELA_AGREGADO}")
+    gravadas = _inserir_grupos(conn, *_select_fatos(conn))
+    logger.info(f"Tabela {TABELA_AGREGADO} reconstruída com {gravadas} linhas em {time.perf_counter() - inicio:.2f}s.")
+    return gravadas
+
+# Função para consultar orçado x realizado no agregado
+def consultar_orcado_realizado(engine=None, mes_inicial=None, mes_final=None, contas=None, centros_custo=None,
+                               filiais=None, agrupar_por=COLUNAS_GRUPO):
+    """
+    Consulta o orçado x realizado na tabela agregada, sem reagregar as
+    tabelas fato.
+
+    Parâmetros:
+        engine (Engine, opcional): Engine do banco; padrão a compartilhada (conexao_bd).
+        mes_inicial, mes_final (str | date, opcional): Intervalo de meses, inclusive ('2024-01').
+        contas, centros_custo, filiais (list, opcional): Códigos a filtrar.
+        agrupar_por (list): Colunas de COLUNAS_GRUPO pelas quais somar; [] para o total geral.
+
+    Retorna:
+        DataFrame: Colunas de agrupamento, ORCADO, REALIZADO, VARIACAO e
+        VARIACAO_PERCENTUAL (realizado / orçado - 1; nulo sem orçado).
+    """
+    invalidas = [coluna for coluna in agrupar_por if coluna not in COLUNAS_GRUPO]
+    if invalidas:
+        raise ValueError(f"Colunas de agrupamento inválidas: {invalidas}; use {COLUNAS_GRUPO}.")
+    engine = engine or obter_engine()
+
+    condicoes, parametros, listas = [], {}, []
+    if mes_inicial is not None:
+        condicoes.append("MES_A >= :mes_inicial")
+        parametros['mes_inicial'] = inicio_do_mes(mes_inicial).isoformat()
+    if mes_final is not None:
+        condicoes.append("MES_A <= :mes_final")
+        parametros['mes_final'] = inicio_do_mes(mes_final).isoformat()
+    for coluna, valores in (('CODCONTA', contas), ('CODIGOCENTROCUSTO', centros_custo),
+                            ('CODFILIALPRINCIPAL', filiais)):
+        if valores is not None:
+            condicoes.append(f"{coluna} IN :{coluna}")
+            parametros[coluna] = [int(valor) for valor in valores]
+            listas.append(bindparam(coluna, expanding=True))
+
+    colunas = ', '.join(agrupar_por)
+    sql = (f"SELECT {colunas + ', ' if colunas else ''}SUM(ORCADO) AS ORCADO, SUM(REALIZADO) AS REALIZADO, "
+           f"SUM(VARIACAO) AS VARIACAO FROM {TABELA_AGREGADO}")
+    if condicoes:
+        sql += f" WHERE {' AND '.join(condicoes)}"
+    if colunas:
+        sql += f" GROUP BY {colunas} ORDER BY {colunas}"
+
+    try:
+        with engine.connect() as conn:
+            df = pd.read_sql(text(sql).bindparams(*listas), conn, params=parametros)
+    except Exception as e:
+        logger.error(f"Erro ao consultar a tabela {TABELA_AGREGADO}: {e}")
+        raise
+    df['VARIACAO_PERCENTUAL'] = df['REALIZADO'] / df['ORCADO'].where(df['ORCADO'] != 0) - 1
+    return df
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Orçado x realizado a partir da tabela ORCADO_REALIZADO.')
+    parser.add_argument('--reconstruir', action='store_true', help='Recalcula o agregado inteiro antes da consulta')
+    parser.add_argument('--mes-inicial')
+    parser.add_argument('--mes-final')
+    parser.add_argument('--agrupar', nargs='*', default=['MES_A'], help=f"Colunas entre {COLUNAS_GRUPO}")
+    argumentos = parser.parse_args()
+
+    engine = obter_engine()
+    criar_tabela_orcado_realizado(engine)
+    if argumentos.reconstruir:
+        with engine.begin() as conn:
+            reconstruir(conn)
+    print(consultar_orcado_realizado(engine, argumentos.mes_inicial, argumentos.mes_final,
+                                     agrupar_por=argumentos.agrupar).to_string(index=False))
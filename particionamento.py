@@ -0,0 +1,336 @@
+import time
+import logging
+from datetime import date
+import pandas as pd
+from sqlalchemy import inspect
+from carga_em_lote import inserir_em_lote, TAMANHO_LOTE_PADRAO
+from conexao_bd import tabela_existe
+from normalizacao_datas import converter_datas
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Função e esquema de partição mensal do SQL Server, compartilhados pelas tabelas fato
+FUNCAO_PARTICAO = 'pf_Mensal'
+ESQUEMA_PARTICAO = 'ps_Mensal'
+GRUPO_ARQUIVOS = '[PRIMARY]'
+
+# Meses com partição criada junto com a tabela: de MES_INICIAL até MESES_A_FRENTE meses após o atual
+MES_INICIAL = date(2020, 1, 1)
+MESES_A_FRENTE = 12
+
+# Função para obter o primeiro dia do mês de uma data
+def inicio_do_mes(valor):
+    valor = pd.Timestamp(valor)
+    return date(valor.year, valor.month, 1)
+
+# Função para obter o primeiro dia do mês seguinte
+def proximo_mes(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+# Função para listar os meses de um intervalo (inclusive)
+def meses_entre(inicio, fim):
+    meses, mes, fim = [], inicio_do_mes(inicio), inicio_do_mes(fim)
+    while mes <= fim:
+        meses.append(mes)
+        mes = proximo_mes(mes)
+    return meses
+
+# Função para listar os meses com partição criada junto com a tabela
+def meses_iniciais():
+    fim = date.today().replace(day=1)
+    for _ in range(MESES_A_FRENTE):
+        fim = proximo_mes(fim)
+    return meses_entre(MES_INICIAL, fim)
+
+# Função para montar o filtro de uma coluna de data pelos meses informados
+def condicao_meses(coluna, meses, sql_server=True):
+    """
+    Retorna o trecho SQL e os parâmetros ('?') que selecionam as linhas dos
+    meses, como faixas [início do mês, início do mês seguinte) que usam o
+    índice (ou a eliminação de partições) da coluna. No SQLite a data é texto
+    e linhas carregadas direto do CSV podem estar como 'yyyy/mm/dd'; com
+    sql_server=False as duas formas são cobertas, cada uma com a faixa
+    [aaaa-mm-01, aaaa-mm-32): terminando no mesmo mês, a faixa de dezembro
+    não alcança o ano seguinte, onde o texto com o outro separador cairia
+    dentro dela ('2024/05/01' fica entre '2024-12-01' e '2025-01-01').
+    """
+    faixas, parametros = [], []
+    for mes in sorted({inicio_do_mes(mes) for mes in meses}):
+        if sql_server:
+            formas = [(mes.isoformat(), proximo_mes(mes).isoformat())]
+        else:
+            formas = [(f"{mes:%Y}{separador}{mes:%m}{separador}01", f"{mes:%Y}{separador}{mes:%m}{separador}32")
+                      for separador in ('-', '/')]
+        for de, ate in formas:
+            faixas.append(f"({coluna} >= ? AND {coluna} < ?)")
+            parametros += [de, ate]
+    if not faixas:
+        return '1 = 0', ()
+    return f"({' OR '.join(faixas)})", tuple(parametros)
+
+# Função para criar a função e o esquema de partição mensal, ou acrescentar os meses que faltam
+def garantir_particoes(conn, meses):
+    """
+    Garante uma partição por mês (RANGE RIGHT no primeiro dia do mês) na
+    função pf_Mensal do SQL Server. Na primeira chamada cria a função e o
+    esquema ps_Mensal; nas seguintes divide (SPLIT RANGE) apenas os meses que
+    ainda não têm fronteira. Dividir a última partição, vazia, é só metadado;
+    dividir um mês que já tem linhas move essas linhas, por isso a tabela já
+    nasce com as partições de MES_INICIAL até MESES_A_FRENTE meses à frente.
+    """
+    meses = sorted({inicio_do_mes(mes) for mes in meses})
+    existe = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM sys.partition_functions WHERE name = ?", (FUNCAO_PARTICAO,)
+    ).scalar()
+    if not existe:
+        fronteiras = ', '.join(f"'{mes.isoformat()}'" for mes in meses)
+        conn.exec_driver_sql(f"CREATE PARTITION FUNCTION {FUNCAO_PARTICAO} (DATE) AS RANGE RIGHT FOR VALUES ({fronteiras})")
+        conn.exec_driver_sql(f"CREATE PARTITION SCHEME {ESQUEMA_PARTICAO} AS PARTITION {FUNCAO_PARTICAO} "
+                             f"ALL TO ({GRUPO_ARQUIVOS})")
+        logger.info(f"Função de partição {FUNCAO_PARTICAO} criada com {len(meses)} meses.")
+        return
+
+    existentes = {inicio_do_mes(linha[0]) for linha in conn.exec_driver_sql(
+        "SELECT v.value FROM sys.partition_range_values v "
+        "JOIN sys.partition_functions f ON f.function_id = v.function_id WHERE f.name = ?", (FUNCAO_PARTICAO,)
+    )}
+    for mes in meses:
+        if mes in existentes:
+            continue
+        conn.exec_driver_sql(f"ALTER PARTITION SCHEME {ESQUEMA_PARTICAO} NEXT USED {GRUPO_ARQUIVOS}")
+        conn.exec_driver_sql(f"ALTER PARTITION FUNCTION {FUNCAO_PARTICAO}() SPLIT RANGE ('{mes.isoformat()}')")
+        logger.info(f"Partição do mês {mes:%Y-%m} criada em {FUNCAO_PARTICAO}.")
+
+# Função para criar uma tabela fato particionada por mês
+def criar_tabela_particionada(engine, tabela, definicoes, colunas_chave, coluna_particao):
+    """
+    Cria a tabela com o layout particionado por mês. No SQL Server a tabela
+    fica no esquema ps_Mensal pela coluna de partição, com índice columnstore
+    clusterizado e a chave primária não clusterizada alinhada, como o SWITCH
+    exige. Nos demais bancos (SQLite) a chave primária é a mesma, com um
+    índice na coluna de partição, usado pela substituição do mês emulada com
+    DELETE + INSERT.
+
+    Um índice alinhado precisa conter a coluna de partição, por isso a chave
+    informada deve incluí-la: assim os dois bancos garantem a mesma unicidade
+    e a chave do MERGE (mesclagem.mesclar_via_staging) é a própria chave
+    primária. Quando a chave de negócio não tem o mês, a coluna de partição
+    entra nela e a unicidade passa a valer por mês (ver DespesaDetalhadas.CHAVES_DESPESAS).
+
+    Parâmetros:
+        engine (Engine): Engine SQLAlchemy do banco de destino.
+        tabela (str): Nome da tabela.
+        definicoes (str): Colunas e demais restrições (chaves estrangeiras), sem a chave primária.
+        colunas_chave (list): Colunas da chave primária, incluindo coluna_particao.
+        coluna_particao (str): Coluna DATE que define o mês da linha.
+    """
+    colunas_chave = list(colunas_chave)
+    if coluna_particao not in colunas_chave:
+        raise ValueError(f"A chave da tabela particionada {tabela} deve incluir a coluna de partição "
+                         f"{coluna_particao}: {colunas_chave}.")
+    if tabela_existe(engine, tabela):
+        return
+    try:
+        with engine.begin() as conn:
+            if conn.dialect.name == 'mssql':
+                garantir_particoes(conn, meses_iniciais())
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {tabela} ({definicoes}, "
+                    f"CONSTRAINT PK_{tabela} PRIMARY KEY NONCLUSTERED ({', '.join(colunas_chave)}) "
+                    f"ON {ESQUEMA_PARTICAO}({coluna_particao})) ON {ESQUEMA_PARTICAO}({coluna_particao})"
+                )
+                conn.exec_driver_sql(f"CREATE CLUSTERED COLUMNSTORE INDEX CCI_{tabela} ON {tabela} "
+                                     f"ON {ESQUEMA_PARTICAO}({coluna_particao})")
+            else:
+                conn.exec_driver_sql(f"CREATE TABLE {tabela} ({definicoes}, PRIMARY KEY ({', '.join(colunas_chave)}))")
+                conn.exec_driver_sql(f"CREATE INDEX IX_{tabela}_{coluna_particao} ON {tabela} ({coluna_particao})")
+        logger.info(f"Tabela {tabela} criada, particionada por mês em {coluna_particao}.")
+    except Exception as e:
+        logger.error(f"Erro ao criar a tabela {tabela}: {e}")
+        raise
+
+class SubstituicaoMensal:
+    """
+    Substitui meses inteiros de uma tabela particionada pelo conteúdo do
+    arquivo, de modo que recarregar um mês custa só aquele mês.
+
+    No SQL Server as linhas são inseridas bloco a bloco em uma tabela de
+    carga ({tabela}_CARGA, heap); em concluir() a carga recebe o mesmo
+    columnstore, chave primária e chaves estrangeiras da tabela, os meses são
+    esvaziados (TRUNCATE ... WITH PARTITIONS) e as partições da carga entram
+    na tabela com ALTER TABLE ... SWITCH, operação só de metadado. Requer
+    SQL Server 2016 ou superior.
+
+    Nos demais bancos (SQLite) a troca é emulada em uma única transação: na
+    primeira vez que um mês aparece, as linhas dele são excluídas (DELETE pelo
+    índice da coluna de partição) e os blocos são inseridos em seguida; tudo é
+    confirmado em concluir().
+
+    Uso:
+        carga = SubstituicaoMensal(engine, 'DespesasDetalhadas', 'MES_A')
+        carga.abrir()
+        try:
+            for bloco in blocos:
+                carga.enviar(bloco)
+            carga.concluir()
+        except Exception:
+            carga.descartar()
+            raise
+
+    Parâmetros:
+        engine (Engine): Engine SQLAlchemy do banco de destino.
+        tabela (str): Tabela criada por criar_tabela_particionada.
+        coluna_particao (str): Coluna DATE que define o mês da linha.
+        meses (list, opcional): Meses a substituir ('2024-03', date...). As linhas de
+            outros meses são ignoradas, e um mês sem linhas no arquivo fica vazio.
+            Se None, substitui todos os meses presentes no arquivo.
+        colunas_chave (list, opcional): Chave das linhas; repetidas no bloco, prevalece a última.
+        tamanho_lote (int): Quantidade de linhas por lote nos INSERTs.
+    """
+
+    def __init__(self, engine, tabela, coluna_particao, meses=None, colunas_chave=None,
+                 tamanho_lote=TAMANHO_LOTE_PADRAO):
+        self.engine = engine
+        self.tabela = tabela
+        self.coluna_particao = coluna_particao
+        self.meses_pedidos = None if meses is None else {inicio_do_mes(mes) for mes in meses}
+        self.colunas_chave = list(colunas_chave or [])
+        self.tamanho_lote = tamanho_lote
+        self.tabela_carga = f"{tabela}_CARGA"
+        self.conexao = None
+        self.meses = set()
+        self.resultado = {'meses': [], 'excluidos': 0, 'inseridos': 0, 'ignorados': 0}
+        self._inicio = None
+
+    @property
+    def sql_server(self):
+        return self.conexao.dialect.name == 'mssql'
+
+    def abrir(self):
+        self._inicio = time.perf_counter()
+        self.conexao = self.engine.connect()
+        if self.sql_server:
+            self._conferir_particionada()
+            self.conexao.exec_driver_sql(f"DROP TABLE IF EXISTS {self.tabela_carga}")
+            self.conexao.exec_driver_sql(f"SELECT TOP 0 * INTO {self.tabela_carga} FROM {self.tabela}")
+            self.conexao.commit()
+        elif self.meses_pedidos:
+            # Meses pedidos são esvaziados mesmo que o arquivo não tenha linhas deles
+            for mes in sorted(self.meses_pedidos):
+                self._excluir_mes_emulado(mes)
+
+    def _conferir_particionada(self):
+        particionada = self.conexao.exec_driver_sql(
+            "SELECT COUNT(*) FROM sys.indexes i JOIN sys.partition_schemes p ON p.data_space_id = i.data_space_id "
+            "WHERE i.object_id = OBJECT_ID(?) AND i.index_id IN (0, 1)", (self.tabela,)
+        ).scalar()
+        if not particionada:
+            raise ValueError(f"A tabela {self.tabela} não está particionada por mês; recrie-a com "
+                             f"criar_tabela_particionada antes de usar a substituição mensal.")
+
+    def _excluir_mes_emulado(self, mes):
+        condicao, parametros = condicao_meses(self.coluna_particao, [mes], sql_server=False)
+        excluidos = self.conexao.exec_driver_sql(f"DELETE FROM {self.tabela} WHERE {condicao}", parametros).rowcount
+        self.meses.add(mes)
+        self.resultado['excluidos'] += max(excluidos, 0)
+
+    def enviar(self, df):
+        # A coluna de partição segue em ISO (yyyy-mm-dd), o que torna o DELETE por faixa confiável no SQLite
+        datas = converter_datas(df[self.coluna_particao])
+        validas = datas.notna()
+        # Mês de cada linha como ano * 12 + mês, sem criar um objeto date por linha
+        meses_linhas = datas.dt.year * 12 + datas.dt.month - 1
+        if self.meses_pedidos is not None:
+            validas &= meses_linhas.isin([mes.year * 12 + mes.month - 1 for mes in self.meses_pedidos])
+        self.resultado['ignorados'] += int((~validas).sum())
+        df = df[validas].assign(**{self.coluna_particao: datas[validas].dt.strftime('%Y-%m-%d')})
+        if self.colunas_chave:
+            df = df.drop_duplicates(subset=self.colunas_chave, keep='last')
+        if df.empty:
+            return
+
+        meses_bloco = {date(int(codigo) // 12, int(codigo) % 12 + 1, 1) for codigo in meses_linhas[validas].unique()}
+        for mes in sorted(meses_bloco - self.meses):
+            if self.sql_server:
+                self.meses.add(mes)
+            else:
+                self._excluir_mes_emulado(mes)
+
+        destino = self.tabela_carga if self.sql_server else self.tabela
+        inserir_em_lote(self.conexao.connection, df, destino, tamanho_lote=self.tamanho_lote, confirmar=False)
+        if self.sql_server:
+            # A tabela de carga é só desta execução; cada bloco é confirmado para não crescer o log da transação
+            self.conexao.commit()
+        self.resultado['inseridos'] += len(df)
+
+    def _chave_primaria_e_estrangeiras(self):
+        inspetor = inspect(self.conexao)
+        chave = inspetor.get_pk_constraint(self.tabela)['constrained_columns']
+        estrangeiras = inspetor.get_foreign_keys(self.tabela)
+        return chave, estrangeiras
+
+    def _concluir_sql_server(self):
+        conn = self.conexao
+        meses = sorted(self.meses | (self.meses_pedidos or set()))
+        garantir_particoes(conn, meses)
+        conn.commit()
+
+        # O columnstore é montado uma vez sobre a carga inteira (rowgroups comprimidos, sem delta store)
+        particao = f"{ESQUEMA_PARTICAO}({self.coluna_particao})"
+        chave, estrangeiras = self._chave_primaria_e_estrangeiras()
+        conn.exec_driver_sql(f"CREATE CLUSTERED COLUMNSTORE INDEX CCI_{self.tabela_carga} "
+                             f"ON {self.tabela_carga} ON {particao}")
+        conn.exec_driver_sql(f"ALTER TABLE {self.tabela_carga} ADD CONSTRAINT PK_{self.tabela_carga} "
+                             f"PRIMARY KEY NONCLUSTERED ({', '.join(chave)}) ON {particao}")
+        for numero, estrangeira in enumerate(estrangeiras, start=1):
+            conn.exec_driver_sql(
+                f"ALTER TABLE {self.tabela_carga} WITH CHECK ADD CONSTRAINT FK_{self.tabela_carga}_{numero} "
+                f"FOREIGN KEY ({', '.join(estrangeira['constrained_columns'])}) "
+                f"REFERENCES {estrangeira['referred_table']} ({', '.join(estrangeira['referred_columns'])})"
+            )
+        conn.commit()
+
+        # Esvaziar os meses e trocar as partições, tudo em uma transação curta
+        for mes in meses:
+            numero = int(conn.exec_driver_sql(f"SELECT $PARTITION.{FUNCAO_PARTICAO}(?)", (mes,)).scalar())
+            self.resultado['excluidos'] += int(conn.exec_driver_sql(
+                "SELECT COALESCE(SUM(row_count), 0) FROM sys.dm_db_partition_stats "
+                "WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1) AND partition_number = ?",
+                (self.tabela, numero),
+            ).scalar())
+            conn.exec_driver_sql(f"TRUNCATE TABLE {self.tabela} WITH (PARTITIONS ({numero}))")
+            conn.exec_driver_sql(f"ALTER TABLE {self.tabela_carga} SWITCH PARTITION {numero} "
+                                 f"TO {self.tabela} PARTITION {numero}")
+        conn.exec_driver_sql(f"DROP TABLE {self.tabela_carga}")
+        conn.commit()
+
+    def concluir(self):
+        try:
+            if self.sql_server:
+                self._concluir_sql_server()
+            else:
+                self.conexao.commit()
+        except Exception as e:
+            logger.error(f"Erro ao substituir os meses da tabela {self.tabela}: {e}")
+            raise
+
+        self.resultado['meses'] = [f"{mes:%Y-%m}" for mes in sorted(self.meses | (self.meses_pedidos or set()))]
+        self.conexao.close()
+        self.conexao = None
+        logger.info(f"{len(self.resultado['meses'])} meses substituídos na tabela {self.tabela} em "
+                    f"{time.perf_counter() - self._inicio:.2f}s: {self.resultado['excluidos']} linhas excluídas, "
+                    f"{self.resultado['inseridos']} inseridas, {self.resultado['ignorados']} fora dos meses pedidos.")
+        return self.resultado
+
+    def descartar(self):
+        if self.conexao is None:
+            return
+        try:
+            self.conexao.rollback()
+            if self.sql_server:
+                self.conexao.exec_driver_sql(f"DROP TABLE IF EXISTS {self.tabela_carga}")
+                self.conexao.commit()
+        finally:
+            self.conexao.close()
+            self.conexao = None
@@ -0,0 +1,218 @@
+import sys
+import time
+import logging
+import argparse
+import importlib.util
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from conexao_bd import registrar_metricas_pool
+from instrumentacao import medir
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Pasta dos scripts de cada etapa
+PASTA_SCRIPTS = Path(__file__).resolve().parent
+
+# Etapas do pipeline: script, função executada e etapas das quais depende
+ETAPAS = {
+    'download': {'arquivo': 'Questao1_Automacao_para_Download_de_Dados.py', 'funcao': 'executar', 'depende_de': []},
+    'pdf': {'arquivo': 'Questao4_Extracao_de_Dados_de PDF_para_CSV.py', 'funcao': 'executar', 'depende_de': ['download']},
+    'xml': {'arquivo': 'Questao_3_Avancado_Processamento_XML.py', 'funcao': 'executar', 'depende_de': ['download']},
+    'api': {'arquivo': 'Questao_2_Consumo_Transformacao_de_Dados_API.py', 'funcao': 'executar', 'depende_de': []},
+    'banco': {'arquivo': 'Envio_Contas_BD.py', 'funcao': 'preparar_banco', 'depende_de': []},
+    'contas': {'arquivo': 'Envio_Contas_BD.py', 'funcao': 'executar', 'depende_de': ['banco']},
+    'centro_custo': {'arquivo': 'Envio_Centro_Custo_BD.py', 'funcao': 'executar', 'depende_de': ['banco', 'pdf']},
+    'orcamento': {'arquivo': 'Envio_orcamento.py', 'funcao': 'executar', 'depende_de': ['contas', 'centro_custo', 'xml']},
+    'despesas': {'arquivo': 'Envio_Despesas.py', 'funcao': 'executar', 'depende_de': ['contas', 'centro_custo']},
+    'despesas_detalhadas': {'arquivo': 'DespesaDetalhadas.py', 'funcao': 'executar',
+                            'depende_de': ['contas', 'centro_custo']},
+}
+
+# Módulos já carregados, um por arquivo (Contas fornece duas etapas)
+_modulos = {}
+
+# Função para carregar o script de uma etapa como módulo
+def carregar_modulo(arquivo):
+    """
+    Importa o script pelo caminho do arquivo, já que alguns nomes têm espaços
+    e não podem ser importados com import. Os scripts só executam a carga
+    dentro de executar(), então a importação não tem efeitos colaterais.
+    O módulo fica em sys.modules com o nome do arquivo, de modo que um
+    import comum do mesmo script (antes ou depois) usa o mesmo objeto em
+    vez de executá-lo de novo.
+    """
+    if arquivo not in _modulos:
+        nome = Path(arquivo).stem.replace(' ', '_')
+        modulo = sys.modules.get(nome)
+        if modulo is None:
+            spec = importlib.util.spec_from_file_location(nome, PASTA_SCRIPTS / arquivo)
+            modulo = importlib.util.module_from_spec(spec)
+            sys.modules[nome] = modulo
+            try:
+                spec.loader.exec_module(modulo)
+            except Exception:
+                del sys.modules[nome]
+                raise
+        _modulos[arquivo] = modulo
+    return _modulos[arquivo]
+
+# Função para validar o grafo de dependências e retornar uma ordem topológica
+def ordenar_etapas(etapas):
+    """
+    Confere se todas as dependências existem e se o grafo não tem ciclos.
+
+    Parâmetros:
+        etapas (dict): Etapas no formato de ETAPAS.
+
+    Retorna:
+        list: Nomes das etapas em ordem topológica.
+    """
+    for nome, etapa in etapas.items():
+        desconhecidas = [dep for dep in etapa['depende_de'] if dep not in etapas]
+        if desconhecidas:
+            raise ValueError(f"Etapa {nome} depende de etapas inexistentes: {desconhecidas}")
+
+    ordem = []
+    pendentes = {nome: set(etapa['depende_de']) for nome, etapa in etapas.items()}
+    while pendentes:
+        prontas = sorted(nome for nome, deps in pendentes.items() if not deps)
+        if not prontas:
+            raise ValueError(f"Ciclo de dependências entre as etapas: {sorted(pendentes)}")
+        for nome in prontas:
+            del pendentes[nome]
+            ordem.append(nome)
+        for deps in pendentes.values():
+            deps.difference_update(prontas)
+    return ordem
+
+# Função para selecionar as etapas pedidas e todas as suas dependências
+def selecionar_etapas(etapas, alvos):
+    selecionadas = set()
+    pilha = list(alvos)
+    while pilha:
+        nome = pilha.pop()
+        if nome not in etapas:
+            raise ValueError(f"Etapa desconhecida: {nome}")
+        if nome not in selecionadas:
+            selecionadas.add(nome)
+            pilha.extend(etapas[nome]['depende_de'])
+    return {nome: etapa for nome, etapa in etapas.items() if nome in selecionadas}
+
+# Função para executar uma etapa e medir o tempo
+def _executar_etapa(nome, etapa, inicio_pipeline):
+    inicio = time.perf_counter()
+    logger.info(f"Etapa {nome} iniciada.")
+    funcao = getattr(carregar_modulo(etapa['arquivo']), etapa['funcao'])
+    # Com NEOBPO_METRICAS definida, a etapa inteira também vira uma linha das métricas
+    with medir(f'pipeline.{nome}'):
+        funcao()
+    fim = time.perf_counter()
+    return {'inicio': inicio - inicio_pipeline, 'duracao': fim - inicio}
+
+# Função para calcular o caminho crítico a partir das durações medidas
+def caminho_critico(etapas, resultados, ordem):
+    """
+    Retorna a cadeia de dependências com a maior soma de durações, que é o
+    limite inferior do tempo total mesmo com paralelismo ilimitado.
+
+    Retorna:
+        tuple: (lista de etapas do caminho, duração total em segundos).
+    """
+    acumulado = {}
+    anterior = {}
+    for nome in ordem:
+        if resultados.get(nome, {}).get('status') != 'ok':
+            continue
+        deps = [dep for dep in etapas[nome]['depende_de'] if dep in acumulado]
+        melhor = max(deps, key=lambda dep: acumulado[dep], default=None)
+        acumulado[nome] = resultados[nome]['duracao'] + (acumulado[melhor] if melhor else 0.0)
+        anterior[nome] = melhor
+
+    if not acumulado:
+        return [], 0.0
+    nome = max(acumulado, key=acumulado.get)
+    total = acumulado[nome]
+    caminho = []
+    while nome:
+        caminho.append(nome)
+        nome = anterior[nome]
+    return caminho[::-1], total
+
+# Função para executar o pipeline respeitando as dependências
+def executar_pipeline(etapas=ETAPAS, alvos=None, max_paralelo=4):
+    """
+    Executa as etapas do pipeline. Uma etapa começa assim que todas as suas
+    dependências terminam, de modo que etapas independentes (por exemplo PDF e
+    XML, ou CONTAS e CENTRO_DE_CUSTO) rodam ao mesmo tempo. Se uma etapa falha,
+    as que dependem dela são puladas e as demais continuam.
+
+    Parâmetros:
+        etapas (dict): Etapas no formato de ETAPAS.
+        alvos (list, opcional): Etapas desejadas; as dependências entram automaticamente.
+        max_paralelo (int): Quantidade máxima de etapas simultâneas.
+
+    Retorna:
+        dict: Resultado de cada etapa (status, início e duração em segundos).
+    """
+    if alvos:
+        etapas = selecionar_etapas(etapas, alvos)
+    ordem = ordenar_etapas(etapas)
+
+    resultados = {}
+    pendentes = set(ordem)
+    inicio_pipeline = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_paralelo) as executor:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            for nome in [nome for nome in ordem if nome in pendentes]:
+                deps = etapas[nome]['depende_de']
+                if any(resultados.get(dep, {}).get('status') in ('falhou', 'pulada') for dep in deps):
+                    pendentes.discard(nome)
+                    resultados[nome] = {'status': 'pulada', 'inicio': None, 'duracao': 0.0}
+                    logger.warning(f"Etapa {nome} pulada por falha em uma dependência.")
+                elif all(resultados.get(dep, {}).get('status') == 'ok' for dep in deps):
+                    pendentes.discard(nome)
+                    em_execucao[executor.submit(_executar_etapa, nome, etapas[nome], inicio_pipeline)] = nome
+
+            if not em_execucao:
+                continue
+
+            concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidas:
+                nome = em_execucao.pop(futuro)
+                try:
+                    resultados[nome] = {'status': 'ok', **futuro.result()}
+                    logger.info(f"Etapa {nome} concluída em {resultados[nome]['duracao']:.2f}s.")
+                except Exception as e:
+                    resultados[nome] = {'status': 'falhou', 'inicio': None, 'duracao': 0.0}
+                    logger.error(f"Erro na etapa {nome}: {e}")
+
+    total = time.perf_counter() - inicio_pipeline
+    imprimir_resumo(etapas, resultados, ordem, total)
+    registrar_metricas_pool()
+    return resultados
+
+# Função para imprimir o tempo de cada etapa e o caminho crítico
+def imprimir_resumo(etapas, resultados, ordem, total):
+    print(f"{'Etapa':<22}{'Status':<10}{'Início (s)':>12}{'Duração (s)':>13}")
+    for nome in ordem:
+        resultado = resultados[nome]
+        inicio = f"{resultado['inicio']:.2f}" if resultado['inicio'] is not None else '-'
+        print(f"{nome:<22}{resultado['status']:<10}{inicio:>12}{resultado['duracao']:>13.2f}")
+
+    caminho, duracao_caminho = caminho_critico(etapas, resultados, ordem)
+    soma = sum(resultado['duracao'] for resultado in resultados.values())
+    print(f"Tempo total: {total:.2f}s (soma das etapas: {soma:.2f}s).")
+    print(f"Caminho crítico: {' -> '.join(caminho) or '-'} ({duracao_caminho:.2f}s).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Executa o pipeline completo ou apenas as etapas informadas.')
+    parser.add_argument('etapas', nargs='*', help=f"Etapas desejadas: {', '.join(ETAPAS)}")
+    parser.add_argument('--paralelo', type=int, default=4, help='Quantidade máxima de etapas simultâneas.')
+    argumentos = parser.parse_args()
+
+    resultados = executar_pipeline(alvos=argumentos.etapas or None, max_paralelo=argumentos.paralelo)
+    sys.exit(0 if all(resultado['status'] == 'ok' for resultado in resultados.values()) else 1)
@@ -0,0 +1,22 @@
+import hashlib
+
+# Tamanho de cada pedaço lido do disco ao calcular o resumo
+TAMANHO_PEDACO_LEITURA = 1024 * 1024
+
+# Função para calcular o SHA-256 de um arquivo sem carregá-lo inteiro em memória
+def calcular_sha256(caminho):
+    """
+    Calcula o SHA-256 do arquivo lendo-o em pedaços. Usado pelo manifesto de
+    downloads, pelo cache de extração e pela impressão digital das dimensões.
+
+    Parâmetros:
+        caminho (str): Caminho do arquivo.
+
+    Retorna:
+        str: Resumo SHA-256 em hexadecimal.
+    """
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for pedaco in iter(lambda: arquivo.read(TAMANHO_PEDACO_LEITURA), b''):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
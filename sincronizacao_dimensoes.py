@@ -0,0 +1,256 @@
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import text, bindparam, inspect
+from resumo_arquivos import calcular_sha256
+from carga_em_lote import inserir_em_lote, linhas_como_parametros, TAMANHO_LOTE_PADRAO
+from cache_dimensoes import DIMENSOES, versao_dimensao, registrar_chaves, invalidar
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tabela de controle com a impressão digital da última sincronização de cada dimensão
+TABELA_CONTROLE = 'CONTROLE_SINCRONIZACAO'
+
+# Quantidade de chaves por consulta ao procurar referências nas tabelas fato
+CHAVES_POR_CONSULTA = 500
+
+# Função para criar a tabela de controle, se ainda não existir
+def criar_tabela_controle(conn):
+    colunas = """
+        TABELA VARCHAR(128) PRIMARY KEY,
+        IMPRESSAO CHAR(64) NOT NULL,
+        VERSAO VARCHAR(400) NOT NULL,
+        LINHAS INT NOT NULL,
+        ATUALIZADO_EM VARCHAR(19) NOT NULL
+    """
+    if conn.dialect.name == 'mssql':
+        conn.exec_driver_sql(f"IF OBJECT_ID('{TABELA_CONTROLE}', 'U') IS NULL CREATE TABLE {TABELA_CONTROLE} ({colunas})")
+    else:
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {TABELA_CONTROLE} ({colunas})")
+
+# Função para ler o registro de controle de uma dimensão
+def ler_controle(conn, tabela):
+    linha = conn.execute(
+        text(f"SELECT IMPRESSAO, VERSAO, LINHAS FROM {TABELA_CONTROLE} WHERE TABELA = :tabela"),
+        {'tabela': tabela},
+    ).one_or_none()
+    if linha is None:
+        return None
+    return {'impressao': linha[0].strip(), 'versao': json.loads(linha[1]), 'linhas': int(linha[2])}
+
+# Função para gravar o registro de controle de uma dimensão (na transação da sincronização)
+def _gravar_controle(conn, tabela, impressao, versao, linhas):
+    conn.execute(text(f"DELETE FROM {TABELA_CONTROLE} WHERE TABELA = :tabela"), {'tabela': tabela})
+    conn.execute(
+        text(f"INSERT INTO {TABELA_CONTROLE} (TABELA, IMPRESSAO, VERSAO, LINHAS, ATUALIZADO_EM) "
+             f"VALUES (:tabela, :impressao, :versao, :linhas, :atualizado_em)"),
+        {'tabela': tabela, 'impressao': impressao, 'versao': json.dumps(versao, default=str),
+         'linhas': int(linhas), 'atualizado_em': datetime.now().strftime('%Y-%m-%d %H:%M:%S')},
+    )
+
+# Função para calcular a impressão digital de um arquivo de dimensão (SHA-256 do conteúdo)
+def impressao_arquivo(caminho):
+    return calcular_sha256(caminho)
+
+# Função para verificar, só pela tabela de controle, se a dimensão já foi sincronizada com esta impressão
+def dimensao_inalterada(engine, tabela, impressao):
+    """
+    Compara a impressão digital informada (por exemplo, a do arquivo, ver
+    impressao_arquivo) com a da última sincronização, antes de qualquer
+    leitura do arquivo ou da tabela. Custa uma consulta pela chave primária
+    da tabela de controle.
+    """
+    with engine.connect() as conn:
+        inspetor = inspect(conn)
+        if not (inspetor.has_table(TABELA_CONTROLE) and inspetor.has_table(tabela)):
+            return False
+        controle = ler_controle(conn, tabela)
+    return controle is not None and controle['impressao'] == impressao
+
+# Função para descartar a impressão digital de uma dimensão (após uma recarga completa)
+def descartar_controle(engine, tabela):
+    with engine.begin() as conn:
+        criar_tabela_controle(conn)
+        conn.execute(text(f"DELETE FROM {TABELA_CONTROLE} WHERE TABELA = :tabela"), {'tabela': tabela})
+
+# Função para converter uma coluna em texto canônico antes do hash
+def _como_texto(serie, tipo):
+    # Inteiros lidos do banco com NULL chegam como float64 (5.0); voltam a inteiro para casar com a origem
+    if pd.api.types.is_integer_dtype(tipo) and not isinstance(tipo, pd.CategoricalDtype):
+        serie = pd.to_numeric(serie).astype('Int64')
+    return serie.astype('string')
+
+# Função para calcular o hash de cada linha, indexado pela chave
+def hash_linhas(df, coluna_chave, tipos=None):
+    """
+    Calcula um hash de 64 bits por linha sobre os valores em texto canônico,
+    de modo que o DataFrame lido do arquivo (tipos do registro de esquemas) e o
+    lido do banco (tipos do driver) produzam o mesmo hash para a mesma linha.
+
+    Parâmetros:
+        df (DataFrame): Linhas da dimensão, uma por chave.
+        coluna_chave (str): Coluna que identifica a linha.
+        tipos (dict, opcional): Tipos de referência por coluna; padrão os do próprio df.
+
+    Retorna:
+        Series: Hash (uint64) de cada linha, indexado pela chave em texto.
+    """
+    tipos = tipos or df.dtypes.to_dict()
+    canonico = pd.DataFrame({coluna: _como_texto(df[coluna], tipos[coluna]) for coluna in df.columns})
+    hashes = pd.util.hash_pandas_object(canonico, index=False).to_numpy()
+    # Índice em object: o isin do texto em Arrow compara valor a valor em Python
+    return pd.Series(hashes, index=pd.Index(canonico[coluna_chave], dtype=object, name=coluna_chave))
+
+# Função para combinar os hashes das linhas na impressão digital da tabela
+def impressao_digital(hashes, colunas):
+    # Os hashes são ordenados, então a impressão não depende da ordem das linhas no arquivo
+    resumo = hashlib.sha256(','.join(colunas).encode('utf-8'))
+    resumo.update(hashes.sort_values().to_numpy().tobytes())
+    return resumo.hexdigest()
+
+# Função para executar um comando parametrizado em lotes
+def _executar_em_lotes(conn, sql, linhas, tamanho_lote):
+    for posicao in range(0, len(linhas), tamanho_lote):
+        conn.exec_driver_sql(sql, linhas[posicao:posicao + tamanho_lote])
+
+# Função para encontrar, entre as chaves informadas, as referenciadas por chaves estrangeiras de outras tabelas
+def chaves_referenciadas(conn, tabela, coluna_chave, chaves):
+    """
+    Procura as chaves em todas as tabelas com chave estrangeira declarada para
+    tabela(coluna_chave), como ORCAMENTO para CONTAS e CENTRO_DE_CUSTO.
+
+    Retorna:
+        set: Chaves que ainda são usadas e não podem ser excluídas.
+    """
+    inspetor = inspect(conn)
+    referencias = []
+    for outra in inspetor.get_table_names():
+        for estrangeira in inspetor.get_foreign_keys(outra):
+            if (estrangeira['referred_table'].upper() == tabela.upper()
+                    and [coluna.upper() for coluna in estrangeira['referred_columns']] == [coluna_chave.upper()]):
+                referencias.append((outra, estrangeira['constrained_columns'][0]))
+
+    chaves = list(chaves)
+    usadas = set()
+    for outra, coluna in referencias:
+        consulta = text(f"SELECT DISTINCT {coluna} FROM {outra} WHERE {coluna} IN :chaves").bindparams(
+            bindparam('chaves', expanding=True))
+        for posicao in range(0, len(chaves), CHAVES_POR_CONSULTA):
+            usadas.update(conn.execute(consulta, {'chaves': chaves[posicao:posicao + CHAVES_POR_CONSULTA]}).scalars())
+    return usadas
+
+# Função para sincronizar uma dimensão com o DataFrame, aplicando apenas as diferenças
+def sincronizar_dimensao(engine, df, tabela, coluna_chave=None, excluir_ausentes=True, forcar=False,
+                         tamanho_lote=TAMANHO_LOTE_PADRAO, impressao=None):
+    """
+    Sincroniza a tabela de dimensão com o DataFrame sem apagar e recarregar a
+    tabela inteira. A impressão digital do arquivo (a informada ou, sem ela, o
+    hash de todas as linhas) é comparada primeiro com a da última
+    sincronização, guardada em CONTROLE_SINCRONIZACAO: se conferir, nada mais é
+    lido nem gravado. Caso contrário, a tabela é lida, as linhas são
+    comparadas pelo hash e as chaves novas são inseridas, as alteradas
+    atualizadas e as ausentes do arquivo excluídas, tudo em uma única transação.
+
+    Chaves ausentes do arquivo que ainda são referenciadas por chaves
+    estrangeiras (ORCAMENTO, por exemplo) não são excluídas: ficam na tabela e
+    são listadas em um aviso no log.
+
+    Parâmetros:
+        engine (Engine): Engine SQLAlchemy do banco de destino.
+        df (DataFrame): Conteúdo completo da dimensão; as colunas devem existir na tabela.
+        tabela (str): Nome da tabela de dimensão.
+        coluna_chave (str, opcional): Coluna de chave; padrão a de cache_dimensoes.DIMENSOES.
+        excluir_ausentes (bool): Se False, mantém na tabela as chaves ausentes do DataFrame.
+        forcar (bool): Se True, compara linha a linha mesmo com a impressão digital igual.
+        tamanho_lote (int): Quantidade de linhas por lote nos comandos enviados.
+        impressao (str, opcional): Impressão digital da origem (ex.: impressao_arquivo);
+            padrão o hash das linhas do DataFrame.
+
+    Retorna:
+        dict: Linhas inseridas, atualizadas, excluídas e inalteradas.
+    """
+    coluna_chave = coluna_chave or DIMENSOES[tabela]
+    colunas = list(df.columns)
+    colunas_valor = [coluna for coluna in colunas if coluna != coluna_chave]
+
+    # Linhas repetidas na mesma chave: prevalece a última, como em mesclagem.mesclar_via_staging
+    df = df.drop_duplicates(subset=[coluna_chave], keep='last').reset_index(drop=True)
+    tipos = df.dtypes.to_dict()
+    hashes_origem = None
+    if impressao is None:
+        hashes_origem = hash_linhas(df, coluna_chave)
+        impressao = impressao_digital(hashes_origem, colunas)
+    resultado = {'inseridos': 0, 'atualizados': 0, 'excluidos': 0, 'inalterados': 0}
+    excluidos = 0
+
+    inicio = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            criar_tabela_controle(conn)
+            controle = ler_controle(conn, tabela)
+            if not forcar and controle is not None and controle['impressao'] == impressao:
+                resultado['inalterados'] = len(df)
+                logger.info(f"Tabela {tabela} sem alterações (impressão digital {impressao[:12]}); "
+                            f"nenhuma linha enviada.")
+                return resultado
+
+            if hashes_origem is None:
+                hashes_origem = hash_linhas(df, coluna_chave)
+            atual = pd.read_sql(text(f"SELECT {', '.join(colunas)} FROM {tabela}"), conn)
+            hashes_atual = hash_linhas(atual, coluna_chave, tipos)
+
+            existentes = hashes_origem.index.isin(hashes_atual.index)
+            novos = df[~existentes]
+            hashes_existentes = hashes_origem[existentes]
+            mudou = hashes_existentes.to_numpy() != hashes_atual.reindex(hashes_existentes.index).to_numpy()
+            alterados = df[existentes][mudou]
+            ausentes = atual[~hashes_atual.index.isin(hashes_origem.index)]
+
+            if len(novos):
+                inserir_em_lote(conn.connection, novos, tabela, tamanho_lote=tamanho_lote, confirmar=False)
+            if len(alterados) and colunas_valor:
+                atribuicoes = ', '.join(f"{coluna} = ?" for coluna in colunas_valor)
+                _executar_em_lotes(conn, f"UPDATE {tabela} SET {atribuicoes} WHERE {coluna_chave} = ?",
+                                   linhas_como_parametros(alterados[colunas_valor + [coluna_chave]]), tamanho_lote)
+            if len(ausentes) and excluir_ausentes:
+                usadas = chaves_referenciadas(conn, tabela, coluna_chave, ausentes[coluna_chave].tolist())
+                if usadas:
+                    mantidas = ausentes[coluna_chave].isin(usadas)
+                    logger.warning(f"{int(mantidas.sum())} chaves da tabela {tabela} saíram do arquivo, mas ainda "
+                                   f"são referenciadas por outras tabelas e foram mantidas "
+                                   f"(ex.: {ausentes.loc[mantidas, coluna_chave].head(5).tolist()}).")
+                    ausentes = ausentes[~mantidas]
+                if len(ausentes):
+                    _executar_em_lotes(conn, f"DELETE FROM {tabela} WHERE {coluna_chave} = ?",
+                                       linhas_como_parametros(ausentes[[coluna_chave]]), tamanho_lote)
+                excluidos = len(ausentes)
+            elif len(ausentes):
+                logger.warning(f"{len(ausentes)} chaves da tabela {tabela} não estão no arquivo e foram mantidas "
+                               f"(ex.: {ausentes[coluna_chave].head(5).tolist()}).")
+
+            versao_final = versao_dimensao(conn, tabela)
+            _gravar_controle(conn, tabela, impressao, versao_final, len(df))
+    except Exception as e:
+        logger.error(f"Erro ao sincronizar a tabela {tabela}: {e}")
+        raise
+
+    # Mantém o cache de chaves das cargas fato coerente com a tabela
+    if excluidos:
+        invalidar(tabela)
+    elif len(novos):
+        registrar_chaves(tabela, novos[coluna_chave].tolist(), versao_final)
+
+    resultado.update({
+        'inseridos': len(novos),
+        'atualizados': len(alterados),
+        'excluidos': excluidos,
+        'inalterados': len(df) - len(novos) - len(alterados),
+    })
+    logger.info(f"Tabela {tabela} sincronizada em {time.perf_counter() - inicio:.2f}s: "
+                f"{resultado['inseridos']} linhas inseridas, {resultado['atualizados']} atualizadas, "
+                f"{resultado['excluidos']} excluídas, {resultado['inalterados']} sem alteração.")
+    return resultado
@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+
+# Os módulos do projeto e os geradores/servidores dos benchmarks ficam fora de pacotes
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from conexao_bd import obter_engine, fechar_engines
+from cache_dimensoes import invalidar
+
+CRIAR_CONTAS = "CREATE TABLE CONTAS (CODCONTA INT PRIMARY KEY, CONTA VARCHAR(255), GRUPO VARCHAR(255))"
+CRIAR_CENTRO_DE_CUSTO = ("CREATE TABLE CENTRO_DE_CUSTO (CODIGOCENTROCUSTO INT PRIMARY KEY, DESCRICAO VARCHAR(255), "
+                         "CENTROCUSTO VARCHAR(255), CENTROCUSTO_COD INT)")
+
+# Banco SQLite em um arquivo temporário; os scripts o recebem por obter_engine() (NEOBPO_DB_URL)
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setenv('NEOBPO_DB_URL', f"sqlite:///{tmp_path / 'neobpo.db'}")
+    fechar_engines()
+    invalidar()
+    yield obter_engine()
+    fechar_engines()
+    invalidar()
+
+# Códigos das dimensões de teste: cobrem os arquivos sintéticos dos geradores (as despesas órfãs são descartadas)
+CODIGOS_DIMENSOES = range(10_000)
+
+# Banco com as tabelas de dimensão preenchidas com CODIGOS_DIMENSOES
+@pytest.fixture
+def engine_com_dimensoes(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(CRIAR_CONTAS)
+        conn.exec_driver_sql(CRIAR_CENTRO_DE_CUSTO)
+        conn.exec_driver_sql("INSERT INTO CONTAS (CODCONTA) VALUES (?)", [(codigo,) for codigo in CODIGOS_DIMENSOES])
+        conn.exec_driver_sql("INSERT INTO CENTRO_DE_CUSTO (CODIGOCENTROCUSTO) VALUES (?)",
+                             [(codigo,) for codigo in CODIGOS_DIMENSOES])
+    return engine
+
+# Função para contar as linhas de uma tabela
+def contar(engine, tabela, condicao='1 = 1'):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"SELECT COUNT(*) FROM {tabela} WHERE {condicao}").scalar()
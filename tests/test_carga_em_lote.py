@@ -0,0 +1,79 @@
+"""
+Testes da carga em lotes parametrizados (carga_em_lote) e da recarga das
+dimensões CONTAS e CENTRO_DE_CUSTO em SQLite.
+"""
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+
+from carga_em_lote import inserir_em_lote, linhas_como_parametros
+from geradores import gerar_csv_contas, gerar_csv_centro_custo
+from pipeline import carregar_modulo
+from conftest import CRIAR_CONTAS, contar
+
+@pytest.fixture
+def conexao():
+    conexao = sqlite3.connect(':memory:')
+    conexao.execute(CRIAR_CONTAS)
+    yield conexao
+    conexao.close()
+
+def contas(quantidade):
+    return pd.DataFrame({'CODCONTA': range(1, quantidade + 1),
+                         'CONTA': [f"Conta {i}" for i in range(1, quantidade + 1)],
+                         'GRUPO': ['Despesas' if i % 2 else 'Receitas' for i in range(1, quantidade + 1)]})
+
+def test_linhas_como_parametros_troca_nulos_por_none():
+    df = pd.DataFrame({'A': [1, np.nan], 'B': ['x', None], 'C': pd.to_datetime(['2024-01-01', None])})
+    linhas = linhas_como_parametros(df)
+    assert linhas[1] == (None, None, None)
+    assert linhas[0][0] == 1 and linhas[0][1] == 'x'
+
+@pytest.mark.parametrize('quantidade, tamanho_lote', [(12_345, 1000), (1000, 1000), (7, 5000), (0, 100)])
+def test_inserir_em_lote_grava_todas_as_linhas(conexao, quantidade, tamanho_lote):
+    df = contas(quantidade)
+    resultado = inserir_em_lote(conexao, df, 'CONTAS', tamanho_lote=tamanho_lote)
+
+    assert resultado['linhas'] == quantidade
+    assert conexao.execute("SELECT COUNT(*), COUNT(DISTINCT CODCONTA) FROM CONTAS").fetchone() == (quantidade,
+                                                                                                   quantidade)
+    gravado = pd.read_sql("SELECT * FROM CONTAS ORDER BY CODCONTA", conexao)
+    pd.testing.assert_frame_equal(gravado, df, check_dtype=False)
+
+def test_inserir_em_lote_grava_nulos_como_null(conexao):
+    df = pd.DataFrame({'CODCONTA': [1, 2], 'CONTA': ['Conta 1', None], 'GRUPO': [np.nan, 'Receitas']})
+    inserir_em_lote(conexao, df, 'CONTAS')
+    assert conexao.execute("SELECT COUNT(*) FROM CONTAS WHERE CONTA IS NULL OR GRUPO IS NULL").fetchone()[0] == 2
+
+def test_inserir_em_lote_sem_confirmar_deixa_a_transacao_aberta(conexao):
+    inserir_em_lote(conexao, contas(100), 'CONTAS', tamanho_lote=30, confirmar=False)
+    conexao.rollback()
+    assert conexao.execute("SELECT COUNT(*) FROM CONTAS").fetchone()[0] == 0
+
+def test_inserir_em_lote_propaga_o_erro_do_lote(conexao):
+    df = pd.concat([contas(10), contas(10)])
+    with pytest.raises(sqlite3.IntegrityError):
+        inserir_em_lote(conexao, df, 'CONTAS', tamanho_lote=10)
+    conexao.rollback()
+    assert conexao.execute("SELECT COUNT(*) FROM CONTAS").fetchone()[0] == 0
+
+@pytest.mark.parametrize('script, tabela, gerador, coluna_chave', [
+    ('Envio_Contas_BD.py', 'CONTAS', gerar_csv_contas, 'CODCONTA'),
+    ('Envio_Centro_Custo_BD.py', 'CENTRO_DE_CUSTO', gerar_csv_centro_custo, 'CODIGOCENTROCUSTO'),
+])
+def test_recarga_das_dimensoes_substitui_a_tabela(engine, tmp_path, monkeypatch, script, tabela, gerador,
+                                                  coluna_chave):
+    modulo = carregar_modulo(script)
+    caminho_csv = gerador(str(tmp_path / f'{tabela}_.csv'), 2000)
+    monkeypatch.setattr(modulo, 'caminho_csv', caminho_csv)
+    monkeypatch.setattr(modulo, 'modo_carga', 'recarga')
+    esperado = len(modulo.ler_csv())
+
+    modulo.executar()
+    assert contar(engine, tabela) == esperado
+    # A recarga apaga as linhas anteriores antes de inserir: executar de novo não duplica
+    modulo.executar()
+    assert contar(engine, tabela) == esperado
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql(f"SELECT COUNT(DISTINCT {coluna_chave}) FROM {tabela}").scalar() == esperado
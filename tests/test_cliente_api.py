@@ -0,0 +1,120 @@
+"""
+Testes do cliente paginado (cliente_api) contra o servidor local de
+benchmarks/servidor_api.py: ordem e completude das páginas pré-buscadas,
+pausa em Retry-After nas respostas 429 e novas tentativas em erros 5xx.
+"""
+import functools
+import pytest
+
+import cliente_api
+from cliente_api import consumir_paginas, segundos_retry_after
+from servidor_api import ServidorAPI, gerar_registros
+from pipeline import carregar_modulo
+
+# Sem variação aleatória, a espera entre tentativas é 0.25s, 0.5s, 1s, ...
+@pytest.fixture
+def espera_sem_variacao(monkeypatch):
+    monkeypatch.setattr(cliente_api.random, 'random', lambda: 0.0)
+
+# Função para consumir todas as páginas e devolver [(offset, registros)] na ordem recebida
+def receber(url, **opcoes):
+    paginas = []
+    consumir_paginas(url, lambda offset, dados: paginas.append((offset, dados)), **opcoes)
+    return paginas
+
+# Função para obter os instantes dos pedidos feitos a um offset
+def instantes(servidor, offset):
+    return [instante for instante, pedido, _ in servidor.historico if pedido == offset]
+
+@pytest.mark.parametrize('quantidade', [1050, 1000, 40, 0])
+def test_paginas_pre_buscadas_chegam_em_ordem_e_completas(quantidade):
+    registros = gerar_registros(quantidade)
+    with ServidorAPI(registros, latencia=0.01) as servidor:
+        paginas = receber(servidor.url, limite_pagina=100, concorrencia=4)
+
+    assert [offset for offset, _ in paginas] == list(range(0, quantidade, 100))
+    assert [registro for _, dados in paginas for registro in dados] == registros
+
+def test_pre_busca_mantem_a_ordem_quando_as_respostas_chegam_fora_de_ordem(espera_sem_variacao):
+    registros = gerar_registros(800)
+    # A primeira página falha uma vez; as seguintes, pré-buscadas, chegam antes dela
+    with ServidorAPI(registros, falhas={0: [503]}) as servidor:
+        paginas = receber(servidor.url, limite_pagina=100, concorrencia=4)
+
+    assert [offset for offset, _ in paginas] == list(range(0, 800, 100))
+    assert [registro for _, dados in paginas for registro in dados] == registros
+    assert max(instantes(servidor, 100)) < max(instantes(servidor, 0))
+
+def test_retomada_a_partir_do_offset_inicial():
+    registros = gerar_registros(500)
+    with ServidorAPI(registros) as servidor:
+        paginas = receber(servidor.url, limite_pagina=100, concorrencia=3, offset_inicial=200)
+
+    assert [offset for offset, _ in paginas] == [200, 300, 400]
+    assert [registro for _, dados in paginas for registro in dados] == registros[200:]
+
+def test_filtro_updated_after_e_repassado_em_todas_as_paginas():
+    registros = gerar_registros(300)
+    with ServidorAPI(registros) as servidor:
+        paginas = receber(servidor.url, params={'updated_after': registros[149]['last_updated']},
+                          limite_pagina=50, concorrencia=2)
+
+    assert [registro for _, dados in paginas for registro in dados] == registros[150:]
+
+def test_429_pausa_todos_os_pedidos_ate_o_retry_after():
+    registros = gerar_registros(1000)
+    with ServidorAPI(registros, retry_after=1, falhas={300: [429]}) as servidor:
+        paginas = receber(servidor.url, limite_pagina=100, concorrencia=4)
+
+    assert [registro for _, dados in paginas for registro in dados] == registros
+    assert servidor.respostas_429 == 1
+    instante_429 = next(instante for instante, _, status in servidor.historico if status == 429)
+    # Fora os pedidos já em trânsito quando o 429 chegou, nenhum sai durante a pausa, nem de outros offsets
+    durante_pausa = [instante for instante, _, _ in servidor.historico if 0.1 < instante - instante_429 < 0.9]
+    assert durante_pausa == []
+    nova_tentativa = [instante for instante, offset, _ in servidor.historico if offset == 300][-1]
+    assert nova_tentativa - instante_429 >= 0.9
+
+def test_429_sem_retry_after_usa_a_espera_padrao():
+    assert segundos_retry_after(None) == cliente_api.ESPERA_429_PADRAO
+    assert segundos_retry_after('invalido') == cliente_api.ESPERA_429_PADRAO
+    assert segundos_retry_after('2') == 2.0
+    assert segundos_retry_after('-3') == 0.0
+    assert segundos_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+def test_5xx_repete_com_espera_exponencial(espera_sem_variacao):
+    registros = gerar_registros(400)
+    with ServidorAPI(registros, falhas={100: [503, 500]}) as servidor:
+        paginas = receber(servidor.url, limite_pagina=100, concorrencia=2)
+
+    assert [registro for _, dados in paginas for registro in dados] == registros
+    primeiro, segundo, terceiro = instantes(servidor, 100)
+    assert segundo - primeiro >= 0.25 * 0.9
+    assert terceiro - segundo >= 0.5 * 0.9
+    # O erro 5xx não é tratado como limite de taxa
+    assert servidor.respostas_429 == 0
+
+def test_5xx_persistente_esgota_as_tentativas(espera_sem_variacao):
+    with ServidorAPI(gerar_registros(300), falhas={0: [503] * 3}) as servidor:
+        with pytest.raises(RuntimeError, match='offset 0'):
+            receber(servidor.url, limite_pagina=100, concorrencia=2, tentativas=3)
+
+    assert len(instantes(servidor, 0)) == 3
+
+def test_buscar_dados_mantem_a_interface_anterior():
+    modulo = carregar_modulo('Questao_2_Consumo_Transformacao_de_Dados_API.py')
+    registros = gerar_registros(250)
+    with ServidorAPI(registros) as servidor:
+        assert modulo.buscar_dados(servidor.url, {}, None) == registros
+        assert modulo.buscar_dados(servidor.url, {}, registros[99]['last_updated']) == registros[100:]
+
+def test_buscar_dados_devolve_as_paginas_recebidas_antes_do_erro(espera_sem_variacao, monkeypatch):
+    modulo = carregar_modulo('Questao_2_Consumo_Transformacao_de_Dados_API.py')
+    monkeypatch.setattr(modulo, 'concorrencia', 1)
+    monkeypatch.setattr(modulo, 'limite_pagina', 100)
+    monkeypatch.setattr(modulo, 'consumir_paginas', functools.partial(consumir_paginas, tentativas=2))
+    registros = gerar_registros(500)
+    with ServidorAPI(registros, falhas={200: [503, 503]}) as servidor:
+        dados = modulo.buscar_dados(servidor.url, {}, None)
+
+    assert dados == registros[:200]
@@ -0,0 +1,73 @@
+"""
+Testes do envio de despesas em lotes (despesas_em_lote) com a procedure
+sp_Despesas_Detalhadas_Lote emulada no SQLite.
+"""
+import sqlite3
+import pandas as pd
+import pytest
+
+from despesas_em_lote import enviar_despesas_em_lote, COLUNAS_DESPESA_DETALHADA
+
+CRIAR_DESPESA_DETALHADA = """
+CREATE TABLE DESPESA_DETALHADA (
+    DTBASE DATE,
+    CODIGOCENTROCUSTO INT PRIMARY KEY,
+    CENTROCUSTOMASTER INT,
+    VLDESPESA DECIMAL(18, 2),
+    CODFILIALPRINCIPAL INT,
+    CODCONTA INT,
+    MES_A DATE
+)
+"""
+
+@pytest.fixture
+def conexao():
+    conexao = sqlite3.connect(':memory:')
+    conexao.execute(CRIAR_DESPESA_DETALHADA)
+    yield conexao
+    conexao.close()
+
+def despesas(codigos, valor=10.0):
+    codigos = list(codigos)
+    return pd.DataFrame({
+        'DTBASE': '2024-03-28', 'CODIGOCENTROCUSTO': codigos, 'CENTROCUSTOMASTER': 1,
+        'VLDESPESA': [valor + codigo for codigo in codigos], 'CODFILIALPRINCIPAL': 2, 'CODCONTA': 1000,
+        'MES_A': '2024-03-01',
+    })
+
+def ler_tabela(conexao):
+    return pd.read_sql("SELECT * FROM DESPESA_DETALHADA ORDER BY CODIGOCENTROCUSTO", conexao)
+
+def test_primeira_carga_insere_todas_as_linhas_em_lotes(conexao):
+    df = despesas(range(2500))
+    totais = enviar_despesas_em_lote(conexao, df, tamanho_lote=1000)
+
+    assert totais == {'inseridos': 2500, 'atualizados': 0, 'lotes': 3}
+    pd.testing.assert_frame_equal(ler_tabela(conexao), df[COLUNAS_DESPESA_DETALHADA], check_dtype=False)
+
+def test_recarga_atualiza_as_existentes_e_insere_as_novas(conexao):
+    enviar_despesas_em_lote(conexao, despesas(range(1000)), tamanho_lote=300)
+    totais = enviar_despesas_em_lote(conexao, despesas(range(800, 1200), valor=99.0), tamanho_lote=300)
+
+    assert totais == {'inseridos': 200, 'atualizados': 200, 'lotes': 2}
+    tabela = ler_tabela(conexao).set_index('CODIGOCENTROCUSTO')
+    assert len(tabela) == 1200
+    assert tabela.loc[799, 'VLDESPESA'] == 10.0 + 799
+    assert tabela.loc[800, 'VLDESPESA'] == 99.0 + 800
+    assert tabela.loc[1199, 'VLDESPESA'] == 99.0 + 1199
+
+def test_chave_repetida_no_arquivo_prevalece_a_ultima(conexao):
+    df = pd.concat([despesas([1, 2]), despesas([2], valor=50.0)])
+    totais = enviar_despesas_em_lote(conexao, df)
+
+    assert totais['inseridos'] == 2
+    assert ler_tabela(conexao).set_index('CODIGOCENTROCUSTO').loc[2, 'VLDESPESA'] == 52.0
+
+def test_lote_com_erro_e_desfeito_e_os_anteriores_ficam(conexao):
+    conexao.execute("CREATE TRIGGER rejeita BEFORE INSERT ON DESPESA_DETALHADA "
+                    "WHEN NEW.CODIGOCENTROCUSTO = 150 BEGIN SELECT RAISE(ABORT, 'rejeitada'); END")
+    with pytest.raises(sqlite3.IntegrityError, match='rejeitada'):
+        enviar_despesas_em_lote(conexao, despesas(range(300)), tamanho_lote=100)
+
+    # Cada lote é uma transação: o primeiro foi confirmado e o segundo desfeito por inteiro
+    assert conexao.execute("SELECT COUNT(*), MAX(CODIGOCENTROCUSTO) FROM DESPESA_DETALHADA").fetchone() == (100, 99)
@@ -0,0 +1,37 @@
+"""
+Testes da leitura tipada dos arquivos intermediários: o CSV e o Parquet da
+mesma entidade devem resultar no mesmo DataFrame, inclusive nas datas.
+"""
+import pandas as pd
+import pytest
+
+from esquemas import ler_csv_tipado, esquema_arrow
+from intermediarios import gravar_parquet, ler_intermediario, caminho_parquet
+from geradores import gerar_csv_despesas, gerar_csv_orcamento
+
+@pytest.mark.parametrize('entidade, gerador', [('DESPESAS', gerar_csv_despesas),
+                                               ('ORCAMENTO', gerar_csv_orcamento)])
+def test_csv_e_parquet_resultam_no_mesmo_dataframe(tmp_path, entidade, gerador):
+    caminho_csv = gerador(str(tmp_path / f'{entidade}_.csv'), 3000)
+    gravar_parquet(pd.read_csv(caminho_csv), caminho_parquet(caminho_csv), esquema_arrow(entidade))
+
+    do_csv = ler_intermediario(caminho_csv, entidade)
+    do_parquet = ler_intermediario(caminho_parquet(caminho_csv), entidade)
+    pd.testing.assert_frame_equal(do_csv, do_parquet)
+
+    em_blocos = pd.concat(ler_intermediario(caminho_csv, entidade, 700), ignore_index=True)
+    pd.testing.assert_frame_equal(em_blocos.astype(str), do_parquet.astype(str))
+
+def test_datas_do_csv_sao_normalizadas_para_iso(tmp_path):
+    caminho_csv = str(tmp_path / 'DESPESAS_.csv')
+    pd.DataFrame({
+        'DTBASE': ['2024/03/15', '15/03/2024', '2024-03-15', None],
+        'CODIGOCENTROCUSTO': [1, 2, 3, 4], 'CENTROCUSTOMASTER': 1, 'VLDESPESA': 10.0,
+        'CODFILIALPRINCIPAL': 1, 'CODCONTA': 100, 'MES_A': '2024/03/01',
+    }).to_csv(caminho_csv, index=False)
+
+    df = ler_csv_tipado(caminho_csv, 'DESPESAS')
+    assert df['DTBASE'].tolist()[:3] == ['2024-03-15'] * 3
+    assert pd.isna(df['DTBASE'].iloc[3])
+    assert df['MES_A'].unique().tolist() == ['2024-03-01']
+    assert isinstance(df['DTBASE'].dtype, pd.CategoricalDtype)
@@ -0,0 +1,127 @@
+"""
+Testes do upsert via staging (mesclagem.mesclar_via_staging) em SQLite e
+da carga de DespesasDetalhadas que o utiliza.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from mesclagem import mesclar_via_staging
+from geradores import gerar_csv_despesas
+from pipeline import carregar_modulo
+from conftest import contar
+
+CHAVES = ['MES', 'CODCONTA']
+
+@pytest.fixture
+def engine_orcado(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE ORCADO (MES DATE, CODCONTA INT, VALOR DECIMAL(18, 2), "
+                             "OBS VARCHAR(50), PRIMARY KEY (MES, CODCONTA))")
+    return engine
+
+def orcado(contas, valor=1.0, mes='2024-01-01'):
+    contas = list(contas)
+    return pd.DataFrame({'MES': mes, 'CODCONTA': contas, 'VALOR': [valor * conta for conta in contas],
+                         'OBS': [f"conta {conta}" for conta in contas]})
+
+def ler(engine):
+    return pd.read_sql("SELECT * FROM ORCADO ORDER BY MES, CODCONTA", engine)
+
+def test_primeira_carga_insere_todas_as_linhas(engine_orcado):
+    df = pd.concat([orcado(range(3000)), orcado(range(500), mes='2024-02-01')], ignore_index=True)
+    assert mesclar_via_staging(engine_orcado, df, 'ORCADO', CHAVES, tamanho_lote=700) == {'inseridos': 3500,
+                                                                                          'atualizados': 0}
+    pd.testing.assert_frame_equal(ler(engine_orcado), df.sort_values(CHAVES, ignore_index=True), check_dtype=False)
+
+def test_recarga_identica_nao_grava_nada(engine_orcado):
+    df = orcado(range(1000))
+    mesclar_via_staging(engine_orcado, df, 'ORCADO', CHAVES)
+    assert mesclar_via_staging(engine_orcado, df, 'ORCADO', CHAVES) == {'inseridos': 0, 'atualizados': 0}
+    assert contar(engine_orcado, 'ORCADO') == 1000
+
+def test_recarga_atualiza_so_as_linhas_alteradas_e_insere_as_novas(engine_orcado):
+    mesclar_via_staging(engine_orcado, orcado(range(1000)), 'ORCADO', CHAVES)
+    novo = orcado(range(900, 1100))
+    novo.loc[novo['CODCONTA'] < 950, 'VALOR'] = -1.0
+
+    assert mesclar_via_staging(engine_orcado, novo, 'ORCADO', CHAVES) == {'inseridos': 100, 'atualizados': 50}
+    tabela = ler(engine_orcado).set_index('CODCONTA')
+    assert len(tabela) == 1100
+    assert (tabela.loc[900:949, 'VALOR'] == -1.0).all()
+    assert (tabela.loc[950:999, 'VALOR'] == tabela.loc[950:999].index.to_series()).all()
+    # Linhas fora do arquivo não são tocadas
+    assert tabela.loc[10, 'VALOR'] == 10.0
+
+def test_mudanca_de_e_para_nulo_conta_como_atualizacao(engine_orcado):
+    mesclar_via_staging(engine_orcado, orcado(range(3)), 'ORCADO', CHAVES)
+    novo = orcado(range(3))
+    novo['OBS'] = novo['OBS'].astype(object)
+    novo.loc[0, 'OBS'] = None
+    assert mesclar_via_staging(engine_orcado, novo, 'ORCADO', CHAVES) == {'inseridos': 0, 'atualizados': 1}
+    assert mesclar_via_staging(engine_orcado, orcado(range(3)), 'ORCADO', CHAVES) == {'inseridos': 0,
+                                                                                      'atualizados': 1}
+
+def test_chave_repetida_prevalece_a_ultima(engine_orcado):
+    df = pd.concat([orcado([1, 2]), orcado([2], valor=10.0)], ignore_index=True)
+    assert mesclar_via_staging(engine_orcado, df, 'ORCADO', CHAVES) == {'inseridos': 2, 'atualizados': 0}
+    assert ler(engine_orcado).set_index('CODCONTA').loc[2, 'VALOR'] == 20.0
+
+def test_erro_desfaz_a_mesclagem_inteira(engine_orcado):
+    mesclar_via_staging(engine_orcado, orcado(range(10)), 'ORCADO', CHAVES)
+    with engine_orcado.begin() as conn:
+        conn.exec_driver_sql("CREATE TRIGGER rejeita BEFORE UPDATE ON ORCADO WHEN NEW.CODCONTA = 5 "
+                             "BEGIN SELECT RAISE(ABORT, 'rejeitada'); END")
+    with pytest.raises(Exception, match='rejeitada'):
+        mesclar_via_staging(engine_orcado, orcado(range(20), valor=2.0), 'ORCADO', CHAVES)
+
+    assert contar(engine_orcado, 'ORCADO') == 10
+    assert ler(engine_orcado)['VALOR'].tolist() == [float(conta) for conta in range(10)]
+
+def test_carga_de_despesas_detalhadas_em_blocos_e_idempotente(engine_com_dimensoes, tmp_path, monkeypatch):
+    modulo = carregar_modulo('DespesaDetalhadas.py')
+    caminho_csv = gerar_csv_despesas(str(tmp_path / 'DESPESAS_.csv'), 5000)
+    monkeypatch.setattr(modulo, 'caminho_csv', caminho_csv)
+    monkeypatch.setattr(modulo, 'modo_carga', 'mesclar')
+    monkeypatch.setattr(modulo, 'tamanho_bloco', 1200)
+
+    modulo.executar()
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 5000
+    modulo.executar()
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 5000
+
+    alterado = pd.read_csv(caminho_csv)
+    alterado['VLDESPESA'] = np.where(alterado.index < 100, 0.5, alterado['VLDESPESA'])
+    caminho_alterado = str(tmp_path / 'DESPESAS_alterado.csv')
+    alterado.to_csv(caminho_alterado, index=False)
+    resultado = modulo.enviar_para_sql_server(engine_com_dimensoes, modulo.ler_csv(caminho_alterado),
+                                              'DespesasDetalhadas')
+    assert resultado == {'inseridos': 0, 'atualizados': 100}
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', 'VLDESPESA = 0.5') == 100
+
+def test_despesas_com_chaves_orfas_sao_descartadas(engine_com_dimensoes, tmp_path):
+    modulo = carregar_modulo('DespesaDetalhadas.py')
+    modulo.criar_tabela_despesas(engine_com_dimensoes)
+    modulo.criar_tabela_orcado_realizado(engine_com_dimensoes)
+    df = pd.read_csv(gerar_csv_despesas(str(tmp_path / 'DESPESAS_.csv'), 100))
+    df.loc[:9, 'CODCONTA'] = 99_999
+    df.loc[90:, 'CODIGOCENTROCUSTO'] = -1
+    caminho_orfas = str(tmp_path / 'DESPESAS_orfas.csv')
+    df.to_csv(caminho_orfas, index=False)
+
+    resultado = modulo.enviar_para_sql_server(engine_com_dimensoes, modulo.ler_csv(caminho_orfas), 'DespesasDetalhadas')
+    assert resultado == {'inseridos': 80, 'atualizados': 0}
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', 'CODCONTA = 99999 OR CODIGOCENTROCUSTO = -1') == 0
+
+def test_mesclagem_na_transacao_de_quem_chamou(engine_orcado):
+    mesclar_via_staging(engine_orcado, orcado(range(10)), 'ORCADO', CHAVES)
+    with engine_orcado.connect() as conn:
+        with conn.begin() as transacao:
+            # A conta 0 tem o mesmo valor (0) nas duas cargas
+            assert mesclar_via_staging(conn, orcado(range(20), valor=2.0), 'ORCADO', CHAVES) == {'inseridos': 10,
+                                                                                                  'atualizados': 9}
+            transacao.rollback()
+
+    # Quem chamou desfez a transação: nada da segunda mesclagem fica na tabela
+    assert contar(engine_orcado, 'ORCADO') == 10
+    assert ler(engine_orcado)['VALOR'].tolist() == [float(conta) for conta in range(10)]
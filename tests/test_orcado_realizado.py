@@ -0,0 +1,184 @@
+"""
+Testes do agregado ORCADO_REALIZADO em SQLite: depois de cada carga
+incremental (MERGE de despesas, inserção e substituição de meses), o
+agregado deve ser igual ao reconstruído do zero a partir das tabelas fato.
+"""
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+import orcado_realizado
+from orcado_realizado import TABELA_AGREGADO, COLUNAS_GRUPO, reconstruir, consultar_orcado_realizado
+from pipeline import carregar_modulo
+from conftest import contar
+
+MESES = pd.date_range('2023-07-01', periods=12, freq='MS')
+
+# Orçamento e despesas nas mesmas contas, centros de custo e filiais, para os grupos se cruzarem
+def dados(linhas=3000, semente=1):
+    aleatorio = np.random.default_rng(semente)
+    orcamento = pd.DataFrame({
+        'ORCAMENTO_ULTDATA': [(MESES[i % 12] + pd.Timedelta(days=27)).strftime('%Y-%m-%d') for i in range(linhas)],
+        'ORCAMENTO_FILIALCOD': aleatorio.integers(1, 4, linhas),
+        'ORCAMENTO_CONTACOD': aleatorio.integers(100, 130, linhas),
+        'ORCAMENTO_CENTROCUSTOCOD': aleatorio.integers(1, 20, linhas),
+        'ORCAMENTO_ORCADO': aleatorio.integers(100, 1000, linhas).astype(float),
+        'ORCAMENTO_PERRATEIO': 100,
+    }).drop_duplicates(['ORCAMENTO_ULTDATA', 'ORCAMENTO_CONTACOD', 'ORCAMENTO_CENTROCUSTOCOD'])
+    # Despesas com as datas no formato do CSV original ('yyyy/mm/dd')
+    despesas = pd.DataFrame({
+        'DTBASE': [(MESES[i % 12] + pd.Timedelta(days=i % 27)).strftime('%Y/%m/%d') for i in range(linhas)],
+        'CODIGOCENTROCUSTO': aleatorio.integers(1, 20, linhas),
+        'CENTROCUSTOMASTER': 1,
+        'VLDESPESA': aleatorio.integers(1, 500, linhas).astype(float),
+        'CODFILIALPRINCIPAL': aleatorio.integers(1, 4, linhas),
+        'CODCONTA': aleatorio.integers(100, 130, linhas),
+    })
+    despesas['MES_A'] = [(MESES[i % 12]).strftime('%Y/%m/%d') for i in range(linhas)]
+    despesas = despesas.drop_duplicates(['DTBASE', 'CODIGOCENTROCUSTO', 'CODCONTA'])
+    return orcamento.reset_index(drop=True), despesas.reset_index(drop=True)
+
+# Função para ler o agregado em uma ordem estável
+def ler_agregado(conn):
+    return (pd.read_sql(f"SELECT * FROM {TABELA_AGREGADO}", conn)
+            .sort_values(COLUNAS_GRUPO, ignore_index=True))
+
+# Função para comparar o agregado mantido pelas cargas com a reconstrução completa (desfeita em seguida)
+def conferir_com_reconstrucao(engine):
+    with engine.connect() as conn:
+        mantido = ler_agregado(conn)
+        reconstruir(conn)
+        reconstruido = ler_agregado(conn)
+        conn.rollback()
+    assert len(mantido) > 0
+    pd.testing.assert_frame_equal(mantido, reconstruido, check_dtype=False)
+
+@pytest.fixture
+def cargas(engine_com_dimensoes, tmp_path, monkeypatch):
+    orcamento = carregar_modulo('Envio_orcamento.py')
+    despesas = carregar_modulo('DespesaDetalhadas.py')
+    monkeypatch.setattr(orcamento, 'tamanho_bloco', 700)
+    monkeypatch.setattr(orcamento, 'modo_carga', 'inserir')
+    monkeypatch.setattr(despesas, 'tamanho_bloco', 500)
+    monkeypatch.setattr(despesas, 'modo_carga', 'mesclar')
+
+    # Função para gravar o arquivo e executar a carga do script com ele
+    def carregar(modulo, df, nome, **parametros):
+        caminho = str(tmp_path / nome)
+        df.to_csv(caminho, index=False)
+        monkeypatch.setattr(modulo, 'caminho_csv', caminho)
+        for parametro, valor in parametros.items():
+            monkeypatch.setattr(modulo, parametro, valor)
+        modulo.executar()
+
+    return orcamento, despesas, carregar
+
+def test_agregado_incremental_igual_a_reconstrucao(engine_com_dimensoes, cargas):
+    orcamento, despesas, carregar = cargas
+    df_orcamento, df_despesas = dados()
+
+    carregar(orcamento, df_orcamento, 'ORCAMENTO_.csv')
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+    carregar(despesas, df_despesas, 'DESPESAS_.csv')
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+    # MERGE com valores e filiais alterados: a linha muda de grupo e o grupo antigo precisa ser recalculado
+    alteradas = df_despesas.sample(300, random_state=2).assign(VLDESPESA=7.0, CODFILIALPRINCIPAL=9)
+    carregar(despesas, alteradas, 'DESPESAS_alteradas.csv')
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+    # Substituição de um mês de despesas (dezembro, na virada do ano) por poucas linhas
+    dezembro = df_despesas[df_despesas['MES_A'] == '2023/12/01'].head(10).assign(VLDESPESA=1.0)
+    carregar(despesas, dezembro, 'DESPESAS_dezembro.csv', modo_carga='substituir_mes', meses_carga=None)
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+    # Substituição de dois meses de orçamento, um deles ausente do arquivo
+    fevereiro = df_orcamento[df_orcamento['ORCAMENTO_ULTDATA'].str.startswith('2024-02')].head(5)
+    carregar(orcamento, fevereiro, 'ORCAMENTO_fevereiro.csv', modo_carga='substituir_mes',
+             meses_carga=['2024-02', '2024-03'])
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+    # MERGE depois da substituição, com linhas novas nos meses substituídos
+    novas = df_despesas[df_despesas['MES_A'].isin(['2023/12/01', '2024/03/01'])].assign(VLDESPESA=3.0)
+    carregar(despesas, novas, 'DESPESAS_novas.csv', modo_carga='mesclar')
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+def test_agregado_soma_as_tabelas_fato(engine_com_dimensoes, cargas):
+    orcamento, despesas, carregar = cargas
+    df_orcamento, df_despesas = dados(1500, semente=3)
+    carregar(orcamento, df_orcamento, 'ORCAMENTO_.csv')
+    carregar(despesas, df_despesas, 'DESPESAS_.csv')
+    carregar(despesas, df_despesas.head(40), 'DESPESAS_mes.csv', modo_carga='substituir_mes', meses_carga=None)
+
+    with engine_com_dimensoes.connect() as conn:
+        orcado = conn.exec_driver_sql("SELECT SUM(ORCAMENTO_ORCADO) FROM ORCAMENTO").scalar()
+        realizado = conn.exec_driver_sql("SELECT SUM(VLDESPESA) FROM DespesasDetalhadas").scalar()
+    total = consultar_orcado_realizado(engine_com_dimensoes, agrupar_por=[])
+    assert total.loc[0, 'ORCADO'] == pytest.approx(orcado)
+    assert total.loc[0, 'REALIZADO'] == pytest.approx(realizado)
+
+    # Por mês, o realizado do agregado é o das despesas carregadas naquele mês
+    por_mes = consultar_orcado_realizado(engine_com_dimensoes, '2023-07', '2023-09', agrupar_por=['MES_A'])
+    assert len(por_mes) == 3
+    with engine_com_dimensoes.connect() as conn:
+        julho = conn.exec_driver_sql("SELECT SUM(VLDESPESA) FROM DespesasDetalhadas "
+                                     "WHERE MES_A LIKE '2023_07%'").scalar()
+    assert por_mes.loc[0, 'REALIZADO'] == pytest.approx(julho)
+
+def test_reconstruir_sem_tabelas_fato_deixa_o_agregado_vazio(engine):
+    orcado_realizado.criar_tabela_orcado_realizado(engine)
+    with engine.begin() as conn:
+        assert reconstruir(conn) == 0
+        assert len(ler_agregado(conn)) == 0
+
+def test_falha_no_agregado_desfaz_o_merge_das_despesas(engine_com_dimensoes, cargas, monkeypatch):
+    orcamento, despesas, carregar = cargas
+    df_orcamento, df_despesas = dados(600, semente=4)
+    carregar(orcamento, df_orcamento, 'ORCAMENTO_.csv')
+    carregar(despesas, df_despesas.head(300), 'DESPESAS_.csv')
+
+    def falhar(conn, chaves):
+        raise RuntimeError('falha no agregado')
+
+    monkeypatch.setattr(despesas, 'atualizar_chaves', falhar)
+    with pytest.raises(RuntimeError, match='falha no agregado'):
+        despesas.enviar_para_sql_server(engine_com_dimensoes, df_despesas.assign(VLDESPESA=0.25),
+                                        'DespesasDetalhadas')
+
+    # As despesas e o agregado continuam como antes da carga que falhou
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 300
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', 'VLDESPESA = 0.25') == 0
+    conferir_com_reconstrucao(engine_com_dimensoes)
+
+def test_criacao_concorrente_do_agregado(engine):
+    # As cargas de orçamento e de despesas criam o agregado ao mesmo tempo (etapas paralelas do pipeline)
+    barreira = threading.Barrier(4)
+    erros = []
+
+    def criar():
+        barreira.wait()
+        try:
+            orcado_realizado.criar_tabela_orcado_realizado(engine)
+        except Exception as e:
+            erros.append(e)
+
+    for _ in range(5):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {TABELA_AGREGADO}")
+        threads = [threading.Thread(target=criar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert erros == []
+
+def test_grupo_repetido_no_agregado_e_rejeitado(engine):
+    orcado_realizado.criar_tabela_orcado_realizado(engine)
+    linha = "INSERT INTO ORCADO_REALIZADO VALUES ('2024-03-01', 100, 1, 1, 10, 5, -5)"
+    with engine.begin() as conn:
+        conn.exec_driver_sql(linha)
+    with pytest.raises(Exception, match='UNIQUE'):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(linha)
@@ -0,0 +1,21 @@
+"""
+Testes do carregamento dos scripts das etapas (pipeline.carregar_modulo).
+"""
+import importlib
+import sys
+
+from pipeline import carregar_modulo
+
+def test_script_carregado_fica_em_sys_modules():
+    modulo = carregar_modulo('Envio_orcamento.py')
+    assert sys.modules['Envio_orcamento'] is modulo
+    # Um import comum depois do carregamento não executa o script de novo
+    assert importlib.import_module('Envio_orcamento') is modulo
+
+def test_script_ja_importado_nao_e_executado_de_novo():
+    modulo = importlib.import_module('Questao_3_Avancado_Processamento_XML')
+    assert carregar_modulo('Questao_3_Avancado_Processamento_XML.py') is modulo
+
+def test_nome_com_espacos_vira_nome_de_modulo_valido():
+    modulo = carregar_modulo('Questao4_Extracao_de_Dados_de PDF_para_CSV.py')
+    assert sys.modules['Questao4_Extracao_de_Dados_de_PDF_para_CSV'] is modulo
@@ -0,0 +1,133 @@
+"""
+Testes da substituição de meses inteiros (particionamento.SubstituicaoMensal)
+pelas cargas de DespesasDetalhadas e ORCAMENTO em SQLite.
+"""
+import sqlite3
+import pandas as pd
+import pytest
+from sqlalchemy import inspect
+
+from particionamento import condicao_meses, criar_tabela_particionada
+from geradores import gerar_csv_despesas, gerar_csv_orcamento
+from pipeline import carregar_modulo
+from conftest import contar
+
+# No SQLite as datas ficam como texto, com '-' ou '/' conforme o arquivo; '_' aceita os dois
+def mes(coluna, ano_mes):
+    return f"{coluna} LIKE '{ano_mes.replace('-', '_')}%'"
+
+@pytest.mark.parametrize('meses', [['2024-12'], ['2024-01'], ['2023-01', '2024-12']])
+def test_condicao_meses_no_sqlite_cobre_so_os_meses_pedidos(meses):
+    datas = [f"{ano}{separador}{mes_do_ano:02d}{separador}{dia:02d}" for ano in (2023, 2024, 2025)
+             for mes_do_ano in range(1, 13) for dia in (1, 31) for separador in '-/']
+    datas += ['2024-12-31 23:59:59', '2024/12/31 10:00']
+    conexao = sqlite3.connect(':memory:')
+    conexao.execute("CREATE TABLE t (DATA TEXT)")
+    conexao.executemany("INSERT INTO t VALUES (?)", [(data,) for data in datas])
+    condicao, parametros = condicao_meses('DATA', meses, sql_server=False)
+
+    selecionadas = sorted(linha[0] for linha in conexao.execute(f"SELECT DATA FROM t WHERE {condicao}", parametros))
+    assert selecionadas == sorted(data for data in datas if data[:7].replace('/', '-') in meses)
+
+@pytest.fixture
+def despesas(engine_com_dimensoes, tmp_path, monkeypatch):
+    # 6000 linhas em 60 meses (100 por mês), carregadas pelo MERGE
+    modulo = carregar_modulo('DespesaDetalhadas.py')
+    caminho_csv = gerar_csv_despesas(str(tmp_path / 'DESPESAS_.csv'), 6000)
+    monkeypatch.setattr(modulo, 'caminho_csv', caminho_csv)
+    monkeypatch.setattr(modulo, 'modo_carga', 'mesclar')
+    monkeypatch.setattr(modulo, 'tamanho_bloco', 2000)
+    modulo.executar()
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 6000
+    return modulo, pd.read_csv(caminho_csv)
+
+# Função para gravar um recorte do arquivo de despesas
+def gravar(df, pasta, nome):
+    caminho = str(pasta / nome)
+    df.to_csv(caminho, index=False)
+    return caminho
+
+def test_substitui_so_os_meses_do_arquivo(engine_com_dimensoes, despesas, tmp_path):
+    modulo, df = despesas
+    recorte = df[df['MES_A'] == '2021/03/01'].head(3).assign(VLDESPESA=1.0)
+    resultado = modulo.substituir_meses(engine_com_dimensoes, gravar(recorte, tmp_path, 'mes.csv'))
+
+    assert resultado['meses'] == ['2021-03']
+    assert (resultado['excluidos'], resultado['inseridos']) == (100, 3)
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 6000 - 100 + 3
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', mes('MES_A', '2021-03')) == 3
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', f"{mes('MES_A', '2021-03')} AND VLDESPESA = 1") == 3
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', mes('MES_A', '2021-04')) == 100
+
+def test_meses_pedidos_filtram_o_arquivo_e_esvaziam_os_ausentes(engine_com_dimensoes, despesas, tmp_path):
+    modulo, df = despesas
+    recorte = df[df['MES_A'].isin(['2021/03/01', '2021/05/01'])]
+    resultado = modulo.substituir_meses(engine_com_dimensoes, gravar(recorte, tmp_path, 'meses.csv'),
+                                        ['2021-03', '2021-04'])
+
+    # 2021-05 está no arquivo mas não foi pedido; 2021-04 foi pedido e não está no arquivo
+    assert resultado['meses'] == ['2021-03', '2021-04']
+    assert (resultado['excluidos'], resultado['inseridos'], resultado['ignorados']) == (200, 100, 100)
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', mes('MES_A', '2021-04')) == 0
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', mes('MES_A', '2021-05')) == 100
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 5900
+
+@pytest.mark.parametrize('tamanho_bloco', [None, 7, 100_000])
+def test_tamanho_bloco_nao_muda_o_resultado(engine_com_dimensoes, despesas, tmp_path, tamanho_bloco):
+    modulo, df = despesas
+    recorte = df[df['MES_A'].isin(['2020/01/01', '2024/12/01'])].assign(VLDESPESA=2.0)
+    resultado = modulo.substituir_meses(engine_com_dimensoes, gravar(recorte, tmp_path, 'meses.csv'),
+                                        tamanho_bloco=tamanho_bloco)
+
+    assert (resultado['excluidos'], resultado['inseridos']) == (200, 200)
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', 'VLDESPESA = 2') == 200
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 6000
+
+def test_falha_no_meio_da_carga_mantem_os_meses_anteriores(engine_com_dimensoes, despesas, tmp_path, monkeypatch):
+    modulo, df = despesas
+    recorte = df[df['MES_A'] == '2021/03/01'].assign(VLDESPESA=3.0)
+    validar_chaves = modulo.validar_chaves
+    blocos = []
+
+    def falhar_no_terceiro_bloco(conn, bloco, dimensoes):
+        blocos.append(len(bloco))
+        if len(blocos) == 3:
+            raise RuntimeError('falha simulada')
+        return validar_chaves(conn, bloco, dimensoes)
+
+    monkeypatch.setattr(modulo, 'validar_chaves', falhar_no_terceiro_bloco)
+    with pytest.raises(RuntimeError, match='falha simulada'):
+        modulo.substituir_meses(engine_com_dimensoes, gravar(recorte, tmp_path, 'mes.csv'), tamanho_bloco=10)
+
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas') == 6000
+    assert contar(engine_com_dimensoes, 'DespesasDetalhadas', 'VLDESPESA = 3') == 0
+
+def test_orcamento_substitui_os_meses_pedidos(engine_com_dimensoes, tmp_path, monkeypatch):
+    modulo = carregar_modulo('Envio_orcamento.py')
+    caminho_csv = gerar_csv_orcamento(str(tmp_path / 'ORCAMENTO_.csv'), 1200)
+    monkeypatch.setattr(modulo, 'caminho_csv', caminho_csv)
+    monkeypatch.setattr(modulo, 'modo_carga', 'inserir')
+    monkeypatch.setattr(modulo, 'tamanho_bloco', 500)
+    modulo.executar()
+    assert contar(engine_com_dimensoes, 'ORCAMENTO') == 1200
+
+    df = pd.read_csv(caminho_csv)
+    recorte = df[df['ORCAMENTO_ULTDATA'] == '2020-01-28'].head(5)
+    resultado = modulo.substituir_meses(engine_com_dimensoes, gravar(recorte, tmp_path, 'orcamento_mes.csv'),
+                                        modulo.tabela_contas, modulo.tabela_centro_custo, ['2020-01', '2020-02'],
+                                        tamanho_bloco=2)
+
+    assert resultado['meses'] == ['2020-01', '2020-02']
+    assert (resultado['excluidos'], resultado['inseridos']) == (40, 5)
+    assert contar(engine_com_dimensoes, 'ORCAMENTO', mes('ORCAMENTO_ULTDATA', '2020-01')) == 5
+    assert contar(engine_com_dimensoes, 'ORCAMENTO', mes('ORCAMENTO_ULTDATA', '2020-02')) == 0
+    assert contar(engine_com_dimensoes, 'ORCAMENTO') == 1200 - 40 + 5
+
+def test_chave_da_tabela_particionada_inclui_a_coluna_de_particao(engine):
+    with pytest.raises(ValueError, match='coluna de partição MES'):
+        criar_tabela_particionada(engine, 'FATO', 'MES DATE, CODIGO INT, VALOR INT', ['CODIGO'], 'MES')
+
+    modulo = carregar_modulo('DespesaDetalhadas.py')
+    modulo.criar_tabela_despesas(engine)
+    chave = inspect(engine).get_pk_constraint('DespesasDetalhadas')['constrained_columns']
+    assert chave == modulo.CHAVES_DESPESAS